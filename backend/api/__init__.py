@@ -1,10 +1,9 @@
-"""API registration and basic config."""
+"""API registration."""
 
 import logging
 from fastapi import FastAPI
 from .v1 import router as v1_router
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("backend.api")
 
 
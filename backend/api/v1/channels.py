@@ -1,12 +1,17 @@
 """Channel management endpoints."""
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 import logging
 
-from ...database import get_db
-from ...models import User, Channel, ChannelMember
+from ...auth import Caller, caller
+from ...cache import entity_cache
+from ...database import get_db, get_write_db
+from ...fast_json import columns, fetch_rows, list_response
+from ...http_cache import check, resource_versions, tag
+from ...models import Channel, ChannelMember
 from ...schemas import ChannelCreate, ChannelOut, ChannelMemberOut
 from ...enums import RoleEnum
 
@@ -15,75 +20,98 @@ router = APIRouter()
 
 
 @router.post("/", response_model=ChannelOut)
-def create_channel(channel_data: ChannelCreate, user_id: str, db: Session = Depends(get_db)):
+async def create_channel(channel_data: ChannelCreate, user: Caller = Depends(caller),
+                         db: AsyncSession = Depends(get_write_db)):
     """Create a new channel (admin only). Admin is automatically joined."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
     if user.role != RoleEnum.ADMIN.value:
         raise HTTPException(status_code=403, detail="Only admins can create channels")
 
-    existing = db.query(Channel).filter(Channel.name == channel_data.name).first()
+    existing = await db.scalar(select(Channel).where(Channel.name == channel_data.name))
     if existing:
         raise HTTPException(status_code=400, detail="Channel already exists")
 
-    channel = Channel(name=channel_data.name)
+    channel = Channel(name=channel_data.name, retention_days=channel_data.retention_days, member_count=1)
     db.add(channel)
-    db.commit()
-    db.refresh(channel)
-    
+    await db.flush()
+
     # Automatically add admin to the channel
-    member = ChannelMember(user_id=user_id, channel_id=channel.id)
+    member = ChannelMember(user_id=user.id, channel_id=channel.id)
     db.add(member)
-    db.commit()
-    
-    logger.info(f"Channel created: {channel.name} (admin: {user.name})")
+    await db.commit()
+    entity_cache.invalidate_channel(channel.id)
+    entity_cache.member_added(user.id, channel.id)
+    await resource_versions.bump("channels")
+    await resource_versions.bump(f"members:{channel.id}")
+
+    logger.info("Channel created: %s (admin: %s)", channel.name, user.id)
     return channel
 
 
 @router.get("/", response_model=List[ChannelOut])
-def list_channels(db: Session = Depends(get_db)):
-    """List all channels."""
-    return db.query(Channel).all()
+async def list_channels(request: Request, response: Response, sort: Optional[Literal["activity", "name"]] = None,
+                        db: AsyncSession = Depends(get_db)):
+    """List all channels with their member and message counts and last activity.
+
+    ``sort=activity`` puts the most recently active channels first. The
+    stats are maintained columns, so no aggregation runs. Supports
+    ``If-None-Match`` (see http_cache.py).
+    """
+    if (not_modified := check(request, response, "channels")) is not None:
+        return not_modified
+    query = select(*columns(Channel, ChannelOut))
+    if sort == "activity":
+        query = query.order_by(Channel.last_message_at.desc().nulls_last(), Channel.created_at.desc())
+    elif sort == "name":
+        query = query.order_by(Channel.name)
+    return tag(list_response(await fetch_rows(db, query)), response)
 
 
 @router.get("/{channel_id}", response_model=ChannelOut)
-def get_channel(channel_id: str, db: Session = Depends(get_db)):
-    """Get channel by ID."""
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
+async def get_channel(channel_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get channel by ID. Supports ``If-None-Match``."""
+    if (not_modified := check(request, response, f"channel:{channel_id}")) is not None:
+        return not_modified
+    channel = await db.get(Channel, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
 
 
 @router.post("/{channel_id}/join")
-def join_channel(channel_id: str, user_id: str, db: Session = Depends(get_db)):
+async def join_channel(channel_id: str, user: Caller = Depends(caller), db: AsyncSession = Depends(get_write_db)):
     """Join a channel."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
+    channel = await entity_cache.get_channel(channel_id, db)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
 
-    member = db.query(ChannelMember).filter(
-        ChannelMember.user_id == user_id,
-        ChannelMember.channel_id == channel_id
-    ).first()
-    if member:
+    if await entity_cache.is_member(user.id, channel_id, db):
         raise HTTPException(status_code=400, detail="User already in channel")
 
-    member = ChannelMember(user_id=user_id, channel_id=channel_id)
+    # New members start with the existing history read.
+    member = ChannelMember(
+        user_id=user.id,
+        channel_id=channel_id,
+        last_read_seq=select(Channel.message_count).where(Channel.id == channel_id).scalar_subquery(),
+    )
     db.add(member)
-    db.commit()
-    db.refresh(member)
-    logger.info(f"User {user.name} joined channel {channel.name}")
-    return {"message": "Joined channel", "user_id": user_id, "channel_id": channel_id}
+    await db.execute(
+        update(Channel).where(Channel.id == channel_id)
+        .values(member_count=Channel.member_count + 1, updated_at=Channel.updated_at)
+    )
+    await db.commit()
+    entity_cache.member_added(user.id, channel_id)
+    await resource_versions.bump("channels")
+    await resource_versions.bump(f"channel:{channel_id}")
+    await resource_versions.bump(f"members:{channel_id}")
+    logger.info("User %s joined channel %s", user.id, channel.name, extra={"event": "channel_join"})
+    return {"message": "Joined channel", "user_id": user.id, "channel_id": channel_id}
 
 
 @router.get("/{channel_id}/members", response_model=List[ChannelMemberOut])
-def get_channel_members(channel_id: str, db: Session = Depends(get_db)):
-    """Get all members in a channel."""
-    members = db.query(ChannelMember).filter(ChannelMember.channel_id == channel_id).all()
-    return members
+async def get_channel_members(channel_id: str, request: Request, response: Response,
+                              db: AsyncSession = Depends(get_db)):
+    """Get all members in a channel. Supports ``If-None-Match``."""
+    if (not_modified := check(request, response, f"members:{channel_id}")) is not None:
+        return not_modified
+    query = select(*columns(ChannelMember, ChannelMemberOut)).where(ChannelMember.channel_id == channel_id)
+    return tag(list_response(await fetch_rows(db, query)), response)
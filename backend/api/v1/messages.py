@@ -1,50 +1,284 @@
 """Message endpoints for channels."""
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from collections import deque
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Iterator, List, Literal, Optional, Tuple
+import json
 import logging
+import tempfile
 
-from ...database import get_db
-from ...models import User, Channel, Message, ChannelMember
-from ...schemas import MessageCreate, MessageOut
+from ... import archive
+from ...auth import Caller, caller
+from ...cache import entity_cache
+from ...database import get_db, get_write_db
+from ...enums import RoleEnum
+from ...export import EXPORT_FORMATS, export_messages
+from ...fast_json import columns, fetch_rows, list_response
+from ...http_cache import resource_versions
+from ...history import row_from_model
+from ...models import Message
+from ...schemas import MessageBatchOut, MessageCreate, MessageOut
+from ...persistence import insert_messages, message_writer, new_message_row
+from .ws import manager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Rows per executemany when inserting a batch.
+MESSAGE_IMPORT_CHUNK = 1000
+# Streamed NDJSON bodies are spooled to disk past this size.
+_SPOOL_MAX_BYTES = 1024 * 1024
+_NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+_message_list = TypeAdapter(List[MessageCreate])
+_MESSAGE_COLUMNS = columns(Message, MessageOut)
 
-@router.post("/{channel_id}", response_model=MessageOut)
-def send_message(channel_id: str, user_id: str, msg: MessageCreate, db: Session = Depends(get_db)):
-    """Send a message to a channel."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
+async def _authorize_sender(channel_id: str, user: Caller, db: Optional[AsyncSession] = None) -> None:
+    """Check that the channel exists and the caller is a member.
+
+    The channel and membership checks are served by ``entity_cache``.
+    """
+    channel = await entity_cache.get_channel(channel_id, db)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
 
-    member = db.query(ChannelMember).filter(
-        ChannelMember.user_id == user_id,
-        ChannelMember.channel_id == channel_id
-    ).first()
-    if not member:
+    if not await entity_cache.is_member(user.id, channel_id, db):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
-    message = Message(channel_id=channel_id, sender_id=user_id, content=msg.content)
-    db.add(message)
-    db.commit()
-    db.refresh(message)
-    logger.info(f"Message sent in channel {channel_id} by {user.name}")
+
+@router.post("/{channel_id}", response_model=MessageOut)
+async def send_message(channel_id: str, msg: MessageCreate, user: Caller = Depends(caller),
+                       db: AsyncSession = Depends(get_db)):
+    """Send a message to a channel."""
+    await _authorize_sender(channel_id, user, db)
+    message = await message_writer.submit(new_message_row(channel_id, user.id, msg.content))
+    await manager.broadcast_message(message)
+    logger.info("Message sent in channel %s by %s", channel_id, user.id, extra={"event": "message_sent"})
     return message
 
 
+async def _spool_ndjson(request: Request):
+    """Validate a streamed NDJSON body line by line into a spooled file.
+
+    Each line is a ``MessageCreate`` object. Memory stays bounded however
+    large the upload is, and nothing touches the database until it is
+    fully received.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES, mode="w+")
+    pending, line_no = b"", 0
+
+    def add(line: bytes):
+        nonlocal line_no
+        line_no += 1
+        if not line.strip():
+            return
+        try:
+            message = MessageCreate.model_validate_json(line)
+        except ValidationError:
+            spool.close()
+            raise HTTPException(status_code=422, detail=f"Invalid message on line {line_no}")
+        spool.write(json.dumps(message.content) + "\n")
+
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            add(line)
+    add(pending)
+    spool.seek(0)
+    return spool
+
+
+def _spooled_contents(spool) -> Iterator[str]:
+    for line in spool:
+        yield json.loads(line)
+
+
+async def _message_contents(request: Request):
+    """Message contents from a JSON array body or a streamed NDJSON body."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in _NDJSON_TYPES:
+        spool = await _spool_ndjson(request)
+        return _spooled_contents(spool), spool.close
+    try:
+        messages = _message_list.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    return (m.content for m in messages), None
+
+
+@router.post("/{channel_id}/batch", response_model=MessageBatchOut)
+async def send_message_batch(channel_id: str, request: Request, user: Caller = Depends(caller),
+                             db: AsyncSession = Depends(get_write_db)):
+    """Send many messages to a channel in one transaction (imports and bots).
+
+    The body is a JSON array of ``MessageCreate`` objects, or one object per
+    line with ``Content-Type: application/x-ndjson``, which is streamed so
+    large imports use constant memory. Membership is checked once, rows are
+    inserted with executemany (``MESSAGE_IMPORT_CHUNK`` rows per statement)
+    and committed together, and live subscribers get a single
+    ``message_batch`` frame.
+    """
+    await _authorize_sender(channel_id, user)
+    contents, cleanup = await _message_contents(request)
+
+    tail = deque(maxlen=manager.recent.capacity)
+    chunk: List[dict] = []
+    count, first_id, last_id = 0, None, None
+    try:
+        for content in contents:
+            row = new_message_row(channel_id, user.id, content)
+            first_id, last_id = first_id or row["id"], row["id"]
+            count += 1
+            chunk.append(row)
+            tail.append(row)
+            if len(chunk) >= MESSAGE_IMPORT_CHUNK:
+                await insert_messages(db, chunk)
+                chunk = []
+        if chunk:
+            await insert_messages(db, chunk)
+        await db.commit()
+        await resource_versions.touch("channels", f"channel:{channel_id}")  # activity stats changed
+    finally:
+        if cleanup is not None:
+            cleanup()
+
+    if count:
+        await manager.broadcast_batch(channel_id, list(tail), count)
+    logger.info("Batch of %s messages sent in channel %s by %s", count, channel_id, user.id,
+                extra={"event": "message_batch_sent"})
+    return MessageBatchOut(
+        channel_id=channel_id, count=count, first_id=first_id, last_id=last_id
+    )
+
+
+@router.get("/{channel_id}/export")
+async def export_channel_messages(
+    channel_id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False,
+    user: Caller = Depends(caller),
+):
+    """Stream the channel's history, oldest first, as an NDJSON or CSV download.
+
+    ``since`` (inclusive) and ``until`` (exclusive) limit the time range;
+    ``gzip=true`` compresses the file as it is streamed. Members and admins
+    may export.
+    """
+    if not await entity_cache.get_channel(channel_id):
+        raise HTTPException(status_code=404, detail="Channel not found")
+    if user.role != RoleEnum.ADMIN.value and not await entity_cache.is_member(user.id, channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"channel-{channel_id}.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+    logger.info("Exporting channel %s as %s for %s", channel_id, format, user.id)
+    return StreamingResponse(
+        export_messages(channel_id, format, since, until, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+async def _resolve_cursor(db: AsyncSession, channel_id: str, message_id: str) -> Tuple[tuple, bool]:
+    """Return the ``(created_at, id)`` keyset position of a cursor message
+    and whether the message is archived."""
+    row = (await db.execute(select(Message.created_at, Message.id).where(
+        Message.id == message_id,
+        Message.channel_id == channel_id
+    ))).first()
+    if row:
+        return tuple(row), False
+    key = await archive.locate(db, channel_id, message_id)
+    if not key:
+        raise HTTPException(status_code=400, detail=f"Unknown cursor: {message_id}")
+    return key, True
+
+
+async def _older(db: AsyncSession, channel_id: str, rows: list, before: Optional[tuple], limit: int) -> list:
+    """Top up a newest-first page that ran past the hot table from the archive."""
+    if len(rows) >= limit:
+        return rows
+    if rows:
+        before = (rows[-1]["created_at"], rows[-1]["id"])
+    return rows + await archive.read_before(db, channel_id, before, limit - len(rows))
+
+
 @router.get("/{channel_id}", response_model=List[MessageOut])
-def get_channel_messages(channel_id: str, db: Session = Depends(get_db)):
-    """Get all messages in a channel (channel history)."""
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
+async def get_channel_messages(
+    channel_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a page of channel history, newest message first.
+
+    Pagination is keyset-based on ``(created_at, id)``. Pass the id of the
+    oldest message already held as ``before`` to page further back, or the
+    id of the newest one as ``after`` to fetch the ``limit`` messages that
+    follow it. Each page is a bounded index range scan, so latency does not
+    depend on how many messages the channel has.
+
+    The newest page and ``after`` pages inside the recent-history buffer
+    (``history.py``) are served from memory. Pages that reach past the
+    messages table continue into archived segments (``archive.py``).
+    """
+    recent = manager.recent
+    buffered = not before and manager.tracks_history(channel_id)
+    if buffered:
+        if after:
+            rows = recent.since(channel_id, after)
+            if rows is not None:
+                return list_response(rows[:limit][::-1])
+        else:
+            rows = recent.latest(channel_id, limit)
+            if rows is not None:
+                return list_response(rows)
+
+    channel = await entity_cache.get_channel(channel_id, db)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
 
-    messages = db.query(Message).filter(Message.channel_id == channel_id).order_by(Message.created_at.asc()).all()
-    return messages
+    key = tuple_(Message.created_at, Message.id)
+    query = select(*_MESSAGE_COLUMNS).where(Message.channel_id == channel_id)
+    position = None
+    if before:
+        position, _ = await _resolve_cursor(db, channel_id, before)
+        query = query.where(key < position)
+
+    if after:
+        # Take the messages closest to the cursor, then flip to newest-first.
+        # Archived messages all precede the hot table's.
+        position, archived = await _resolve_cursor(db, channel_id, after)
+        rows = await archive.read_after(db, channel_id, position, limit) if archived else []
+        if len(rows) < limit:
+            query = query.where(key > position)
+            query = query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit - len(rows))
+            rows += await fetch_rows(db, query)
+        return list_response(rows[::-1])
+
+    if not buffered:
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+        return list_response(await _older(db, channel_id, await fetch_rows(db, query), position, limit))
+
+    # Newest page missed the buffer: read enough to seed it as well.
+    recent.begin_seed(channel_id)
+    try:
+        size = max(limit, recent.capacity)
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(size)
+        rows = await _older(db, channel_id, [row_from_model(m) for m in (await db.execute(query)).all()], None, size)
+    except BaseException:
+        recent.cancel_seed(channel_id)
+        raise
+    recent.seed(channel_id, rows)
+    return list_response(rows[:limit])
@@ -0,0 +1,41 @@
+"""Message search endpoints."""
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import logging
+
+from ...auth import Caller, caller
+from ...cache import entity_cache
+from ...database import get_db
+from ...schemas import SearchResultsOut
+from ...search import search_messages as run_search
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/messages", response_model=SearchResultsOut)
+async def search_messages(
+    q: str = Query(..., min_length=1),
+    channel_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: Caller = Depends(caller),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search message content in one channel, or in all of the user's channels.
+
+    Results are best match first, each with a ``snippet`` in which matched
+    words are wrapped in ``<mark>`` (the rest of the snippet is HTML-escaped). Pass
+    ``next_cursor`` back as ``cursor`` for the next page.
+    """
+    if channel_id is not None:
+        if not await entity_cache.is_member(user.id, channel_id, db):
+            raise HTTPException(status_code=403, detail="Not a member of this channel")
+        channel_ids = [channel_id]
+    else:
+        channel_ids = sorted(await entity_cache.channels_of(user.id, db))
+
+    results, next_cursor = await run_search(db, q, channel_ids, limit, cursor)
+    return {"results": results, "next_cursor": next_cursor}
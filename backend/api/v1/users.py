@@ -1,24 +1,61 @@
 """User management endpoints."""
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import logging
 
-from ...database import get_db
-from ...models import User
-from ...schemas import UserRegister, UserLogin, UserOut
-from ...crypto import encrypt_password, verify_password
+from ...auth import Caller, caller, issue_token
+from ...cache import entity_cache
+from ...database import AsyncWriteSessionLocal, get_db
+from ...fast_json import columns, fetch_rows, list_response
+from ...http_cache import check, resource_versions, tag
+from ...models import Channel, ChannelMember, User
+from ...read_cursors import read_cursors
+from ...schemas import LoginOut, UserRegister, UserLogin, UserOut, UnreadOut
+from ...crypto import HasherBusy, hash_password, needs_rehash, verify_password
 from ...enums import RoleEnum
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/register", response_model=UserOut)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    """Register a new user. Role may be set in the request body (default: user)."""
-    existing = db.query(User).filter(User.name == user_data.name).first()
+def _with_token(user: User) -> LoginOut:
+    token, expires_at = issue_token(user.id, user.role)
+    return LoginOut(**UserOut.model_validate(user).model_dump(), access_token=token, expires_at=expires_at)
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Too many logins in progress, retry shortly",
+                         headers={"Retry-After": "1"})
+
+
+async def _upgrade_password(user_id: str, password: str) -> None:
+    """Store a legacy or outdated password again with the current hasher.
+
+    Skipped while the hasher is saturated; the next login tries again.
+    """
+    try:
+        encoded = await hash_password(password)
+    except HasherBusy:
+        return
+    async with AsyncWriteSessionLocal() as db:
+        await db.execute(update(User).where(User.id == user_id).values(password=encoded))
+        await db.commit()
+    await resource_versions.bump("users")  # updated_at changed
+    logger.info("Password rehashed for user %s", user_id)
+
+
+@router.post("/register", response_model=LoginOut)
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
+    """Register a new user. Role may be set in the request body (default: user).
+
+    Returns the user with a session token, as ``login`` does. The writer
+    connection is only taken for the INSERT, after the password is hashed.
+    """
+    existing = await db.scalar(select(User.id).where(User.name == user_data.name))
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
 
@@ -30,35 +67,90 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         except Exception:
             requested_role = RoleEnum.USER
 
-    encrypted_pwd = encrypt_password(user_data.password)
-    new_user = User(name=user_data.name, password=encrypted_pwd, role=requested_role.value)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    logger.info(f"User registered: {new_user.name} (role={new_user.role})")
-    return new_user
+    try:
+        hashed_pwd = await hash_password(user_data.password)
+    except HasherBusy:
+        raise _busy()
+    new_user = User(name=user_data.name, password=hashed_pwd, role=requested_role.value)
+    async with AsyncWriteSessionLocal() as write_db:
+        write_db.add(new_user)
+        try:
+            await write_db.commit()
+        except IntegrityError:
+            # Registered by a concurrent request while this one was hashing.
+            raise HTTPException(status_code=400, detail="Username already exists")
+    entity_cache.invalidate_user(new_user.id)
+    await resource_versions.bump("users")
+    logger.info("User registered: %s (role=%s)", new_user.name, new_user.role)
+    return _with_token(new_user)
+
 
+@router.post("/login", response_model=LoginOut)
+async def login(creds: UserLogin, db: AsyncSession = Depends(get_db)):
+    """Log in. Returns the user with a signed session token (see auth.py) to
+    send as ``Authorization: Bearer <token>``.
 
-@router.post("/login", response_model=UserOut)
-def login(creds: UserLogin, db: Session = Depends(get_db)):
-    """Login user."""
-    user = db.query(User).filter(User.name == creds.name).first()
-    if not user or not verify_password(user.password, creds.password):
+    Answers 503 when too many password checks are already in flight (see
+    crypto.py).
+    """
+    user = await db.scalar(select(User).where(User.name == creds.name))
+    try:
+        valid = user is not None and await verify_password(user.password, creds.password)
+    except HasherBusy:
+        raise _busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    logger.info(f"User logged in: {user.name}")
-    return user
+    if needs_rehash(user.password):
+        await _upgrade_password(user.id, creds.password)
+    logger.info("User logged in: %s", user.name, extra={"event": "user_login"})
+    return _with_token(user)
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(user_id: str, db: Session = Depends(get_db)):
+async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
     """Get user by ID."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+@router.get("/{user_id}/unread", response_model=List[UnreadOut])
+async def get_unread_counts(user_id: str, user: Caller = Depends(caller), db: AsyncSession = Depends(get_db)):
+    """Unread message counts for every channel the user is a member of.
+
+    One indexed join over two maintained counters; no messages are counted.
+    The caller's acks that are not flushed yet are laid over the stored
+    cursors, without writing anyone's.
+    """
+    rows = await db.execute(
+        select(
+            ChannelMember.channel_id,
+            Channel.message_count,
+            ChannelMember.last_read_seq,
+            ChannelMember.last_read_message_id,
+            ChannelMember.last_read_at,
+        )
+        .join(Channel, Channel.id == ChannelMember.channel_id)
+        .where(ChannelMember.user_id == user.id)
+    )
+    pending = await read_cursors.pending(db, user.id)
+    counts = []
+    for row in rows:
+        cursor = {"seq": row.last_read_seq, "last_read_message_id": row.last_read_message_id,
+                  "last_read_at": row.last_read_at}
+        acked = pending.get(row.channel_id)
+        if acked is not None and acked["seq"] > row.last_read_seq:
+            cursor = acked
+        counts.append({"channel_id": row.channel_id, "unread": row.message_count - cursor["seq"],
+                       "last_read_message_id": cursor["last_read_message_id"],
+                       "last_read_at": cursor["last_read_at"]})
+    return counts
+
+
 @router.get("/", response_model=List[UserOut])
-def list_users(db: Session = Depends(get_db)):
-    """List all users."""
-    return db.query(User).all()
+async def list_users(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """List all users. Supports ``If-None-Match`` (see http_cache.py)."""
+    if (not_modified := check(request, response, "users")) is not None:
+        return not_modified
+    return tag(list_response(await fetch_rows(db, select(*columns(User, UserOut)))), response)
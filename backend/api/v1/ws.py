@@ -1,89 +1,406 @@
 """WebSocket handler for real-time channel messaging and online tracking."""
 
+import asyncio
 import json
 import logging
-from typing import Dict, Set
+import os
+import time
+import uuid
+from typing import Dict, KeysView, List, Optional, Set
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_
 
-from ...database import SessionLocal
-from ...models import Message, ChannelMember
+from ...cache import entity_cache
+from ...connections import Connection, ConnectionRegistry
+from ...database import AsyncSessionLocal
+from ... import metrics, query_log
+from ...auth import websocket_authorized
+from ...http_cache import resource_versions
+from ...history import RecentMessages, message_frame, recent_messages, row_from_frame, row_from_model
+from ...models import Message
+from ...persistence import message_writer, new_message_row
+from ...presence import PRESENCE_WINDOW_MS, PresenceService
+from ...pubsub import Broker, InMemoryBroker, broker_from_url
+from ...read_cursors import read_cursors
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Pub/sub event kinds (first character of a bus payload).
+_MESSAGE, _KEYED_MESSAGE, _JOIN, _LEAVE, _SYNC, _SNAPSHOT = "m", "k", "j", "l", "s", "S"
+_CHAT = "c"  # a chat message frame, also recorded in the recent-history buffer
+_CHAT_BATCH = "b"  # a message_batch frame (see broadcast_batch)
+_VERSION = "v"  # a new resource version for HTTP ETags (see http_cache.py)
+
+# Most messages replayed from the database to a reconnecting socket.
+WS_REPLAY_LIMIT = int(os.getenv("WS_REPLAY_LIMIT", "500"))
+
+broadcast_seconds = metrics.histogram(
+    "ws_broadcast_seconds", "Time to enqueue one frame for a channel's local sockets")
+broadcast_recipients = metrics.histogram(
+    "ws_broadcast_recipients", "Local sockets per channel broadcast", buckets=metrics.COUNT_BUCKETS)
+
 
 class ChannelConnectionManager:
     """
     Manage WebSocket connections per channel.
-    
-    Tracks online users per channel: channel_id -> set(WebSocket)
+
+    Connections are indexed by a ``ConnectionRegistry`` (``connections.py``):
+    channel -> user -> connections for fan-out, channel -> user -> count for
+    O(1) online checks (a user with several devices is counted once), and
+    user -> channels for dropping all of a user's sockets at once. Presence
+    changes go to a ``PresenceService`` (``presence.py``), which sends
+    batched, versioned deltas to local sockets.
+
+    Each socket is wrapped in a ``Connection`` with its own bounded send
+    queue, so a broadcast only enqueues one pre-encoded frame per subscriber
+    and a slow client never delays the rest. Sockets whose writer fails are
+    dropped from every channel.
+
+    Every channel event is also published on the pub/sub bus (``pubsub.py``)
+    so other workers deliver it to their own sockets and track presence. A
+    worker subscribes to a channel's topic only while it has local sockets
+    in that channel. Bus payloads are ``<kind><node_id><body>``.
+
+    Chat messages are also kept in a ``RecentMessages`` ring buffer
+    (``history.py``) for replay and first-page history. With a cross-process
+    bus this worker only sees a channel's messages while subscribed to it,
+    so the buffer is dropped when the worker unsubscribes.
     """
 
-    def __init__(self):
-        # channel_id -> {(user_id, WebSocket), ...}
-        self.active_channels: Dict[str, Set[tuple]] = {}
+    TOPIC_PREFIX = "channel:"
+    RESOURCE_TOPIC = "resources"
 
-    async def connect(self, channel_id: str, user_id: str, websocket: WebSocket):
-        """Register a user connection to a channel."""
+    def __init__(
+        self,
+        broker: Optional[Broker] = None,
+        presence_window_ms: float = PRESENCE_WINDOW_MS,
+        recent: Optional[RecentMessages] = None,
+    ):
+        self.recent = recent if recent is not None else recent_messages
+        self.presence = PresenceService(self, presence_window_ms)
+        self.registry = ConnectionRegistry(on_presence=self.presence.changed)
+        self.node_id = uuid.uuid4().hex
+        self.broker = broker if broker is not None else broker_from_url()
+        self.broker.set_handler(self._on_bus_message)
+        self._cleanup_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def active_channels(self) -> Dict[str, Dict[str, List[Connection]]]:
+        """channel_id -> {user_id: [Connection, ...]} for local sockets."""
+        return self.registry.channels
+
+    @property
+    def connections(self) -> Dict[WebSocket, Connection]:
+        """WebSocket -> Connection, for every open socket."""
+        return self.registry.sockets
+
+    async def accept(self, user_id: str, websocket: WebSocket) -> Connection:
+        """Accept a socket and register it, without joining any channel."""
         await websocket.accept()
-        if channel_id not in self.active_channels:
-            self.active_channels[channel_id] = set()
-        self.active_channels[channel_id].add((user_id, websocket))
-        logger.info(f"User {user_id} connected to channel {channel_id}")
+        conn = Connection(websocket, user_id, on_failure=self._on_connection_failure)
+        conn.start()
+        self.registry.sockets[websocket] = conn
+        return conn
+
+    async def connect(self, channel_id: str, user_id: str, websocket: WebSocket) -> Connection:
+        """Register a user connection to a channel."""
+        conn = await self.accept(user_id, websocket)
+        await self.subscribe(channel_id, conn)
+        logger.info("User %s connected to channel %s", user_id, channel_id, extra={"event": "ws_connected"})
+        return conn
+
+    async def subscribe(self, channel_id: str, conn: Connection):
+        """Add an accepted connection to a channel and send it presence."""
+        if channel_id in conn.channels:
+            return
+        await self._join(channel_id, conn)
+        self.send_presence_snapshot(channel_id, conn)
 
-    def disconnect(self, channel_id: str, user_id: str, websocket: WebSocket):
+    async def unsubscribe(self, channel_id: str, conn: Connection):
+        """Remove a connection from one channel; the socket stays open."""
+        await self._leave(channel_id, conn)
+
+    async def release(self, conn: Connection):
+        """Unregister a connection from every channel it is in."""
+        if self.registry.sockets.get(conn.websocket) is conn:
+            del self.registry.sockets[conn.websocket]
+        conn.stop()
+        for channel_id in list(conn.channels):
+            await self._leave(channel_id, conn)
+
+    async def disconnect(self, channel_id: str, user_id: str, websocket: WebSocket):
         """Unregister a user connection."""
-        if channel_id in self.active_channels:
-            self.active_channels[channel_id].discard((user_id, websocket))
-            if not self.active_channels[channel_id]:
-                del self.active_channels[channel_id]
-        logger.info(f"User {user_id} disconnected from channel {channel_id}")
-
-    async def broadcast_to_channel(self, channel_id: str, message: dict):
-        """Broadcast message to all users in a channel."""
-        if channel_id not in self.active_channels:
+        conn = self.registry.sockets.get(websocket)
+        if conn is None:
+            return  # already dropped after a failed send
+        await self._leave(channel_id, conn)
+        if not conn.channels:
+            del self.registry.sockets[websocket]
+            conn.stop()
+        logger.info("User %s disconnected from channel %s", user_id, channel_id, extra={"event": "ws_disconnected"})
+
+    async def disconnect_user(self, user_id: str) -> int:
+        """Close every local connection of a user; returns how many were closed."""
+        conns = list(self.registry.user_connections(user_id))
+        for conn in conns:
+            await self.release(conn)
+            try:
+                await conn.websocket.close()
+            except Exception:
+                pass
+        if conns:
+            logger.info("Closed %s connection(s) of user %s", len(conns), user_id)
+        return len(conns)
+
+    async def _join(self, channel_id: str, conn: Connection):
+        if channel_id not in self.registry.channels:
+            # Subscribe before indexing so the first socket misses nothing.
+            await self.broker.subscribe(self.TOPIC_PREFIX + channel_id)
+            self.registry.add(channel_id, conn)
+            # Ask other workers who they have online in this channel.
+            await self._publish(channel_id, _SYNC, "")
+        else:
+            self.registry.add(channel_id, conn)
+        await self._publish(channel_id, _JOIN, conn.user_id)
+
+    async def _leave(self, channel_id: str, conn: Connection):
+        emptied = self.registry.remove(channel_id, conn)
+        if emptied is None:
+            return
+        if emptied:
+            self.presence.forget(channel_id)
+            if not self.tracks_history(channel_id):
+                self.recent.discard(channel_id)
+            await self.broker.unsubscribe(self.TOPIC_PREFIX + channel_id)
+        await self._publish(channel_id, _LEAVE, conn.user_id)
+
+    def _on_connection_failure(self, conn: Connection):
+        """Drop a connection whose writer failed or that was too slow."""
+        if self.registry.sockets.get(conn.websocket) is not conn:
             return
+        del self.registry.sockets[conn.websocket]
+
+        async def cleanup():
+            for channel_id in list(conn.channels):
+                await self._leave(channel_id, conn)
+
+        task = asyncio.get_running_loop().create_task(cleanup())
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_tasks.discard)
+
+    async def broadcast_to_channel(self, channel_id: str, message: dict, coalesce_key: Optional[str] = None):
+        """Broadcast message to all users in a channel, on every worker.
+
+        Frames sent with a ``coalesce_key`` may replace an older queued frame
+        with the same key for slow consumers (see ``connections.py``).
+        """
         payload = json.dumps(message)
-        for user_id, ws in list(self.active_channels[channel_id]):
-            try:
-                await ws.send_text(payload)
-            except Exception as e:
-                logger.exception(f"Failed to send to user {user_id}: {e}")
+        self._deliver_local(channel_id, payload, coalesce_key)
+        if coalesce_key is None:
+            await self._publish(channel_id, _MESSAGE, payload)
+        else:
+            await self._publish(channel_id, _KEYED_MESSAGE, coalesce_key + "\n" + payload)
+
+    async def broadcast_message(self, row: dict):
+        """Broadcast a chat message row and record it in the recent-history buffer."""
+        channel_id = row["channel_id"]
+        payload = json.dumps(message_frame(row))
+        self.recent.record(row)
+        self._deliver_local(channel_id, payload)
+        await self._publish(channel_id, _CHAT, payload)
+
+    async def broadcast_batch(self, channel_id: str, rows: List[dict], total: int):
+        """Broadcast messages inserted together as one ``message_batch`` frame.
+
+        ``rows`` are the newest of the ``total`` messages, oldest first. When
+        some were left out the frame has ``complete: false`` (clients reload
+        history over REST) and the channel's recent-history buffer is dropped.
+        """
+        frame = {
+            "type": "message_batch",
+            "channel_id": channel_id,
+            "messages": [message_frame(row) for row in rows],
+            "complete": len(rows) == total,
+        }
+        payload = json.dumps(frame)
+        self._record_batch(channel_id, rows, frame["complete"])
+        self._deliver_local(channel_id, payload)
+        await self._publish(channel_id, _CHAT_BATCH, payload)
+
+    def _record_batch(self, channel_id: str, rows: List[dict], complete: bool):
+        if not complete:
+            self.recent.discard(channel_id)
+            return
+        for row in rows:
+            self.recent.record(row)
+
+    def tracks_history(self, channel_id: str) -> bool:
+        """Whether every message of the channel passes through this process."""
+        return isinstance(self.broker, InMemoryBroker) or channel_id in self.registry.channels
+
+    def _deliver_local(self, channel_id: str, payload: str, coalesce_key: Optional[str] = None):
+        start = time.perf_counter()
+        members = self.registry.members(channel_id)
+        for conn in members:
+            conn.send(payload, coalesce_key)
+        broadcast_seconds.observe(time.perf_counter() - start)
+        broadcast_recipients.observe(len(members))
+
+    def get_online_users(self, channel_id: str) -> KeysView:
+        """Online user IDs in a channel across all workers (a live, set-like view)."""
+        return self.registry.online_users(channel_id)
+
+    def is_online(self, channel_id: str, user_id: str) -> bool:
+        return self.registry.is_online(channel_id, user_id)
+
+    def send_presence_snapshot(self, channel_id: str, conn: Connection):
+        """Queue a full presence snapshot for one socket."""
+        conn.send(json.dumps(self.presence.snapshot(channel_id)), coalesce_key=f"presence:{channel_id}")
 
-    def get_online_users(self, channel_id: str) -> set:
-        """Get set of online user IDs in a channel."""
-        if channel_id not in self.active_channels:
-            return set()
-        return {user_id for user_id, ws in self.active_channels[channel_id]}
+    async def _publish(self, channel_id: str, kind: str, body: str):
+        try:
+            await self.broker.publish(self.TOPIC_PREFIX + channel_id, kind + self.node_id + body)
+        except Exception as e:
+            logger.exception("Failed to publish to channel %s: %s", channel_id, e)
+
+    async def watch_resources(self):
+        """Receive the resource versions other workers publish."""
+        await self.broker.subscribe(self.RESOURCE_TOPIC)
+
+    async def publish_version(self, key: str, version: str):
+        """Tell other workers ``key`` has a new version (``resource_versions.publish``)."""
+        try:
+            await self.broker.publish(self.RESOURCE_TOPIC, _VERSION + self.node_id + key + " " + version)
+        except Exception as e:
+            logger.exception("Failed to publish version of %s: %s", key, e)
+
+    async def _on_bus_message(self, topic: str, payload: str):
+        """Apply an event published by another worker."""
+        kind, origin, body = payload[:1], payload[1:33], payload[33:]
+        if topic == self.RESOURCE_TOPIC:
+            if origin != self.node_id:
+                key, _, version = body.rpartition(" ")
+                resource_versions.apply(key, version)
+            return
+        channel_id = topic[len(self.TOPIC_PREFIX):]
+        if origin == self.node_id or channel_id not in self.registry.channels:
+            return
+        if kind == _CHAT:
+            self.recent.record(row_from_frame(json.loads(body)))
+            self._deliver_local(channel_id, body)
+        elif kind == _CHAT_BATCH:
+            frame = json.loads(body)
+            self._record_batch(channel_id, [row_from_frame(m) for m in frame["messages"]], frame["complete"])
+            self._deliver_local(channel_id, body)
+        elif kind == _MESSAGE:
+            self._deliver_local(channel_id, body)
+        elif kind == _KEYED_MESSAGE:
+            coalesce_key, _, frame = body.partition("\n")
+            self._deliver_local(channel_id, frame, coalesce_key)
+        elif kind == _JOIN:
+            self.registry.remote_delta(channel_id, origin, body, 1)
+        elif kind == _LEAVE:
+            self.registry.remote_delta(channel_id, origin, body, -1)
+        elif kind == _SYNC:
+            await self._publish(channel_id, _SNAPSHOT, json.dumps(self.registry.local_counts(channel_id)))
+        elif kind == _SNAPSHOT:
+            self.registry.remote_snapshot(channel_id, origin, json.loads(body))
+
+    async def close(self):
+        """Tell other workers this worker's users are gone and leave the bus."""
+        self.presence.close()
+        for channel_id in list(self.registry.channels):
+            await self._publish(channel_id, _SNAPSHOT, "{}")
+        for conn in self.registry.sockets.values():
+            conn.stop()
+        await self.broker.close()
 
 
 manager = ChannelConnectionManager()
+resource_versions.publish = manager.publish_version
+metrics.gauge("ws_connections", "Open WebSocket connections on this worker", lambda: len(manager.registry.sockets))
+metrics.gauge("ws_channels", "Channels with local WebSocket subscribers", lambda: len(manager.registry.channels))
+
+
+async def _member_channels(user_id: str, channel_ids: List[str]) -> Set[str]:
+    """The subset of ``channel_ids`` the user is a member of.
+
+    Served from ``entity_cache``; a miss loads all of the user's memberships
+    in one query, in a short-lived session so an idle socket never pins a
+    pooled connection.
+    """
+    return await entity_cache.member_channels(user_id, channel_ids)
+
+
+async def _send_message(channel_id: str, user_id: str, content: str):
+    """Persist a message (group-committed; see persistence.py) and broadcast it."""
+    msg = await message_writer.submit(new_message_row(channel_id, user_id, content))
+    await manager.broadcast_message(msg)
+
+
+async def _replay(channel_id: str, conn: Connection, last_seen_id: str):
+    """Send a reconnecting socket what it missed after ``last_seen_id``.
+
+    The gap comes from the recent-history buffer when it still holds
+    ``last_seen_id``, otherwise from the database (up to ``WS_REPLAY_LIMIT``
+    messages). ``complete`` is false when the client should page the rest
+    over REST.
+    """
+    rows = manager.recent.since(channel_id, last_seen_id) if manager.tracks_history(channel_id) else None
+    complete = True
+    if rows is None:
+        async with AsyncSessionLocal() as db:
+            cursor = (await db.execute(select(Message.created_at, Message.id).where(
+                Message.id == last_seen_id,
+                Message.channel_id == channel_id,
+            ))).first()
+            if cursor is None:
+                rows, complete = [], False
+            else:
+                found = (await db.scalars(
+                    select(Message)
+                    .where(Message.channel_id == channel_id, tuple_(Message.created_at, Message.id) > tuple(cursor))
+                    .order_by(Message.created_at.asc(), Message.id.asc())
+                    .limit(WS_REPLAY_LIMIT + 1)
+                )).all()
+                complete = len(found) <= WS_REPLAY_LIMIT
+                rows = [row_from_model(m) for m in found[:WS_REPLAY_LIMIT]]
+    conn.send(json.dumps({
+        "type": "replay",
+        "channel_id": channel_id,
+        "messages": [message_frame(row) for row in rows],
+        "complete": complete,
+    }))
 
 
 @router.websocket("/channels/{channel_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, channel_id: str, user_id: str):
-    """WebSocket endpoint for real-time channel messaging."""
-    db: Session = SessionLocal()
+async def websocket_endpoint(
+    websocket: WebSocket, channel_id: str, user_id: str, last_seen_id: Optional[str] = None
+):
+    """WebSocket endpoint for real-time channel messaging.
+
+    Reconnecting clients pass the id of the last message they saw as
+    ``last_seen_id`` and receive the gap as one ``replay`` frame. An
+    ``{"type": "ack", "message_id": ...}`` frame marks the channel read up
+    to that message. A session token for ``user_id`` goes in ``token``
+    (see auth.py).
+    """
+    if not websocket_authorized(websocket, user_id):
+        await websocket.close(code=1008, reason="Invalid or missing token")
+        return
     try:
         # Verify user is member of channel
-        member = db.query(ChannelMember).filter(
-            ChannelMember.user_id == user_id,
-            ChannelMember.channel_id == channel_id
-        ).first()
-        if not member:
-            await websocket.close(code=403, reason="Not a member of this channel")
-            return
-
-        await manager.connect(channel_id, user_id, websocket)
+        with query_log.record("WS connect /api/v1/channels/{channel_id}/{user_id}"):
+            if not await _member_channels(user_id, [channel_id]):
+                await websocket.close(code=403, reason="Not a member of this channel")
+                return
 
-        # Send online users list
-        online_users = manager.get_online_users(channel_id)
-        await manager.broadcast_to_channel(channel_id, {
-            "type": "user_joined",
-            "user_id": user_id,
-            "online_users": list(online_users),
-        })
+            # Joining queues a presence snapshot; other members get a batched
+            # delta (see presence.py).
+            conn = await manager.connect(channel_id, user_id, websocket)
+            if last_seen_id:
+                await _replay(channel_id, conn, last_seen_id)
 
         while True:
             data = await websocket.receive_text()
@@ -91,43 +408,123 @@ async def websocket_endpoint(websocket: WebSocket, channel_id: str, user_id: str
                 # Try to parse as JSON; if fails, treat as raw message content
                 try:
                     payload = json.loads(data)
-                    content = payload.get("content", "").strip()
                 except json.JSONDecodeError:
                     # Treat raw text as message content
                     content = data.strip()
-                
+                else:
+                    if not isinstance(payload, dict):
+                        conn.send(json.dumps({"error": "JSON frames must be objects"}))
+                        continue
+                    if payload.get("type") == "presence_sync":
+                        manager.send_presence_snapshot(channel_id, conn)
+                        continue
+                    if payload.get("type") == "ack":
+                        if isinstance(payload.get("message_id"), str):
+                            read_cursors.ack(user_id, channel_id, payload["message_id"])
+                        continue
+                    content = payload.get("content", "")
+                    if not isinstance(content, str):
+                        conn.send(json.dumps({"error": "content must be a string"}))
+                        continue
+                    content = content.strip()
+
                 if not content:
-                    await websocket.send_text(json.dumps({"error": "Empty message"}))
+                    conn.send(json.dumps({"error": "Empty message"}))
+                    continue
+
+                await _send_message(channel_id, user_id, content)
+
+            except Exception as e:
+                logger.exception("Error processing message: %s", e)
+
+    except WebSocketDisconnect:
+        await manager.disconnect(channel_id, user_id, websocket)
+    except Exception as e:
+        logger.exception("WebSocket error: %s", e)
+        await manager.disconnect(channel_id, user_id, websocket)
+
+
+@router.websocket("/ws/{user_id}")
+async def multiplexed_websocket_endpoint(websocket: WebSocket, user_id: str):
+    """One socket for all of a user's channels.
+
+    Client frames are JSON objects with a ``type``:
+
+    - ``subscribe``: ``channel_id`` or ``channel_ids``; answered with
+      ``{"type": "subscribed", "channel_id": ...}`` and a presence snapshot
+      per channel the user is a member of. ``last_seen_ids`` (channel_id ->
+      message id) replays what was missed, as on the single-channel route
+    - ``unsubscribe``: ``channel_id``; answered with ``unsubscribed``
+    - ``send``: ``channel_id`` and ``content``
+    - ``presence_sync``: ``channel_id``
+    - ``ack``: ``channel_id`` and ``message_id``; marks the channel read up
+      to that message (see read_cursors.py)
+
+    Server frames carry ``channel_id``; errors are
+    ``{"error": ..., "channel_id": ...}``. A session token for ``user_id``
+    goes in the ``token`` query parameter (see auth.py).
+    """
+    if not websocket_authorized(websocket, user_id):
+        await websocket.close(code=1008, reason="Invalid or missing token")
+        return
+    conn = await manager.accept(user_id, websocket)
+    logger.info("User %s connected (multiplexed)", user_id, extra={"event": "ws_connected"})
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                payload = json.loads(data)
+                kind = payload.get("type")
+                channel_id = payload.get("channel_id")
+
+                if kind == "subscribe":
+                    with query_log.record("WS subscribe /api/v1/ws/{user_id}"):
+                        requested = payload.get("channel_ids") or [channel_id]
+                        requested = [c for c in requested if isinstance(c, str) and c not in conn.channels]
+                        allowed = await _member_channels(user_id, requested) if requested else set()
+                        last_seen = payload.get("last_seen_ids") or {}
+                        for cid in requested:
+                            if cid in allowed:
+                                conn.send(json.dumps({"type": "subscribed", "channel_id": cid}))
+                                await manager.subscribe(cid, conn)
+                                if last_seen.get(cid):
+                                    await _replay(cid, conn, last_seen[cid])
+                            else:
+                                conn.send(json.dumps({"error": "Not a member of this channel", "channel_id": cid}))
                     continue
 
-                # Persist message
-                msg = Message(channel_id=channel_id, sender_id=user_id, content=content)
-                db.add(msg)
-                db.commit()
-                db.refresh(msg)
-
-                # Broadcast to all users in channel
-                await manager.broadcast_to_channel(channel_id, {
-                    "type": "message",
-                    "id": msg.id,
-                    "sender_id": user_id,
-                    "content": content,
-                    "created_at": msg.created_at.isoformat(),
-                })
+                if channel_id not in conn.channels:
+                    conn.send(json.dumps({"error": "Not subscribed to this channel", "channel_id": channel_id}))
+                elif kind == "unsubscribe":
+                    await manager.unsubscribe(channel_id, conn)
+                    conn.send(json.dumps({"type": "unsubscribed", "channel_id": channel_id}))
+                elif kind == "presence_sync":
+                    manager.send_presence_snapshot(channel_id, conn)
+                elif kind == "ack":
+                    if isinstance(payload.get("message_id"), str):
+                        read_cursors.ack(user_id, channel_id, payload["message_id"])
+                    else:
+                        conn.send(json.dumps({"error": "Missing message_id", "channel_id": channel_id}))
+                elif kind == "send":
+                    content = payload.get("content", "")
+                    if not isinstance(content, str):
+                        conn.send(json.dumps({"error": "content must be a string", "channel_id": channel_id}))
+                    elif not (content := content.strip()):
+                        conn.send(json.dumps({"error": "Empty message", "channel_id": channel_id}))
+                    else:
+                        await _send_message(channel_id, user_id, content)
+                else:
+                    conn.send(json.dumps({"error": f"Unknown frame type: {kind}", "channel_id": channel_id}))
 
+            except (json.JSONDecodeError, AttributeError):
+                conn.send(json.dumps({"error": "Frames must be JSON objects"}))
             except Exception as e:
-                logger.exception(f"Error processing message: {e}")
+                logger.exception("Error processing frame: %s", e)
 
     except WebSocketDisconnect:
-        manager.disconnect(channel_id, user_id, websocket)
-        online_users = manager.get_online_users(channel_id)
-        await manager.broadcast_to_channel(channel_id, {
-            "type": "user_left",
-            "user_id": user_id,
-            "online_users": list(online_users),
-        })
+        pass
     except Exception as e:
-        logger.exception(f"WebSocket error: {e}")
-        manager.disconnect(channel_id, user_id, websocket)
+        logger.exception("WebSocket error: %s", e)
     finally:
-        db.close()
+        await manager.release(conn)
+        logger.info("User %s disconnected (multiplexed)", user_id, extra={"event": "ws_disconnected"})
@@ -1,25 +1,46 @@
 """Create and configure the FastAPI app."""
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.exceptions import ResponseValidationError
 from fastapi import HTTPException
 import traceback
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import crypto, http_cache, metrics, query_log
+from .logging_config import ensure_logging
 from .database import init_db
 from .api import register_api
+from .api.v1.ws import manager
+from .persistence import message_writer
+from .read_cursors import read_cursors
 
 init_db()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Served by something other than main.py (uvicorn/gunicorn directly).
+    ensure_logging()
+    await manager.watch_resources()
+    await crypto.start()
+    yield
+    # Flush queued messages before the worker exits.
+    await message_writer.close()
+    await read_cursors.close()
+    await manager.close()
+    crypto.close()
+
+
 def create_app() -> FastAPI:
     """Return configured FastAPI application."""
     app = FastAPI(
         title="ChatWebApp API",
         description="A real-time chat application backend",
         version="1.0.0",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -52,6 +73,7 @@ def create_app() -> FastAPI:
         return JSONResponse(
             status_code=exc.status_code,
             content={"error": "http_error", "detail": exc.detail},
+            headers=exc.headers,
         )
 
     @app.exception_handler(Exception)
@@ -62,6 +84,17 @@ def create_app() -> FastAPI:
             content={"error": "internal_server_error", "detail": str(exc), "trace": tb},
         )
 
+    if http_cache.HTTP_COMPRESS_MIN_BYTES:
+        app.add_middleware(http_cache.CompressionMiddleware)
+    if query_log.QUERY_LOG_ENABLED:
+        app.add_middleware(query_log.QueryLogMiddleware)
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics_endpoint():
+            return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
     register_api(app)
 
     return app
@@ -0,0 +1,310 @@
+"""Tiered message retention: cold history in compressed segment files.
+
+Messages older than their channel's retention (``Channel.retention_days``,
+else ``MESSAGE_RETENTION_DAYS``) are moved out of the ``messages`` table by
+``python backend/archive_messages.py`` into segment files under
+``ARCHIVE_DIR``: one file per channel per calendar month and run, of up to
+``ARCHIVE_SEGMENT_ROWS`` messages. Files are written once and never
+changed; later runs add new ones. ``message_segments`` records each file
+and its ``(created_at, id)`` range, in the same transaction that deletes
+the rows from the hot table, so the table and its indexes stay bounded by
+the retention window. ``get_channel_messages`` continues into the
+segments when a page reaches past the hot table, and exports
+(``export.py``) read them before the hot rows.
+
+Segment layout::
+
+    magic
+    blocks      zlib-compressed JSON arrays, ARCHIVE_BLOCK_ROWS messages each
+    index       zlib-compressed JSON: first key, offset, length, rows per block
+    id table    sorted uint64 hashes of the message ids, then the uint32
+                block of each, so an id is found without scanning
+    trailer     magic, index offset/length, id table offset/count
+
+Readers memory-map a segment and decompress only the blocks a page needs.
+Archived messages are no longer in the full-text search index.
+"""
+
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta, UTC
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, tuple_
+
+from .models import Channel, Message, MessageSegment
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "90"))
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "100000"))
+ARCHIVE_BLOCK_ROWS = int(os.getenv("ARCHIVE_BLOCK_ROWS", "256"))
+# Segments kept memory-mapped per process.
+ARCHIVE_OPEN_SEGMENTS = int(os.getenv("ARCHIVE_OPEN_SEGMENTS", "64"))
+
+_MAGIC = b"CWSEG001"
+_TRAILER = struct.Struct("<8sQIQI")
+_COLUMNS = (Message.id, Message.sender_id, Message.content, Message.status, Message.created_at)
+
+Key = Tuple[datetime, str]
+
+
+def _id_hash(message_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(message_id.encode(), digest_size=8).digest(), "little")
+
+
+def _key(record: list) -> Key:
+    return datetime.fromisoformat(record[4]), record[0]
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    """``moment`` as timestamps are stored: naive UTC (naive input is taken as UTC)."""
+    return moment if moment.tzinfo is None else moment.astimezone(UTC).replace(tzinfo=None)
+
+
+def _stored(key: Optional[Key]) -> Optional[Key]:
+    """``key`` with its timestamp as stored: naive UTC."""
+    return key if key is None else (_naive_utc(key[0]), key[1])
+
+
+def _row(channel_id: str, record: list) -> dict:
+    """A message row, as ``history.row_from_model`` builds them."""
+    created_at = datetime.fromisoformat(record[4])
+    return {
+        "id": record[0], "channel_id": channel_id, "sender_id": record[1],
+        "content": record[2], "status": record[3],
+        "created_at": created_at if created_at.tzinfo else created_at.replace(tzinfo=UTC),
+    }
+
+
+def write_segment(path: str, rows: Sequence) -> None:
+    """Write ``rows`` (ascending by ``(created_at, id)``) as a new segment file."""
+    blocks, ids = [], []
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(_MAGIC)
+        for start in range(0, len(rows), ARCHIVE_BLOCK_ROWS):
+            block = rows[start:start + ARCHIVE_BLOCK_ROWS]
+            data = zlib.compress(json.dumps(
+                [[r.id, r.sender_id, r.content, r.status, r.created_at.isoformat()] for r in block]
+            ).encode())
+            ids.extend((_id_hash(r.id), len(blocks)) for r in block)
+            blocks.append([block[0].created_at.isoformat(), block[0].id, fh.tell(), len(data), len(block)])
+            fh.write(data)
+        index = zlib.compress(json.dumps(blocks).encode())
+        index_offset = fh.tell()
+        fh.write(index)
+        fh.write(b"\0" * (-fh.tell() % 8))  # align the id table
+        ids_offset = fh.tell()
+        ids.sort()
+        fh.write(array("Q", (h for h, _ in ids)).tobytes())
+        fh.write(array("I", (b for _, b in ids)).tobytes())
+        fh.write(_TRAILER.pack(_MAGIC, index_offset, len(index), ids_offset, len(ids)))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class Segment:
+    """A read-only, memory-mapped segment file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length, ids_offset, count = _TRAILER.unpack_from(
+            self._mm, len(self._mm) - _TRAILER.size
+        )
+        if magic != _MAGIC:
+            raise ValueError(f"Not a message segment: {path}")
+        blocks = json.loads(zlib.decompress(self._mm[index_offset:index_offset + index_length]))
+        self._first_keys = [(datetime.fromisoformat(ts), message_id) for ts, message_id, *_ in blocks]
+        self._extents = [(offset, length) for _, _, offset, length, _ in blocks]
+        view = memoryview(self._mm)
+        self._hashes = view[ids_offset:ids_offset + 8 * count].cast("Q")
+        self._id_blocks = view[ids_offset + 8 * count:ids_offset + 12 * count].cast("I")
+        # Last block decoded: a cursor lookup is followed by a read around it.
+        self._last: Tuple[int, List[list]] = (-1, [])
+
+    def _block(self, n: int) -> List[list]:
+        if self._last[0] != n:
+            offset, length = self._extents[n]
+            self._last = (n, json.loads(zlib.decompress(self._mm[offset:offset + length])))
+        return self._last[1]
+
+    def before(self, key: Optional[Key], limit: int) -> List[list]:
+        """Up to ``limit`` records older than ``key`` (or the newest), newest first."""
+        n = len(self._extents) - 1 if key is None else bisect.bisect_left(self._first_keys, key) - 1
+        records = []
+        while n >= 0 and len(records) < limit:
+            for record in reversed(self._block(n)):
+                if key is None or _key(record) < key:
+                    records.append(record)
+                    if len(records) == limit:
+                        break
+            n -= 1
+        return records
+
+    def after(self, key: Key, limit: int) -> List[list]:
+        """Up to ``limit`` records newer than ``key``, oldest first."""
+        n = max(bisect.bisect_right(self._first_keys, key) - 1, 0)
+        records = []
+        while n < len(self._extents) and len(records) < limit:
+            for record in self._block(n):
+                if _key(record) > key:
+                    records.append(record)
+                    if len(records) == limit:
+                        break
+            n += 1
+        return records
+
+    def blocks(self, since: Optional[datetime] = None) -> Iterator[List[list]]:
+        """Records block by block, oldest first, from the block holding ``since``."""
+        first = 0 if since is None else max(bisect.bisect_left(self._first_keys, (since, "")) - 1, 0)
+        for n in range(first, len(self._extents)):
+            yield self._block(n)
+
+    def locate(self, message_id: str) -> Optional[Key]:
+        """The key of ``message_id`` if it is in this segment."""
+        h = _id_hash(message_id)
+        i = bisect.bisect_left(self._hashes, h)
+        while i < len(self._hashes) and self._hashes[i] == h:
+            for record in self._block(self._id_blocks[i]):
+                if record[0] == message_id:
+                    return _key(record)
+            i += 1
+        return None
+
+
+@functools.lru_cache(maxsize=ARCHIVE_OPEN_SEGMENTS)
+def open_segment(path: str) -> Segment:
+    return Segment(os.path.join(ARCHIVE_DIR, path))
+
+
+# Reading (request path)
+
+async def _segment_paths(db, channel_id: str, newest_first: bool, **bounds) -> List[str]:
+    query = select(MessageSegment.path).where(MessageSegment.channel_id == channel_id)
+    if "before" in bounds:
+        query = query.where(MessageSegment.first_created_at <= bounds["before"])
+    if "after" in bounds:
+        query = query.where(MessageSegment.last_created_at >= bounds["after"])
+    order = (MessageSegment.last_created_at, MessageSegment.last_id)
+    query = query.order_by(*(c.desc() for c in order) if newest_first else order)
+    return list(await db.scalars(query))
+
+
+async def read_before(db, channel_id: str, key: Optional[Key], limit: int) -> List[dict]:
+    """Up to ``limit`` archived messages older than ``key`` (or the newest), newest first."""
+    key, records = _stored(key), []
+    bounds = {"before": key[0]} if key else {}
+    for path in await _segment_paths(db, channel_id, newest_first=True, **bounds):
+        records.extend(open_segment(path).before(key, limit - len(records)))
+        if len(records) >= limit:
+            break
+    return [_row(channel_id, r) for r in records]
+
+
+async def read_after(db, channel_id: str, key: Key, limit: int) -> List[dict]:
+    """Up to ``limit`` archived messages newer than ``key``, oldest first."""
+    key, records = _stored(key), []
+    for path in await _segment_paths(db, channel_id, newest_first=False, after=key[0]):
+        records.extend(open_segment(path).after(key, limit - len(records)))
+        if len(records) >= limit:
+            break
+    return [_row(channel_id, r) for r in records]
+
+
+async def read_range(db, channel_id: str, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> AsyncIterator[List[dict]]:
+    """Archived messages created in ``[since, until)``, oldest first, a block at a time."""
+    since = _stored((since, ""))[0] if since else None
+    until = _stored((until, ""))[0] if until else None
+    bounds = {"after": since} if since else {}
+    if until:
+        bounds["before"] = until
+    for path in await _segment_paths(db, channel_id, newest_first=False, **bounds):
+        for block in open_segment(path).blocks(since):
+            rows = [_row(channel_id, r) for r in block
+                    if (since is None or _key(r)[0] >= since) and (until is None or _key(r)[0] < until)]
+            if rows:
+                yield rows
+            if until and _key(block[-1])[0] >= until:
+                return
+
+
+async def locate(db, channel_id: str, message_id: str) -> Optional[Key]:
+    """The ``(created_at, id)`` key of an archived message, if any."""
+    for path in await _segment_paths(db, channel_id, newest_first=True):
+        key = open_segment(path).locate(message_id)
+        if key is not None:
+            return key
+    return None
+
+
+# Archiving (batch job)
+
+def _next_month(moment: datetime) -> datetime:
+    return (moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=32)).replace(day=1)
+
+
+def archive_channel(engine, channel_id: str, cutoff: datetime) -> int:
+    """Move the channel's messages created before ``cutoff`` into segments.
+
+    Each segment is written and fsynced before the transaction that
+    registers it and deletes its rows, so a crash leaves at worst an
+    unregistered file. Returns the number of messages moved.
+    """
+    cutoff = _naive_utc(cutoff)
+    directory = os.path.join(ARCHIVE_DIR, channel_id)
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            hot = (Message.channel_id == channel_id, Message.created_at < cutoff)
+            first = conn.execute(
+                select(Message.created_at).where(*hot).order_by(Message.created_at, Message.id).limit(1)
+            ).scalar()
+            if first is None:
+                return moved
+            rows = conn.execute(
+                select(*_COLUMNS).where(*hot, Message.created_at < _next_month(first))
+                .order_by(Message.created_at, Message.id).limit(ARCHIVE_SEGMENT_ROWS)
+            ).all()
+            name = f"{rows[0].created_at:%Y%m%dT%H%M%S%f}-{rows[0].id[:8]}.seg"
+            os.makedirs(directory, exist_ok=True)
+            write_segment(os.path.join(directory, name), rows)
+            conn.execute(insert(MessageSegment).values(
+                channel_id=channel_id, path=f"{channel_id}/{name}", message_count=len(rows),
+                first_created_at=rows[0].created_at, first_id=rows[0].id,
+                last_created_at=rows[-1].created_at, last_id=rows[-1].id,
+            ))
+            conn.execute(delete(Message).where(
+                Message.channel_id == channel_id,
+                tuple_(Message.created_at, Message.id) <= (rows[-1].created_at, rows[-1].id),
+            ))
+        moved += len(rows)
+
+
+def run_archive(engine, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Archive every channel past its retention; returns messages moved per channel."""
+    now = now or datetime.now(UTC)
+    with engine.connect() as conn:
+        channels = conn.execute(select(Channel.id, Channel.retention_days)).all()
+    moved = {}
+    for channel_id, days in channels:
+        days = MESSAGE_RETENTION_DAYS if days is None else days
+        if days <= 0:
+            continue
+        count = archive_channel(engine, channel_id, now - timedelta(days=days))
+        if count:
+            moved[channel_id] = count
+            logger.info("Archived %s messages of channel %s", count, channel_id)
+    return moved
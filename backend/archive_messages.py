@@ -0,0 +1,28 @@
+"""Move messages past their channel's retention into archived segment files.
+
+Run periodically (e.g. daily from cron). Archived history stays readable
+through the messages API; see ``backend/archive.py``::
+
+    python backend/archive_messages.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    from backend.archive import ARCHIVE_DIR, run_archive
+    from backend.database import engine
+
+    moved = run_archive(engine)
+    print(f"Archived {sum(moved.values())} messages from {len(moved)} channels into {ARCHIVE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Signed session tokens.
+
+``login`` issues ``<user_id>.<role>.<expires>.<signature>``, where the
+signature is an HMAC-SHA256 (``AUTH_SECRET``) of the rest. Verifying one
+is a hash and a comparison: no database or cache lookup, so a request
+with a token knows its caller's id and role for free. A token stays valid
+until it expires (``AUTH_TOKEN_TTL_S``), even if the user's role changes;
+rotate ``AUTH_SECRET`` to revoke every token at once. Without
+``AUTH_SECRET`` each process signs with its own random key, so tokens do
+not survive a restart or validate across workers.
+
+REST requests send ``Authorization: Bearer <token>``; WebSockets, which
+browsers cannot give headers, pass ``?token=<token>`` on the handshake.
+Requests without a token fall back to the ``user_id`` parameter (looked up
+through ``entity_cache``) unless ``AUTH_REQUIRE_TOKEN`` is set. That
+fallback trusts whatever id the caller names; it only exists while clients
+move to tokens, and ``AUTH_REQUIRE_TOKEN`` will default to on once they
+have.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, WebSocket
+
+from .cache import entity_cache
+
+logger = logging.getLogger(__name__)
+
+AUTH_SECRET = os.getenv("AUTH_SECRET", "")
+AUTH_TOKEN_TTL_S = int(os.getenv("AUTH_TOKEN_TTL_S", str(24 * 3600)))
+# Off only for the migration to tokens: callers may name any user_id.
+AUTH_REQUIRE_TOKEN = os.getenv("AUTH_REQUIRE_TOKEN", "false").lower() in ("1", "true", "yes")
+
+if not AUTH_SECRET:
+    logger.warning("AUTH_SECRET is not set; signing tokens with a random per-process key "
+                   "(tokens will not survive a restart or work across workers)")
+_KEY = AUTH_SECRET.encode() or secrets.token_bytes(32)
+
+
+class Caller(NamedTuple):
+    """Who a request acts as. ``expires_at`` is 0 when there was no token."""
+    id: str
+    role: str
+    expires_at: int = 0
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_KEY, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue_token(user_id: str, role: str, ttl_s: Optional[int] = None,
+                now: Optional[float] = None) -> Tuple[str, int]:
+    """``(token, expires_at)`` for the user."""
+    expires_at = int(now if now is not None else time.time()) + (AUTH_TOKEN_TTL_S if ttl_s is None else ttl_s)
+    payload = f"{user_id}.{role}.{expires_at}"
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def verify_token(token: str, now: Optional[float] = None) -> Optional[Caller]:
+    """The token's claims, or None if it is malformed, forged or expired."""
+    payload, _, signature = token.rpartition(".")
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    user_id, _, rest = payload.rpartition(".")
+    user_id, _, role = user_id.rpartition(".")
+    try:
+        expires_at = int(rest)
+    except ValueError:
+        return None
+    if not user_id or expires_at <= (now if now is not None else time.time()):
+        return None
+    return Caller(user_id, role, expires_at)
+
+
+def _bearer(header: Optional[str]) -> Optional[str]:
+    if not header:
+        return None
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Expected a Bearer token")
+    return token.strip()
+
+
+async def caller(request: Request, user_id: Optional[str] = None) -> Caller:
+    """Dependency: the caller, from the bearer token or else ``user_id``.
+
+    A token must match ``user_id`` when both are given.
+    """
+    token = _bearer(request.headers.get("authorization"))
+    if token is not None:
+        claims = verify_token(token)
+        if claims is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        if user_id is not None and user_id != claims.id:
+            raise HTTPException(status_code=403, detail="Token does not belong to this user")
+        return claims
+    if AUTH_REQUIRE_TOKEN or user_id is None:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    user = await entity_cache.get_user(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return Caller(user.id, user.role)
+
+
+def websocket_authorized(websocket: WebSocket, user_id: str) -> bool:
+    """Whether the handshake may act as ``user_id`` (token in ``?token=`` or the header)."""
+    token = websocket.query_params.get("token")
+    if token is None:
+        header = websocket.headers.get("authorization", "")
+        if header.lower().startswith("bearer "):
+            token = header[7:].strip()
+    if token is None:
+        return not AUTH_REQUIRE_TOKEN
+    claims = verify_token(token)
+    return claims is not None and claims.id == user_id
@@ -0,0 +1,10 @@
+"""Benchmarks for ChatWebApp backend hot paths.
+
+Each module is a standalone script, run by path from the repo root, e.g.::
+
+    python backend/bench/history_pagination.py
+
+Benchmarks point ``DATABASE_URL`` at a scratch database before the backend
+package is first imported (which creates the engine), so they never touch the
+development ``test.db``. That is also why they are not run with ``-m``.
+"""
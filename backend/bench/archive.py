@@ -0,0 +1,145 @@
+"""Benchmark tiered retention: hot table size and paging before/after archiving.
+
+Seeds ``--messages`` messages over ``--channels`` channels, spread evenly
+over the last ``--days`` days, then runs ``archive.run_archive`` with a
+``--retention-days`` retention. Before and after, reports the rows, live
+B-tree pages and depth of ``messages`` and its indexes (SQLite ``dbstat``)
+and the latency of history pages through the API: one just behind the
+newest message (hot in both runs) and one deep in old history (archived in
+the second run).
+
+    python backend/bench/archive.py
+    python backend/bench/archive.py --messages 200000 --retention-days 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+os.environ["ARCHIVE_DIR"] = os.path.join(_TMPDIR, "archive")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from backend import archive  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.database import engine  # noqa: E402
+from backend.models import Channel, Message, User  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(size: int, channels: int, days: int, retention_days: int) -> dict:
+    """Returns, per channel, its message ids oldest first."""
+    user_id = str(uuid.uuid4())
+    channel_ids = [str(uuid.uuid4()) for _ in range(channels)]
+    now = datetime.now(UTC)
+    step = timedelta(days=days) / size
+    ids = {c: [] for c in channel_ids}
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": user_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), [
+            {"id": c, "name": f"bench-{c[:12]}", "retention_days": retention_days} for c in channel_ids
+        ])
+        for offset in range(0, size, 50_000):
+            rows = []
+            for i in range(offset, min(size, offset + 50_000)):
+                channel_id = channel_ids[i % channels]
+                rows.append({"id": str(uuid.uuid4()), "channel_id": channel_id, "sender_id": user_id,
+                             "content": f"message {i} in a channel with some history",
+                             "status": "sent", "seq": len(ids[channel_id]) + 1,
+                             "created_at": now - timedelta(days=days) + step * i})
+                ids[channel_id].append(rows[-1]["id"])
+            conn.execute(Message.__table__.insert(), rows)
+    return ids
+
+
+def table_stats() -> dict:
+    with engine.connect() as conn:
+        rows = conn.scalar(text("SELECT COUNT(*) FROM messages"))
+        btrees = conn.execute(text("""
+            SELECT s.name, COUNT(*) AS pages, MAX(LENGTH(s.path) - LENGTH(REPLACE(s.path, '/', ''))) AS depth
+            FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+            WHERE m.tbl_name = 'messages' GROUP BY s.name""")).all()
+    return {
+        "rows": rows,
+        "pages": sum(b.pages for b in btrees),
+        "max_depth": max(b.depth for b in btrees),
+    }
+
+
+async def time_pages(ids: dict, samples: int, limit: int) -> dict:
+    channel_id, channel_ids = next(iter(ids.items()))
+    cursors = {"recent": channel_ids[-1], "deep": channel_ids[len(channel_ids) // 10]}
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, cursor in cursors.items():
+            timings = []
+            for _ in range(samples):
+                t0 = time.perf_counter()
+                response = await client.get(f"/api/v1/messages/{channel_id}",
+                                            params={"before": cursor, "limit": limit})
+                timings.append((time.perf_counter() - t0) * 1000)
+                response.raise_for_status()
+            assert len(response.json()) == limit
+            results[f"{name}_p50_ms"] = round(_percentile(timings, 50), 2)
+            results[f"{name}_p99_ms"] = round(_percentile(timings, 99), 2)
+    return results
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=1_000_000)
+    p.add_argument("--channels", type=int, default=10)
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--retention-days", type=int, default=30)
+    p.add_argument("--samples", type=int, default=50)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    t0 = time.perf_counter()
+    ids = seed(args.messages, args.channels, args.days, args.retention_days)
+    print(f"seeded {args.messages} messages in {time.perf_counter() - t0:.1f}s")
+
+    results = [{"phase": "before", **table_stats(), **asyncio.run(time_pages(ids, args.samples, args.limit))}]
+    t0 = time.perf_counter()
+    moved = sum(archive.run_archive(engine).values())
+    archive_s = time.perf_counter() - t0
+    segment_bytes = sum(
+        os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(archive.ARCHIVE_DIR) for f in files
+    )
+    results.append({"phase": "after", **table_stats(), **asyncio.run(time_pages(ids, args.samples, args.limit))})
+    print(f"archived {moved} messages in {archive_s:.1f}s into {segment_bytes / 2**20:.1f} MB of segments")
+
+    print(f"{'phase':>7} {'rows':>9} {'pages':>7} {'depth':>6} {'recent p50':>11} {'recent p99':>11} "
+          f"{'deep p50':>9} {'deep p99':>9}")
+    for r in results:
+        print(f"{r['phase']:>7} {r['rows']:>9} {r['pages']:>7} {r['max_depth']:>6} {r['recent_p50_ms']:>11.2f} "
+              f"{r['recent_p99_ms']:>11.2f} {r['deep_p50_ms']:>9.2f} {r['deep_p99_ms']:>9.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "archive", "moved": moved, "archive_s": archive_s,
+                       "segment_bytes": segment_bytes, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark authorizing requests with a session token against ``user_id``.
+
+Sends ``GET /api/v1/users/{user_id}/unread`` (an authorized read with one
+query of its own) through the ASGI app, authorized three ways:
+
+- ``user_id cold``: the ``user_id`` parameter with the entity cache
+  cleared before every request, so the user is loaded from the database
+  (as every request did before the cache)
+- ``user_id cached``: the ``user_id`` parameter, user served from cache
+- ``token``: ``Authorization: Bearer`` and no lookup
+
+Modes are interleaved over ``--rounds`` rounds. Reports requests per
+second, SQL statements per request and the cost of ``verify_token``.
+
+    python backend/bench/auth.py
+    python backend/bench/auth.py --requests 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+
+from backend import auth  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.cache import entity_cache  # noqa: E402
+from backend.query_log import capture_queries  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MODES = ("user_id cold", "user_id cached", "token")
+
+
+async def run(requests: int, rounds: int, channels: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        session = (await client.post("/api/v1/users/register",
+                                     json={"name": "bench", "password": "pass123", "role": "admin"})).json()
+        user_id, headers = session["id"], {"Authorization": f"Bearer {session['access_token']}"}
+        for i in range(channels):
+            (await client.post("/api/v1/channels/", headers=headers, json={"name": f"bench-{i}"})).raise_for_status()
+
+        elapsed = dict.fromkeys(MODES, 0.0)
+        statements = dict.fromkeys(MODES, 0)
+        for _ in range(rounds):
+            for mode in MODES:
+                kwargs = {"headers": headers} if mode == "token" else {"params": {"user_id": user_id}}
+                with capture_queries() as log:
+                    t0 = time.perf_counter()
+                    for _ in range(requests // rounds):
+                        if mode == "user_id cold":
+                            entity_cache.clear()
+                        response = await client.get(f"/api/v1/users/{user_id}/unread", **kwargs)
+                        response.raise_for_status()
+                    elapsed[mode] += time.perf_counter() - t0
+                statements[mode] += log.count
+    return {mode: {"req_per_s": round(requests / elapsed[mode]),
+                   "statements_per_req": round(statements[mode] / requests, 2)} for mode in MODES}
+
+
+def time_verify(samples: int) -> float:
+    token, _ = auth.issue_token("00000000-0000-0000-0000-000000000000", "user")
+    t0 = time.perf_counter()
+    for _ in range(samples):
+        auth.verify_token(token)
+    return (time.perf_counter() - t0) / samples * 1e6
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--requests", type=int, default=3000)
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--channels", type=int, default=5)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    results = asyncio.run(run(args.requests, args.rounds, args.channels))
+    verify_us = time_verify(100_000)
+    print(f"{'auth':>15} {'req/s':>7} {'stmts/req':>10}")
+    for mode, r in results.items():
+        print(f"{mode:>15} {r['req_per_s']:>7} {r['statements_per_req']:>10.2f}")
+    print(f"verify_token: {verify_us:.2f} us")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "auth", "config": vars(args), "results": results,
+                       "verify_token_us": verify_us}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
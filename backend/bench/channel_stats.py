@@ -0,0 +1,123 @@
+"""Benchmark listing channels by activity: stored stats vs COUNT/MAX aggregation.
+
+Seeds ``--channels`` channels with ``--members`` members and
+``--messages`` messages each (stats filled by ``rebuild_channel_stats``),
+then times ``--repeat`` runs of the channel-list query, ordered by most
+recent message, as:
+
+- ``aggregate``: member count, message count and last activity computed
+  per channel with COUNT/MAX subqueries (what the list would need without
+  stored stats)
+- ``stored``: the ``member_count``/``message_count``/``last_message_at``
+  columns (what ``GET /channels/?sort=activity`` runs)
+
+and reports the time of one full ``rebuild_channel_stats``.
+
+    python backend/bench/channel_stats.py
+    python backend/bench/channel_stats.py --channels 500 --messages 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from backend.database import engine, init_db, rebuild_channel_stats  # noqa: E402
+from backend.models import Channel, ChannelMember, Message, User  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+def seed(channels: int, members: int, messages: int) -> None:
+    now = datetime.now(UTC)
+    users = [{"id": str(uuid.uuid4()), "name": f"user-{i}", "password": "x", "role": "user",
+              "created_at": now, "updated_at": now} for i in range(members)]
+    channel_rows = [{"id": str(uuid.uuid4()), "name": f"channel-{i}", "created_at": now, "updated_at": now}
+                    for i in range(channels)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Channel), channel_rows)
+        for c, channel in enumerate(channel_rows):
+            conn.execute(insert(ChannelMember), [{"user_id": u["id"], "channel_id": channel["id"], "joined_at": now}
+                                                 for u in users])
+            start = now - timedelta(days=c)
+            conn.execute(insert(Message), [
+                {"id": str(uuid.uuid4()), "channel_id": channel["id"], "sender_id": users[i % members]["id"],
+                 "content": f"message {i}", "status": "sent", "seq": i + 1,
+                 "created_at": start + timedelta(seconds=i), "updated_at": start}
+                for i in range(messages)])
+
+
+def aggregate_query():
+    def scalar(column, *where):
+        return select(column).where(*where).scalar_subquery()
+
+    last = scalar(func.max(Message.created_at), Message.channel_id == Channel.id)
+    return (select(Channel.id, Channel.name,
+                   scalar(func.count(), ChannelMember.channel_id == Channel.id).label("member_count"),
+                   scalar(func.count(), Message.channel_id == Channel.id).label("message_count"),
+                   last.label("last_message_at"))
+            .order_by(last.desc().nulls_last(), Channel.created_at.desc()))
+
+
+def stored_query():
+    return (select(Channel.id, Channel.name, Channel.member_count, Channel.message_count, Channel.last_message_at)
+            .order_by(Channel.last_message_at.desc().nulls_last(), Channel.created_at.desc()))
+
+
+def time_query(query, repeat: int) -> tuple:
+    rows, best = None, float("inf")
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            rows = conn.execute(query).all()
+            best = min(best, time.perf_counter() - t0)
+    return rows, best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--channels", type=int, default=200)
+    p.add_argument("--members", type=int, default=50)
+    p.add_argument("--messages", type=int, default=1000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    init_db()
+    seed(args.channels, args.members, args.messages)
+    t0 = time.perf_counter()
+    rebuild_channel_stats(engine)
+    rebuild_ms = (time.perf_counter() - t0) * 1000
+
+    aggregated, aggregate_s = time_query(aggregate_query(), args.repeat)
+    stored, stored_s = time_query(stored_query(), args.repeat)
+    assert [tuple(r)[:4] for r in aggregated] == [tuple(r)[:4] for r in stored]
+
+    results = [{"mode": "aggregate", "ms": round(aggregate_s * 1000, 2)},
+               {"mode": "stored", "ms": round(stored_s * 1000, 2)}]
+    print(f"{'mode':>10} {'ms/list':>9}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['ms']:>9.2f}")
+    print(f"rebuild_channel_stats: {rebuild_ms:.1f} ms for {args.channels} channels")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "channel_stats", "config": vars(args), "results": results,
+                       "rebuild_ms": round(rebuild_ms, 1)}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare two benchmark result files and flag regressions.
+
+Takes the ``--json`` output of two runs (e.g. ``load.py`` on two commits)
+and prints each metric's change. A metric regresses when it moves the
+wrong way by more than ``--tolerance`` (relative); the direction comes
+from the ``better`` map in the results. Exits with status 1 on any
+regression, so it can gate a CI job::
+
+    python backend/bench/compare.py baseline.json current.json
+    python backend/bench/compare.py baseline.json current.json --tolerance 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """Rows of ``(metric, before, after, change, verdict)``."""
+    better = {**baseline.get("better", {}), **current.get("better", {})}
+    rows = []
+    for name, after in current["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if not isinstance(after, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        change = (after - before) / abs(before) if before else (0.0 if after == before else float("inf"))
+        verdict = ""
+        direction = better.get(name)
+        if direction == "lower" and change > tolerance or direction == "higher" and change < -tolerance:
+            verdict = "REGRESSION"
+        elif direction == "lower" and change < -tolerance or direction == "higher" and change > tolerance:
+            verdict = "improved"
+        rows.append((name, before, after, change, verdict))
+    return rows
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative change (default 0.1 = 10%%)")
+    args = p.parse_args()
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.current) as fh:
+        current = json.load(fh)
+    if baseline.get("benchmark") != current.get("benchmark"):
+        sys.exit(f"Different benchmarks: {baseline.get('benchmark')} vs {current.get('benchmark')}")
+    if baseline.get("config") != current.get("config"):
+        print("warning: the runs used different configurations", file=sys.stderr)
+
+    rows = compare(baseline, current, args.tolerance)
+    print(f"{baseline.get('commit') or 'baseline'} -> {current.get('commit') or 'current'}")
+    width = max((len(r[0]) for r in rows), default=6)
+    print(f"{'metric':>{width}} {'before':>12} {'after':>12} {'change':>8}")
+    for name, before, after, change, verdict in rows:
+        print(f"{name:>{width}} {before:>12} {after:>12} {change:>+8.1%} {verdict}")
+    if any(r[4] == "REGRESSION" for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
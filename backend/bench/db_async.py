@@ -0,0 +1,134 @@
+"""Benchmark message persistence on the sync vs async database path.
+
+Runs N concurrent senders on one event loop, each persisting M messages the
+way the WebSocket handler does. The ``sync`` mode reproduces the old handler
+(``SessionLocal()`` + ``commit()`` + ``refresh()`` called from a coroutine);
+the ``async`` mode uses ``AsyncSessionLocal``. Alongside throughput and
+per-message latency it reports event-loop lag: how late a 1 ms ticker wakes
+up, i.e. how long every other socket on the worker is stalled.
+
+    python backend/bench/db_async.py
+    python backend/bench/db_async.py --senders 1 10 50 --messages 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import AsyncSessionLocal, SessionLocal  # noqa: E402
+from backend.models import User, Channel, ChannelMember, Message  # noqa: E402
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def setup() -> tuple:
+    """Create a sender and a channel they belong to."""
+    db = SessionLocal()
+    try:
+        user = User(name=f"bench-{uuid.uuid4().hex[:8]}", password="-")
+        channel = Channel(name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add_all([user, channel])
+        db.flush()
+        db.add(ChannelMember(user_id=user.id, channel_id=channel.id))
+        db.commit()
+        return user.id, channel.id
+    finally:
+        db.close()
+
+
+async def _sync_send(user_id: str, channel_id: str, content: str) -> None:
+    db = SessionLocal()
+    try:
+        msg = Message(channel_id=channel_id, sender_id=user_id, content=content)
+        db.add(msg)
+        db.commit()
+        db.refresh(msg)
+    finally:
+        db.close()
+
+
+async def _async_send(user_id: str, channel_id: str, content: str) -> None:
+    async with AsyncSessionLocal() as db:
+        db.add(Message(channel_id=channel_id, sender_id=user_id, content=content))
+        await db.commit()
+
+
+async def run(mode: str, senders: int, messages: int, user_id: str, channel_id: str) -> dict:
+    send = _sync_send if mode == "sync" else _async_send
+    latencies, lags = [], []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - t0 - 0.001) * 1000)
+
+    async def sender(n: int):
+        for i in range(messages):
+            t0 = time.perf_counter()
+            await send(user_id, channel_id, f"sender {n} message {i}")
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    probe = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(sender(n) for n in range(senders)))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await probe
+
+    return {
+        "mode": mode,
+        "senders": senders,
+        "messages": senders * messages,
+        "msgs_per_s": round(senders * messages / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 50), 3),
+        "latency_p99_ms": round(_percentile(latencies, 99), 3),
+        "loop_lag_p99_ms": round(_percentile(lags or [0.0], 99), 3),
+        "loop_lag_max_ms": round(max(lags or [0.0]), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--senders", type=int, nargs="+", default=[1, 10, 50])
+    p.add_argument("--messages", type=int, default=100, help="Messages per sender")
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    user_id, channel_id = setup()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, n, args.messages, user_id, channel_id)
+            for n in args.senders
+            for mode in ("sync", "async")
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>6} {'senders':>8} {'msgs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'lag p99':>8} {'lag max':>8}")
+    for r in results:
+        print(f"{r['mode']:>6} {r['senders']:>8} {r['msgs_per_s']:>9.1f} {r['latency_p50_ms']:>8.2f} "
+              f"{r['latency_p99_ms']:>8.2f} {r['loop_lag_p99_ms']:>8.2f} {r['loop_lag_max_ms']:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "db_async", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark authorization lookups on the REST send path.
+
+Seeds one channel with ``--members`` members and sends ``--samples``
+messages through ``send_message``, counting the SELECTs each send runs and
+its latency. ``db`` clears the entity cache before every send, which is
+what every send used to cost (User, Channel and ChannelMember point
+queries); ``cached`` is the steady state with ``entity_cache`` warm.
+
+    python backend/bench/entity_cache.py
+    python backend/bench/entity_cache.py --members 5000 --samples 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import event  # noqa: E402
+
+from backend.api.v1.messages import send_message  # noqa: E402
+from backend.cache import entity_cache  # noqa: E402
+from backend.database import AsyncSessionLocal, SessionLocal, async_engine  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+from backend.persistence import message_writer  # noqa: E402
+from backend.schemas import MessageCreate  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(members: int) -> tuple:
+    db = SessionLocal()
+    user_ids = [str(uuid.uuid4()) for _ in range(members)]
+    channel_id = str(uuid.uuid4())
+    db.execute(User.__table__.insert(), [
+        {"id": uid, "name": f"bench-{uid[:12]}", "password": "x", "role": "user"} for uid in user_ids
+    ])
+    db.execute(Channel.__table__.insert(), [{"id": channel_id, "name": "bench"}])
+    db.execute(ChannelMember.__table__.insert(), [{"user_id": uid, "channel_id": channel_id} for uid in user_ids])
+    db.commit()
+    db.close()
+    return channel_id, user_ids
+
+
+async def run(mode: str, channel_id: str, user_ids: list, samples: int) -> dict:
+    selects = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects[0] += 1
+
+    senders = random.Random(0).choices(user_ids, k=samples)
+    if mode == "cached":
+        await entity_cache.get_channel(channel_id)
+        for user_id in set(senders):  # warm up
+            await entity_cache.get_user(user_id)
+            await entity_cache.member_channels(user_id, (channel_id,))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for user_id in senders:
+            if mode == "db":
+                entity_cache.clear()
+            t0 = time.perf_counter()
+            await send_message(channel_id, user_id, MessageCreate(content="hello"), db=db)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            db.expunge_all()
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    return {
+        "mode": mode,
+        "selects_per_send": round(selects[0] / samples, 2),
+        "send_p50_ms": round(_percentile(latencies, 50), 3),
+        "send_p99_ms": round(_percentile(latencies, 99), 3),
+        "cache": entity_cache.stats(),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--members", type=int, default=1000)
+    p.add_argument("--samples", type=int, default=1000)
+    p.add_argument("--modes", nargs="+", default=["db", "cached"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    channel_id, user_ids = seed(args.members)
+
+    async def _run_all() -> list:
+        try:
+            return [await run(mode, channel_id, user_ids, args.samples) for mode in args.modes]
+        finally:
+            await message_writer.close()
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>7} {'selects/send':>13} {'send p50':>9} {'send p99':>9}  (ms)")
+    for r in results:
+        print(f"{r['mode']:>7} {r['selects_per_send']:>13.2f} {r['send_p50_ms']:>9.3f} {r['send_p99_ms']:>9.3f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "entity_cache", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark peak memory of exporting a large channel.
+
+Seeds one channel with ``--messages`` messages (default 1M), then exports
+it in a fresh process per mode so each peak RSS is measured on its own:
+
+- ``list``: load every row as ``MessageOut`` and serialize the list, as a
+  ``get_channel_messages``-style endpoint without a limit would
+- ``ndjson`` / ``csv``: ``export.export_messages`` (streamed)
+- ``ndjson-gzip``: the same, gzipped as it streams
+
+SQLite maps up to ``SQLITE_MMAP_SIZE_MB`` of the database file and those
+pages count towards RSS; run with ``SQLITE_MMAP_SIZE_MB=0`` to see the
+process's own memory only.
+
+    python backend/bench/export.py
+    python backend/bench/export.py --messages 200000 --modes ndjson list
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+# Workers reuse the parent's database.
+_DB = os.environ.get("CHATWEBAPP_BENCH_DB") or os.path.join(
+    tempfile.mkdtemp(prefix="chatwebapp-bench-"), "bench.db"
+)
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import select  # noqa: E402
+
+from backend.database import AsyncSessionLocal, engine  # noqa: E402
+from backend.export import export_messages  # noqa: E402
+from backend.models import Channel, Message, User  # noqa: E402
+from backend.schemas import MessageOut  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+MODES = ("list", "ndjson", "csv", "ndjson-gzip")
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(size: int) -> str:
+    user_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": user_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), {"id": channel_id, "name": "bench"})
+        for offset in range(0, size, 50_000):
+            conn.execute(Message.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "channel_id": channel_id, "sender_id": user_id,
+                 "content": f"message number {i} with a little padding to look like chat",
+                 "status": "sent", "seq": i + 1, "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(size, offset + 50_000))
+            ])
+    return channel_id
+
+
+async def _export(mode: str, channel_id: str) -> tuple:
+    if mode == "list":
+        async with AsyncSessionLocal() as db:
+            messages = (await db.scalars(
+                select(Message).where(Message.channel_id == channel_id).order_by(Message.created_at, Message.id)
+            )).all()
+            body = json.dumps([MessageOut.model_validate(m).model_dump(mode="json") for m in messages]).encode()
+            return len(messages), len(body)
+    fmt, _, compress = mode.partition("-")
+    total = 0
+    async for chunk in export_messages(channel_id, fmt, compress=bool(compress)):
+        total += len(chunk)
+    return None, total
+
+
+def worker(mode: str, channel_id: str) -> None:
+    baseline = _rss_mb()
+    t0 = time.perf_counter()
+    _, size = asyncio.run(_export(mode, channel_id))
+    print(json.dumps({
+        "mode": mode, "seconds": round(time.perf_counter() - t0, 2), "bytes": size,
+        "baseline_rss_mb": round(baseline, 1), "peak_rss_mb": round(_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=1_000_000)
+    p.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    p.add_argument("--worker", nargs=2, metavar=("MODE", "CHANNEL_ID"), help=argparse.SUPPRESS)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    t0 = time.perf_counter()
+    channel_id = seed(args.messages)
+    print(f"seeded {args.messages} messages in {time.perf_counter() - t0:.1f}s")
+    results = []
+    for mode in args.modes:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", mode, channel_id],
+            env={**os.environ, "CHATWEBAPP_BENCH_DB": _DB}, capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{'mode':>12} {'seconds':>8} {'MB out':>8} {'base RSS MB':>12} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['mode']:>12} {r['seconds']:>8.2f} {r['bytes'] / 2**20:>8.1f} "
+              f"{r['baseline_rss_mb']:>12.1f} {r['peak_rss_mb']:>12.1f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "export", "messages": args.messages, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark group-commit message persistence against per-message commits.
+
+N concurrent senders each persist M messages either with their own
+INSERT + COMMIT (the previous WebSocket path) or through the shared
+``MessageWriter``. Per-message commits are bound by the database's fsync
+rate; group commit should scale with the number of senders.
+
+    python backend/bench/group_commit.py
+    python backend/bench/group_commit.py --senders 1 10 100 --messages 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from backend.database import AsyncSessionLocal, SessionLocal  # noqa: E402
+from backend.enums import DurabilityMode  # noqa: E402
+from backend.models import User, Channel, ChannelMember, Message  # noqa: E402
+from backend.persistence import MessageWriter, new_message_row  # noqa: E402
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def setup() -> tuple:
+    """Create a sender and a channel they belong to."""
+    db = SessionLocal()
+    try:
+        user = User(name=f"bench-{uuid.uuid4().hex[:8]}", password="-")
+        channel = Channel(name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add_all([user, channel])
+        db.flush()
+        db.add(ChannelMember(user_id=user.id, channel_id=channel.id))
+        db.commit()
+        return user.id, channel.id
+    finally:
+        db.close()
+
+
+async def _commit_each(row: dict) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Message), [row])
+        await db.commit()
+
+
+async def run(mode: str, senders: int, messages: int, user_id: str, channel_id: str) -> dict:
+    writer = None
+    if mode == "per_message":
+        send = _commit_each
+    else:
+        writer = MessageWriter(durability=DurabilityMode(mode))
+        send = writer.submit
+    latencies = []
+
+    async def sender(n: int):
+        for i in range(messages):
+            t0 = time.perf_counter()
+            await send(new_message_row(channel_id, user_id, f"sender {n} message {i}"))
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(sender(n) for n in range(senders)))
+    if writer is not None:
+        await writer.close()
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "mode": mode,
+        "senders": senders,
+        "messages": senders * messages,
+        "inserts_per_s": round(senders * messages / elapsed, 1),
+        "commits": writer.flushes if writer else senders * messages,
+        "latency_p50_ms": round(_percentile(latencies, 50), 3),
+        "latency_p99_ms": round(_percentile(latencies, 99), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--senders", type=int, nargs="+", default=[1, 10, 100])
+    p.add_argument("--messages", type=int, default=100, help="Messages per sender")
+    p.add_argument("--modes", nargs="+", default=["per_message", "after_commit", "write_behind"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    user_id, channel_id = setup()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, n, args.messages, user_id, channel_id)
+            for n in args.senders
+            for mode in args.modes
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>13} {'senders':>8} {'inserts/s':>10} {'commits':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['mode']:>13} {r['senders']:>8} {r['inserts_per_s']:>10.1f} {r['commits']:>8} "
+              f"{r['latency_p50_ms']:>8.2f} {r['latency_p99_ms']:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "group_commit", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the recent-history ring buffer against the database.
+
+Seeds one channel with ``--messages`` rows, then times the two reads the
+buffer serves: the newest REST history page, and the gap replayed to a
+socket reconnecting with ``last_seen_id`` (``--gap`` messages behind).
+``db`` drops the channel's buffer before every call, so each read goes to
+SQLite (and re-seeds); ``buffer`` reads from memory.
+
+    python backend/bench/history_buffer.py
+    python backend/bench/history_buffer.py --messages 1000000 --gap 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.api.v1.messages import get_channel_messages  # noqa: E402
+from backend.api.v1.ws import _replay, manager  # noqa: E402
+from backend import fast_json  # noqa: E402
+from backend.database import AsyncSessionLocal, engine  # noqa: E402
+from backend.models import Channel, Message, User  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+# Pages are timed as the rows the endpoint returns, before encoding.
+fast_json.FAST_JSON_LISTS = False
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Conn:
+    """Stands in for a Connection; keeps the last frame sent."""
+
+    def __init__(self):
+        self.frame = None
+
+    def send(self, payload, coalesce_key=None):
+        self.frame = payload
+        return True
+
+
+def seed(size: int) -> tuple:
+    sender_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    ids = [str(uuid.uuid4()) for _ in range(size)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": sender_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), {"id": channel_id, "name": "bench"})
+        for offset in range(0, size, 50_000):
+            conn.execute(Message.__table__.insert(), [
+                {"id": ids[i], "channel_id": channel_id, "sender_id": sender_id, "content": f"message {i}",
+                 "status": "sent", "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(size, offset + 50_000))
+            ])
+    return channel_id, ids
+
+
+async def run(mode: str, channel_id: str, ids: list, gap: int, samples: int, limit: int) -> dict:
+    page_ms, replay_ms = [], []
+    conn = _Conn()
+    async with AsyncSessionLocal() as db:
+        for _ in range(samples):
+            if mode == "db":
+                manager.recent.discard(channel_id)
+            t0 = time.perf_counter()
+            page = await get_channel_messages(channel_id, before=None, after=None, limit=limit, db=db)
+            page_ms.append((time.perf_counter() - t0) * 1000)
+            assert len(page) == limit
+            db.expunge_all()
+
+            if mode == "db":
+                manager.recent.discard(channel_id)
+            t0 = time.perf_counter()
+            await _replay(channel_id, conn, ids[-gap - 1])
+            replay_ms.append((time.perf_counter() - t0) * 1000)
+            assert len(json.loads(conn.frame)["messages"]) == gap
+    return {
+        "mode": mode,
+        "first_page_p50_ms": round(_percentile(page_ms, 50), 3),
+        "first_page_p99_ms": round(_percentile(page_ms, 99), 3),
+        "replay_p50_ms": round(_percentile(replay_ms, 50), 3),
+        "replay_p99_ms": round(_percentile(replay_ms, 99), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=100_000)
+    p.add_argument("--gap", type=int, default=20, help="Messages missed by the reconnecting client")
+    p.add_argument("--samples", type=int, default=200)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--modes", nargs="+", default=["db", "buffer"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    channel_id, ids = seed(args.messages)
+
+    async def _run_all() -> list:
+        return [await run(mode, channel_id, ids, args.gap, args.samples, args.limit) for mode in args.modes]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>7} {'page p50':>9} {'page p99':>9} {'replay p50':>11} {'replay p99':>11}  (ms)")
+    for r in results:
+        print(f"{r['mode']:>7} {r['first_page_p50_ms']:>9.3f} {r['first_page_p99_ms']:>9.3f} "
+              f"{r['replay_p50_ms']:>11.3f} {r['replay_p99_ms']:>11.3f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "history_buffer", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark keyset-paginated channel history at different channel sizes.
+
+Seeds one scratch SQLite database with channels of 10k, 100k and 1M messages
+and times ``get_channel_messages`` pages: the first (newest) page plus pages
+at random ``before`` cursors spread across the whole channel. Flat p50/p99
+across sizes means page cost is independent of channel length.
+
+    python backend/bench/history_pagination.py
+    python backend/bench/history_pagination.py --sizes 10000 100000 --pages 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import AsyncSessionLocal, engine  # noqa: E402
+from backend.models import User, Channel, ChannelMember, Message  # noqa: E402
+from backend.api.v1.messages import get_channel_messages  # noqa: E402
+from backend import fast_json  # noqa: E402
+
+# Pages are timed as the rows the endpoint returns, before encoding.
+fast_json.FAST_JSON_LISTS = False
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(size: int, sender_id: str, chunk: int = 50_000) -> tuple:
+    """Create a channel holding ``size`` messages; return (channel_id, ids)."""
+    channel_id = str(uuid.uuid4())
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    ids = []
+    with engine.begin() as conn:
+        conn.execute(Channel.__table__.insert(), {
+            "id": channel_id, "name": f"bench-{size}-{channel_id[:8]}",
+            "created_at": start, "updated_at": start,
+        })
+        conn.execute(ChannelMember.__table__.insert(), {
+            "user_id": sender_id, "channel_id": channel_id, "joined_at": start,
+        })
+        for offset in range(0, size, chunk):
+            rows = []
+            for i in range(offset, min(size, offset + chunk)):
+                ts = start + timedelta(seconds=i)
+                msg_id = str(uuid.uuid4())
+                ids.append(msg_id)
+                rows.append({
+                    "id": msg_id, "channel_id": channel_id, "sender_id": sender_id,
+                    "content": f"message {i}", "status": "sent",
+                    "created_at": ts, "updated_at": ts,
+                })
+            conn.execute(Message.__table__.insert(), rows)
+    return channel_id, ids
+
+
+async def time_pages(channel_id: str, ids: list, pages: int, limit: int) -> dict:
+    """Time ``pages`` history requests: the newest page plus random cursors."""
+    async with AsyncSessionLocal() as db:
+        samples = []
+        cursors = [None] + random.sample(ids, min(pages - 1, len(ids)))
+        for cursor in cursors:
+            t0 = time.perf_counter()
+            page = await get_channel_messages(channel_id, before=cursor, after=None, limit=limit, db=db)
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert len(page) <= limit
+            db.expunge_all()
+    return {
+        "pages": len(samples),
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--pages", type=int, default=200, help="Pages timed per channel")
+    p.add_argument("--limit", type=int, default=50, help="Messages per page")
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    sender_id = str(uuid.uuid4())
+    with engine.begin() as conn:
+        now = datetime.now(UTC)
+        conn.execute(User.__table__.insert(), {
+            "id": sender_id, "name": "bench-sender", "password": "-", "role": "user",
+            "created_at": now, "updated_at": now,
+        })
+
+    seeded = []
+    for size in args.sizes:
+        t0 = time.perf_counter()
+        seeded.append((size, *seed(size, sender_id)))
+        print(f"seeded {size:>9,} messages in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    async def _time_all() -> list:
+        return [
+            {"messages": size, **await time_pages(channel_id, ids, args.pages, args.limit)}
+            for size, channel_id, ids in seeded
+        ]
+
+    results = asyncio.run(_time_all())
+
+    print(f"{'messages':>10} {'pages':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['messages']:>10,} {r['pages']:>6} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "history_pagination", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark a polling client workload with and without ETags and compression.
+
+Seeds ``--users`` users and ``--channels`` channels, then runs ``--clients``
+clients that each poll ``GET /channels/``, ``GET /channels/{id}``,
+``GET /channels/{id}/members`` and ``GET /users/`` every round, for
+``--rounds`` rounds, while one user joins a channel every ``--change-every``
+rounds. Clients behave like a browser cache in each mode:
+
+- ``plain``: no ``If-None-Match``, ``Accept-Encoding: identity``
+  (every poll before this change)
+- ``gzip``: compressed bodies only
+- ``etag``: ``If-None-Match`` with the last ETag seen, identity encoding
+- ``etag+gzip``: both
+
+Reports bytes on the wire and SQL statements per poll, the share of 304s,
+and polls per second.
+
+    python backend/bench/http_cache.py
+    python backend/bench/http_cache.py --users 5000 --clients 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import UTC, datetime
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from backend.app import app  # noqa: E402
+from backend.database import engine  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+from backend.query_log import capture_queries  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MODES = ("plain", "gzip", "etag", "etag+gzip")
+
+
+def seed(users: int, channels: int) -> tuple:
+    """Create the users and channels; every user is a member of the first channel."""
+    now = datetime.now(UTC)
+    user_rows = [{"id": str(uuid.uuid4()), "name": f"user-{i}", "password": "x", "role": "user",
+                  "created_at": now, "updated_at": now} for i in range(users)]
+    channel_rows = [{"id": str(uuid.uuid4()), "name": f"channel-{i}", "created_at": now, "updated_at": now}
+                    for i in range(channels)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), user_rows)
+        conn.execute(insert(Channel), channel_rows)
+        conn.execute(insert(ChannelMember), [{"user_id": u["id"], "channel_id": channel_rows[0]["id"],
+                                              "joined_at": now} for u in user_rows[: users // 2]])
+    return [u["id"] for u in user_rows[users // 2:]], channel_rows[0]["id"]
+
+
+async def run_mode(client, mode: str, joiners: list, channel_id: str, args) -> dict:
+    paths = ["/api/v1/channels/", f"/api/v1/channels/{channel_id}",
+             f"/api/v1/channels/{channel_id}/members", "/api/v1/users/"]
+    encoding = "gzip" if "gzip" in mode else "identity"
+    etags = [{} for _ in range(args.clients)]
+    polls = not_modified = wire = 0
+
+    async def poll(cache: dict):
+        nonlocal polls, not_modified, wire
+        for path in paths:
+            headers = {"Accept-Encoding": encoding}
+            if "etag" in mode and path in cache:
+                headers["If-None-Match"] = cache[path]
+            response = await client.get(path, headers=headers)
+            if response.status_code == 304:
+                not_modified += 1
+            else:
+                response.raise_for_status()
+                cache[path] = response.headers.get("etag")
+            polls += 1
+            wire += response.num_bytes_downloaded
+
+    with capture_queries() as log:
+        t0 = time.perf_counter()
+        for round_no in range(args.rounds):
+            if round_no % args.change_every == 0 and joiners:
+                (await client.post(f"/api/v1/channels/{channel_id}/join",
+                                   params={"user_id": joiners.pop()})).raise_for_status()
+            await asyncio.gather(*(poll(cache) for cache in etags))
+        elapsed = time.perf_counter() - t0
+    return {"mode": mode, "kb_per_poll": round(wire / polls / 1024, 2),
+            "stmts_per_poll": round(log.count / polls, 2), "not_modified": round(not_modified / polls, 3),
+            "polls_per_s": round(polls / elapsed)}
+
+
+async def run(args) -> list:
+    joiners, channel_id = seed(args.users, args.channels)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return [await run_mode(client, mode, joiners, channel_id, args) for mode in MODES]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--channels", type=int, default=100)
+    p.add_argument("--clients", type=int, default=10)
+    p.add_argument("--rounds", type=int, default=40)
+    p.add_argument("--change-every", type=int, default=10)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'mode':>10} {'KB/poll':>8} {'stmts/poll':>11} {'304s':>6} {'polls/s':>8}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['kb_per_poll']:>8.2f} {r['stmts_per_poll']:>11.2f} "
+              f"{r['not_modified']:>6.1%} {r['polls_per_s']:>8}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "http_cache", "config": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
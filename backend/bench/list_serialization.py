@@ -0,0 +1,150 @@
+"""Benchmark building 10k-row list responses: ORM + response_model vs fast_json.
+
+Seeds ``--rows`` users, channel members and messages, then times, per
+entity, loading the rows and encoding the response body as:
+
+- ``orm+model``: ``select(Model)`` and FastAPI's ``response_model`` step
+  (validate each object into the schema, then ``dump_json``) -- the old path
+- ``cols+model``: column rows as dicts through ``response_model``
+  (``FAST_JSON_LISTS=false``)
+- ``cols+core``: column rows encoded by pydantic-core, no validation
+- ``cols+orjson``: column rows encoded by orjson, no validation (default)
+
+and the ``GET /users/`` and ``GET /channels/{id}/members`` endpoints end to
+end through the ASGI app, with ``FAST_JSON_LISTS`` off and on.
+
+    python backend/bench/list_serialization.py
+    python backend/bench/list_serialization.py --rows 50000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+from typing import List
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+import pydantic_core  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from backend import fast_json  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.database import AsyncSessionLocal, engine  # noqa: E402
+from backend.models import Channel, ChannelMember, Message, User  # noqa: E402
+from backend.schemas import ChannelMemberOut, MessageOut, UserOut  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MODES = ("orm+model", "cols+model", "cols+core", "cols+orjson")
+_ADAPTERS = {schema: TypeAdapter(List[schema]) for schema in (UserOut, ChannelMemberOut, MessageOut)}
+
+
+def seed(rows: int) -> str:
+    """Create ``rows`` users, all members of one channel with ``rows`` messages."""
+    now = datetime.now(UTC)
+    channel_id = str(uuid.uuid4())
+    users = [{"id": str(uuid.uuid4()), "name": f"user-{i}", "password": "x", "role": "user",
+              "created_at": now, "updated_at": now} for i in range(rows)]
+    with engine.begin() as conn:
+        conn.execute(insert(Channel), [{"id": channel_id, "name": "bench", "created_at": now, "updated_at": now}])
+        conn.execute(insert(User), users)
+        conn.execute(insert(ChannelMember), [{"user_id": u["id"], "channel_id": channel_id, "joined_at": now}
+                                             for u in users])
+        conn.execute(insert(Message), [{"id": str(uuid.uuid4()), "channel_id": channel_id,
+                                        "sender_id": users[i]["id"], "content": f"message number {i}",
+                                        "status": "sent", "seq": i + 1,
+                                        "created_at": now - timedelta(seconds=rows - i), "updated_at": now}
+                                       for i in range(rows)])
+    return channel_id
+
+
+async def encode(db, mode: str, model, schema, where) -> bytes:
+    adapter = _ADAPTERS[schema]
+    if mode == "orm+model":
+        objects = (await db.scalars(select(model).where(where))).all()
+        return adapter.dump_json(adapter.validate_python(objects))
+    rows = await fast_json.fetch_rows(db, select(*fast_json.columns(model, schema)).where(where))
+    if mode == "cols+model":
+        return adapter.dump_json(adapter.validate_python(rows))
+    if mode == "cols+core":
+        return pydantic_core.to_json(rows)
+    return orjson.dumps(rows, option=orjson.OPT_UTC_Z)
+
+
+async def micro(channel_id: str, repeat: int) -> list:
+    entities = {
+        "users": (User, UserOut, User.role == "user"),
+        "members": (ChannelMember, ChannelMemberOut, ChannelMember.channel_id == channel_id),
+        "messages": (Message, MessageOut, Message.channel_id == channel_id),
+    }
+    best = {(entity, mode): float("inf") for entity in entities for mode in MODES}
+    for _ in range(repeat):
+        for entity, (model, schema, where) in entities.items():
+            for mode in MODES:
+                async with AsyncSessionLocal() as db:
+                    t0 = time.perf_counter()
+                    body = await encode(db, mode, model, schema, where)
+                    best[entity, mode] = min(best[entity, mode], time.perf_counter() - t0)
+                assert body.startswith(b"[{")
+    return [{"entity": entity, "mode": mode, "ms": round(seconds * 1000, 1)} for (entity, mode), seconds in best.items()]
+
+
+async def endpoints(channel_id: str, repeat: int) -> list:
+    paths = {"GET /users/": "/api/v1/users/", "GET /members": f"/api/v1/channels/{channel_id}/members"}
+    best = {(name, fast): float("inf") for name in paths for fast in (False, True)}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(repeat):
+            for name, path in paths.items():
+                for fast in (False, True):
+                    fast_json.FAST_JSON_LISTS = fast
+                    t0 = time.perf_counter()
+                    (await client.get(path)).raise_for_status()
+                    best[name, fast] = min(best[name, fast], time.perf_counter() - t0)
+    fast_json.FAST_JSON_LISTS = True
+    return [{"endpoint": name, "fast": fast, "ms": round(seconds * 1000, 1)} for (name, fast), seconds in best.items()]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=10_000)
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    channel_id = seed(args.rows)
+    micro_results = asyncio.run(micro(channel_id, args.repeat))
+    endpoint_results = asyncio.run(endpoints(channel_id, args.repeat))
+
+    print(f"{args.rows} rows, best of {args.repeat} (ms, load + encode)")
+    print(f"{'entity':>9} " + " ".join(f"{mode:>12}" for mode in MODES))
+    for entity in ("users", "members", "messages"):
+        cells = {r["mode"]: r["ms"] for r in micro_results if r["entity"] == entity}
+        print(f"{entity:>9} " + " ".join(f"{cells[mode]:>12.1f}" for mode in MODES))
+    print(f"{'endpoint':>14} {'model ms':>9} {'fast ms':>8}")
+    for name in ("GET /users/", "GET /members"):
+        cells = {r["fast"]: r["ms"] for r in endpoint_results if r["endpoint"] == name}
+        print(f"{name:>14} {cells[False]:>9.1f} {cells[True]:>8.1f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "list_serialization", "config": vars(args),
+                       "results": micro_results, "endpoints": endpoint_results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
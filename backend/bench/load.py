@@ -0,0 +1,373 @@
+"""End-to-end load test: virtual users over REST and WebSocket.
+
+Starts the app (``--server subprocess``, the default, or ``inprocess`` in a
+thread) on a scratch SQLite database, then simulates ``--users`` virtual
+users. Each registers, joins ``--channels-per-user`` of ``--channels``
+channels, holds one multiplexed WebSocket subscribed to them, and sends
+messages at ``--rate`` per second (Poisson arrivals) for ``--duration``
+seconds, over the socket or, for ``--rest-fraction`` of them, with
+``POST /messages/{channel_id}``.
+
+Reports send throughput, deliveries, delivery latency percentiles (send to
+receipt by each subscriber), database statements and commits per message
+and server RSS, read from a bench-only ``/__bench__/stats`` route the
+server is started with. ``--json`` writes the results, with the git commit
+and configuration, for ``compare.py``::
+
+    python backend/bench/load.py --json before.json
+    python backend/bench/load.py --users 2000 --rate 0.5 --duration 30
+    python backend/bench/compare.py before.json after.json
+
+The load generator and the server share the machine; ``client_cpu_s``
+close to the run time means the generator, not the server, is the limit.
+With ``--server inprocess`` the RSS and CPU figures cover both.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, UTC
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, _ROOT)
+
+STATS_PATH = "/__bench__/stats"
+
+# Direction of each metric, for compare.py; others are informational.
+BETTER = {
+    "sent_per_s": "higher",
+    "deliveries_per_s": "higher",
+    "delivered_ratio": "higher",
+    "latency_p50_ms": "lower",
+    "latency_p95_ms": "lower",
+    "latency_p99_ms": "lower",
+    "statements_per_message": "lower",
+    "commits_per_message": "lower",
+    "server_rss_mb": "lower",
+    "server_peak_rss_mb": "lower",
+    "setup_s": "lower",
+    "errors": "lower",
+}
+
+
+def _percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Server side
+
+def _instrumented_app():
+    """The app, with statement/commit counters and the stats route."""
+    import logging
+
+    from sqlalchemy import event
+
+    from backend.app import app
+    from backend.database import async_engine, async_write_engine
+
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    for engine in {async_engine, async_write_engine}:
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+        event.listen(engine.sync_engine, "commit", on_commit)
+
+    @app.get(STATS_PATH, include_in_schema=False)
+    async def bench_stats():
+        with open("/proc/self/status") as fh:
+            status = dict(line.split(":", 1) for line in fh)
+        return {
+            **counts,
+            "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+            "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024,
+        }
+
+    return app
+
+
+def _config(port: int):
+    import uvicorn
+
+    return uvicorn.Config(_instrumented_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def serve(port: int) -> None:
+    """Run the instrumented app in this process (the subprocess server)."""
+    import uvicorn
+
+    uvicorn.Server(_config(port)).run()
+
+
+class Server:
+    """The app under test, as a subprocess or a thread of this process."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process = self._server = self._thread = None
+
+    def start(self) -> None:
+        if self.mode == "subprocess":
+            self._process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", str(self.port)], env=os.environ.copy()
+            )
+        else:
+            import uvicorn
+
+            self._server = uvicorn.Server(_config(self.port))
+            self._thread = threading.Thread(target=self._server.run, daemon=True)
+            self._thread.start()
+
+    async def wait_ready(self, client, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                (await client.get(STATS_PATH)).raise_for_status()
+                return
+            except Exception:
+                if time.monotonic() > deadline or (self._process and self._process.poll() is not None):
+                    raise RuntimeError("Server did not start")
+                await asyncio.sleep(0.1)
+
+    def stop(self) -> None:
+        if self._process:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+        elif self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=30)
+
+
+# Load generator
+
+class Load:
+    def __init__(self, args, base_url: str):
+        self.args = args
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http", "ws", 1)
+        self.rng = random.Random(args.seed)
+        self.sent_at = {}  # token -> perf_counter at send
+        self.expected = 0  # deliveries owed for the messages sent
+        self.latencies = []
+        self.deliveries = 0
+        self.errors = 0
+        self.members = {}  # channel_id -> number of subscribed users
+
+    async def _register(self, client, name: str, role: str = "user") -> str:
+        response = await client.post("/api/v1/users/register",
+                                     json={"name": name, "password": "load-test", "role": role})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def setup(self, client) -> tuple:
+        """Admin, channels and users with their memberships."""
+        run = f"{os.getpid()}-{int(time.time())}"
+        admin = await self._register(client, f"load-admin-{run}", "admin")
+        channels = []
+        for i in range(self.args.channels):
+            response = await client.post("/api/v1/channels/", params={"user_id": admin},
+                                         json={"name": f"load-{run}-{i}"})
+            response.raise_for_status()
+            channels.append(response.json()["id"])
+
+        limit = asyncio.Semaphore(self.args.setup_concurrency)
+
+        async def user(i: int) -> tuple:
+            async with limit:
+                user_id = await self._register(client, f"load-{run}-u{i}")
+                joined = self.rng.sample(channels, self.args.channels_per_user)
+                for channel_id in joined:
+                    (await client.post(f"/api/v1/channels/{channel_id}/join",
+                                       params={"user_id": user_id})).raise_for_status()
+                return user_id, joined
+
+        return admin, await asyncio.gather(*(user(i) for i in range(self.args.users)))
+
+    async def connect(self, user_id: str, channels: list, limit: asyncio.Semaphore):
+        """A multiplexed socket subscribed to the user's channels."""
+        import websockets
+
+        async with limit:
+            ws = await websockets.connect(f"{self.ws_url}/api/v1/ws/{user_id}", max_queue=None)
+            await ws.send(json.dumps({"type": "subscribe", "channel_ids": channels}))
+            pending = set(channels)
+            while pending:
+                frame = json.loads(await ws.recv())
+                if frame.get("type") == "subscribed":
+                    pending.discard(frame["channel_id"])
+                elif "error" in frame:
+                    await ws.close()
+                    raise RuntimeError(frame["error"])
+        for channel_id in channels:
+            self.members[channel_id] = self.members.get(channel_id, 0) + 1
+        return ws
+
+    async def receive(self, ws) -> None:
+        async for raw in ws:
+            received = time.perf_counter()
+            frame = json.loads(raw)
+            if frame.get("type") == "message":
+                sent = self.sent_at.get(frame["content"])
+                if sent is not None:
+                    self.latencies.append((received - sent) * 1000)
+                    self.deliveries += 1
+
+    async def chat(self, client, index: int, user_id: str, channels: list, ws, stop: asyncio.Event) -> None:
+        """Send Poisson-spaced messages until ``stop``."""
+        rng = random.Random(self.args.seed * 100_003 + index)
+        sent = 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), rng.expovariate(self.args.rate))
+                break
+            except asyncio.TimeoutError:
+                pass
+            channel_id = rng.choice(channels)
+            token = f"{index}:{sent}"
+            sent += 1
+            self.expected += self.members[channel_id]
+            self.sent_at[token] = time.perf_counter()
+            try:
+                if rng.random() < self.args.rest_fraction:
+                    response = await client.post(f"/api/v1/messages/{channel_id}",
+                                                 params={"user_id": user_id}, json={"content": token})
+                    response.raise_for_status()
+                else:
+                    await ws.send(json.dumps({"type": "send", "channel_id": channel_id, "content": token}))
+            except Exception:
+                self.errors += 1
+
+    async def run(self, server: Server) -> dict:
+        import httpx
+
+        limits = httpx.Limits(max_connections=self.args.setup_concurrency * 2)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60) as client:
+            await server.wait_ready(client)
+            t0 = time.perf_counter()
+            _, users = await self.setup(client)
+            limit = asyncio.Semaphore(self.args.setup_concurrency)
+            sockets = await asyncio.gather(
+                *(self.connect(user_id, channels, limit) for user_id, channels in users), return_exceptions=True
+            )
+            setup_s = time.perf_counter() - t0
+            connected = [(i, *users[i], ws) for i, ws in enumerate(sockets) if not isinstance(ws, BaseException)]
+            self.errors += len(users) - len(connected)
+            receivers = [asyncio.create_task(self.receive(ws)) for *_, ws in connected]
+
+            before = (await client.get(STATS_PATH)).json()
+            cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+            stop = asyncio.Event()
+            t0 = time.perf_counter()
+            senders = [asyncio.create_task(self.chat(client, *user, stop)) for user in connected]
+            await asyncio.sleep(self.args.duration)
+            stop.set()
+            await asyncio.gather(*senders)
+            elapsed = time.perf_counter() - t0
+            await asyncio.sleep(self.args.drain)
+            cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+            after = (await client.get(STATS_PATH)).json()
+            for task in receivers:
+                task.cancel()
+            await asyncio.gather(*(ws.close() for *_, ws in connected), return_exceptions=True)
+
+        messages = len(self.sent_at)
+        return {
+            "users": len(connected),
+            "setup_s": round(setup_s, 2),
+            "messages_sent": messages,
+            "sent_per_s": round(messages / elapsed, 1),
+            "deliveries": self.deliveries,
+            "deliveries_per_s": round(self.deliveries / elapsed, 1),
+            "delivered_ratio": round(self.deliveries / self.expected, 4) if self.expected else 1.0,
+            "latency_p50_ms": round(_percentile(self.latencies, 50), 2),
+            "latency_p95_ms": round(_percentile(self.latencies, 95), 2),
+            "latency_p99_ms": round(_percentile(self.latencies, 99), 2),
+            "latency_max_ms": round(max(self.latencies, default=0.0), 2),
+            "statements_per_message": round((after["statements"] - before["statements"]) / max(messages, 1), 3),
+            "commits_per_message": round((after["commits"] - before["commits"]) / max(messages, 1), 3),
+            "server_rss_mb": round(after["rss_mb"], 1),
+            "server_peak_rss_mb": round(after["peak_rss_mb"], 1),
+            "client_cpu_s": round(cpu1.ru_utime + cpu1.ru_stime - cpu0.ru_utime - cpu0.ru_stime, 2),
+            "errors": self.errors,
+        }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--server", choices=("subprocess", "inprocess"), default="subprocess")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--channels", type=int, default=50)
+    p.add_argument("--channels-per-user", type=int, default=2)
+    p.add_argument("--rate", type=float, default=0.2, help="Messages per second per user")
+    p.add_argument("--rest-fraction", type=float, default=0.1, help="Share of messages sent over REST")
+    p.add_argument("--duration", type=float, default=20.0, help="Seconds of chat to measure")
+    p.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for deliveries after sending")
+    p.add_argument("--setup-concurrency", type=int, default=50)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.serve:
+        serve(args.serve)
+        return
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='chatwebapp-bench-'), 'bench.db')}"
+    server = Server(args.server)
+    server.start()
+    try:
+        metrics = asyncio.run(Load(args, server.url).run(server))
+    finally:
+        server.stop()
+
+    width = max(map(len, metrics))
+    for name, value in metrics.items():
+        print(f"{name:>{width}}  {value}")
+    if args.json_path:
+        config = {k: v for k, v in vars(args).items() if k not in ("serve", "json_path")}
+        with open(args.json_path, "w") as fh:
+            json.dump({
+                "benchmark": "load", "commit": _git_commit(), "timestamp": datetime.now(UTC).isoformat(),
+                "config": config, "metrics": metrics, "better": BETTER,
+            }, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark message throughput with logging off, synchronous and queued.
+
+Posts ``--messages`` messages (``--concurrency`` at a time) through the
+ASGI app, each logging one ``message_sent`` record, under each of these
+modes in turn, ``--rounds`` times:
+
+- ``off``: backend loggers at WARNING, nothing written
+- ``sync``: a text ``StreamHandler`` formatting and writing on the event
+  loop (what ``logging.basicConfig`` set up before)
+- ``queue``: ``logging_config.queue_handler`` (JSON, written by a thread)
+- ``sampled``: the same with ``LOG_SAMPLE_RATES`` sampling (or
+  ``SAMPLE_RATES`` below when it is unset)
+
+to a file sink and to a ``slow`` sink that takes ``--sink-delay-ms`` per
+write (a blocked pipe or a busy log shipper). Also reports the cost of one
+``logger.info`` call on the calling thread.
+
+    python backend/bench/log_pipeline.py
+    python backend/bench/log_pipeline.py --messages 5000 --sink-delay-ms 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+
+from backend import logging_config  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.database import SessionLocal  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+
+MODES = ("off", "sync", "queue", "sampled")
+SAMPLE_RATES = "message_sent=0.01,ws_connected=0.1,ws_disconnected=0.1"
+
+
+class _SlowStream:
+    """A file that takes ``delay`` seconds per write."""
+
+    def __init__(self, stream, delay: float):
+        self.stream, self.delay = stream, delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def seed() -> tuple:
+    db = SessionLocal()
+    user_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(User(id=user_id, name="bench", password="x", role="user"))
+    db.add(Channel(id=channel_id, name=f"bench-{channel_id[:8]}"))
+    db.add(ChannelMember(user_id=user_id, channel_id=channel_id))
+    db.commit()
+    db.close()
+    return user_id, channel_id
+
+
+def install(mode: str, stream) -> None:
+    """Route the ``backend`` logger to ``stream`` as ``mode`` does."""
+    backend = logging.getLogger("backend")
+    for handler in list(backend.handlers):
+        backend.removeHandler(handler)
+    logging_config.stop_logging()
+    backend.propagate = False
+    backend.setLevel(logging.WARNING if mode == "off" else logging.INFO)
+    if mode == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(logging_config.TEXT_FORMAT))
+    elif mode in ("queue", "sampled"):
+        rates = (logging_config.LOG_SAMPLE_RATES or SAMPLE_RATES) if mode == "sampled" else ""
+        handler = logging_config.queue_handler(fmt="json", sample_rates=rates, stream=stream)
+    else:
+        return
+    backend.addHandler(handler)
+
+
+async def post_messages(user_id: str, channel_id: str, count: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def sender(n: int):
+            for i in range(n):
+                response = await client.post(f"/api/v1/messages/{channel_id}", params={"user_id": user_id},
+                                             json={"content": f"message {i}"})
+                response.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(sender(count // concurrency) for _ in range(concurrency)))
+        return time.perf_counter() - t0
+
+
+def time_log_call(calls: int) -> float:
+    logger = logging.getLogger("backend.api.v1.messages")
+    t0 = time.perf_counter()
+    for i in range(calls):
+        logger.info("Message sent in channel %s by %s", "channel", i, extra={"event": "message_sent"})
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--rounds", type=int, default=4)
+    p.add_argument("--sink-delay-ms", type=float, default=0.2)
+    p.add_argument("--log-calls", type=int, default=20000)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    user_id, channel_id = seed()
+    asyncio.run(post_messages(user_id, channel_id, 200, args.concurrency))  # warm up
+    results = []
+    with open(os.path.join(_TMPDIR, "bench.log"), "w") as sink:
+        for sink_name, stream in (("file", sink), ("slow", _SlowStream(sink, args.sink_delay_ms / 1000))):
+            elapsed = dict.fromkeys(MODES, 0.0)
+            call_us = dict.fromkeys(MODES, 0.0)
+            calls = args.log_calls if sink_name == "file" else args.log_calls // 20
+            # Interleaved so every mode sees the same database size.
+            for _ in range(args.rounds):
+                for mode in MODES:
+                    install(mode, stream)
+                    elapsed[mode] += asyncio.run(
+                        post_messages(user_id, channel_id, args.messages // args.rounds, args.concurrency))
+                    call_us[mode] += time_log_call(calls) / args.rounds
+                    install("off", stream)  # drains the queue
+            for mode in MODES:
+                results.append({"sink": sink_name, "mode": mode, "msgs_per_s": round(args.messages / elapsed[mode]),
+                                "log_call_us": round(call_us[mode], 2)})
+
+    print(f"{'sink':>5} {'mode':>8} {'msgs/s':>8} {'log call us':>12}")
+    for r in results:
+        print(f"{r['sink']:>5} {r['mode']:>8} {r['msgs_per_s']:>8} {r['log_call_us']:>12.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "log_pipeline", "config": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark bulk message ingestion against one request per message.
+
+Posts ``--messages`` messages to one channel through the ASGI app (no
+network): ``single`` sends one ``POST /messages/{channel_id}`` each,
+``batch`` sends JSON arrays of ``--batch-size`` to ``/batch`` and
+``ndjson`` streams them as NDJSON. Reports messages per second, statements
+and commits run, and the WebSocket frames a subscriber receives.
+
+    python backend/bench/message_batch.py
+    python backend/bench/message_batch.py --messages 100000 --batch-size 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from backend.api.v1.ws import manager  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.database import SessionLocal, async_engine, async_write_engine  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+from backend.persistence import message_writer  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+class _Socket:
+    __slots__ = ("frames",)
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.frames += 1
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def seed() -> tuple:
+    db = SessionLocal()
+    user_id = str(uuid.uuid4())
+    db.add(User(id=user_id, name="bench", password="x", role="user"))
+    channel_ids = [str(uuid.uuid4()) for _ in range(3)]
+    for channel_id in channel_ids:
+        db.add(Channel(id=channel_id, name=f"bench-{channel_id[:12]}"))
+        db.add(ChannelMember(user_id=user_id, channel_id=channel_id))
+    db.commit()
+    db.close()
+    return user_id, channel_ids
+
+
+async def run(mode: str, user_id: str, channel_id: str, messages: int, batch_size: int) -> dict:
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    for engine in {async_engine, async_write_engine}:
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+        event.listen(engine.sync_engine, "commit", on_commit)
+
+    socket = _Socket()
+    await manager.connect(channel_id, user_id, socket)
+    await asyncio.sleep(0.2)
+    socket.frames = 0
+
+    url = f"/api/v1/messages/{channel_id}"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        if mode == "single":
+            for i in range(messages):
+                response = await client.post(url, params={"user_id": user_id}, json={"content": f"message {i}"})
+                response.raise_for_status()
+        else:
+            for start in range(0, messages, batch_size):
+                contents = [{"content": f"message {i}"} for i in range(start, min(messages, start + batch_size))]
+                if mode == "batch":
+                    response = await client.post(f"{url}/batch", params={"user_id": user_id}, json=contents)
+                else:
+                    body = "".join(json.dumps(c) + "\n" for c in contents)
+                    response = await client.post(f"{url}/batch", params={"user_id": user_id}, content=body,
+                                                 headers={"Content-Type": "application/x-ndjson"})
+                response.raise_for_status()
+        elapsed = time.perf_counter() - t0
+
+    while any(conn.queue for conn in manager.connections.values()):
+        await asyncio.sleep(0.01)
+    for engine in {async_engine, async_write_engine}:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+        event.remove(engine.sync_engine, "commit", on_commit)
+    await manager.disconnect(channel_id, user_id, socket)
+    return {
+        "mode": mode,
+        "messages": messages,
+        "messages_per_s": round(messages / elapsed),
+        "statements": counts["statements"],
+        "commits": counts["commits"],
+        "ws_frames": socket.frames,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=10_000)
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.add_argument("--modes", nargs="+", default=["single", "batch", "ndjson"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    user_id, channel_ids = seed()
+
+    async def _run_all() -> list:
+        try:
+            return [
+                await run(mode, user_id, channel_ids[i % len(channel_ids)], args.messages, args.batch_size)
+                for i, mode in enumerate(args.modes)
+            ]
+        finally:
+            await message_writer.close()
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>7} {'messages':>9} {'msg/s':>8} {'statements':>11} {'commits':>8} {'ws frames':>10}")
+    for r in results:
+        print(f"{r['mode']:>7} {r['messages']:>9} {r['messages_per_s']:>8} {r['statements']:>11} "
+              f"{r['commits']:>8} {r['ws_frames']:>10}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "message_batch", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark the cost of the Prometheus metrics.
+
+Reports the time and memory of one histogram observation (a cached label
+child, as the middleware and WebSocket fan-out use them), then the latency
+of ``GET /api/v1/users/{user_id}`` (one SQL query) through the ASGI app with
+metrics on (middleware plus SQL hooks) and off, interleaved in
+``--rounds`` rounds to even out noise, and the time to render a scrape.
+
+    python backend/bench/metrics.py
+    python backend/bench/metrics.py --requests 5000 --rounds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from backend import metrics  # noqa: E402
+from backend.app import app, create_app  # noqa: E402
+from backend.database import async_engine, async_write_engine, engine  # noqa: E402
+from backend.models import User  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_observe(samples: int) -> dict:
+    h = metrics.Histogram("bench_seconds", "bench", ("method", "route"))
+    child = h.labels("GET", "/bench")
+    values = [i / samples for i in range(1000)]
+    observe = child.observe
+    t0 = time.perf_counter_ns()
+    for i in range(samples):
+        observe(values[i % 1000])
+    per_observe = (time.perf_counter_ns() - t0) / samples
+    t0 = time.perf_counter_ns()
+    for i in range(samples):
+        values[i % 1000]
+    loop = (time.perf_counter_ns() - t0) / samples
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(samples):
+        observe(values[i % 1000])
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"observe_ns": round(per_observe - loop, 1), "retained_bytes": retained}
+
+
+def _set_sql_hooks(enabled: bool) -> None:
+    for e in {engine, async_engine, async_write_engine}:
+        target = getattr(e, "sync_engine", e)
+        if enabled:
+            metrics.instrument_engine(e)
+        elif event.contains(target, "after_cursor_execute", metrics._after_execute):
+            event.remove(target, "before_cursor_execute", metrics._before_execute)
+            event.remove(target, "after_cursor_execute", metrics._after_execute)
+
+
+async def time_requests(requests: int, rounds: int) -> dict:
+    user_id = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": user_id, "name": "bench", "password": "-", "role": "user"})
+    metrics.METRICS_ENABLED = False
+    plain_app = create_app()
+    apps = {"off": plain_app, "on": app}
+    timings = {name: [] for name in apps}
+    for _ in range(rounds):
+        for name, target in apps.items():
+            _set_sql_hooks(name == "on")
+            transport = httpx.ASGITransport(app=target)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for _ in range(requests // rounds):
+                    t0 = time.perf_counter()
+                    response = await client.get(f"/api/v1/users/{user_id}")
+                    timings[name].append((time.perf_counter() - t0) * 1e6)
+                    response.raise_for_status()
+    _set_sql_hooks(True)
+    return {name: {"mean_us": round(statistics.fmean(t), 1), "p50_us": round(_percentile(t, 50), 1),
+                   "p99_us": round(_percentile(t, 99), 1)} for name, t in timings.items()}
+
+
+def time_scrape(samples: int) -> dict:
+    t0 = time.perf_counter()
+    for _ in range(samples):
+        body = metrics.REGISTRY.render()
+    return {"scrape_us": round((time.perf_counter() - t0) / samples * 1e6, 1), "scrape_bytes": len(body)}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--observations", type=int, default=1_000_000)
+    p.add_argument("--requests", type=int, default=3000)
+    p.add_argument("--rounds", type=int, default=6)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    observe = time_observe(args.observations)
+    print(f"observe: {observe['observe_ns']} ns, {observe['retained_bytes']} bytes retained "
+          f"after {args.observations} samples")
+    requests = asyncio.run(time_requests(args.requests, args.rounds))
+    print(f"{'metrics':>8} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+    for name, r in requests.items():
+        print(f"{name:>8} {r['mean_us']:>9.1f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f}")
+    overhead = requests["on"]["mean_us"] - requests["off"]["mean_us"]
+    print(f"overhead: {overhead:+.1f} us per request ({overhead / requests['off']['mean_us']:+.1%})")
+    scrape = time_scrape(100)
+    print(f"scrape: {scrape['scrape_us']} us, {scrape['scrape_bytes']} bytes")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "metrics", **observe, "requests": requests, **scrape}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark login latency and chat throughput while passwords are hashed.
+
+Runs ``--senders`` clients posting messages and ``--logins`` clients
+logging in (scrypt at the configured cost) through the ASGI app, at the
+same time, for ``--seconds`` per mode, with the KDF run:
+
+- ``loop``: on the event loop (a hash call inline in the route)
+- ``thread``: in the default threadpool (``asyncio.to_thread``), unbounded
+- ``pool``: ``crypto``'s process pool with its admission limit
+
+Modes are interleaved over ``--rounds`` rounds. Reports login p50/p99 and
+how many logins were turned away (503), and message p99 and throughput.
+
+    python backend/bench/password_hashing.py
+    python backend/bench/password_hashing.py --logins 32 --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx  # noqa: E402
+
+from backend import crypto  # noqa: E402
+from backend.app import app  # noqa: E402
+from backend.database import SessionLocal  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MODES = ("loop", "thread", "pool")
+
+_pool_derive = crypto._derive
+
+
+async def _loop_derive(kdf):
+    return kdf()
+
+
+async def _thread_derive(kdf):
+    return await asyncio.to_thread(kdf)
+
+
+DERIVE = {"loop": _loop_derive, "thread": _thread_derive, "pool": _pool_derive}
+
+
+def _percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def seed_chat() -> tuple:
+    db = SessionLocal()
+    user_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(User(id=user_id, name=f"sender-{user_id[:8]}", password="x", role="user"))
+    db.add(Channel(id=channel_id, name=f"bench-{channel_id[:8]}"))
+    db.add(ChannelMember(user_id=user_id, channel_id=channel_id))
+    db.commit()
+    db.close()
+    return user_id, channel_id
+
+
+async def run_mode(client, mode: str, names: list, user_id: str, channel_id: str, seconds: float,
+                   senders: int) -> dict:
+    crypto._derive = DERIVE[mode]
+    login_ms, message_ms, rejected = [], [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def sender():
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            response = await client.post(f"/api/v1/messages/{channel_id}", params={"user_id": user_id},
+                                         json={"content": "hello"})
+            response.raise_for_status()
+            message_ms.append((time.perf_counter() - t0) * 1000)
+
+    async def login(name: str):
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            response = await client.post("/api/v1/users/login", json={"name": name, "password": "pass123"})
+            if response.status_code == 503:
+                rejected += 1
+                await asyncio.sleep(float(response.headers.get("retry-after", "1")) / 10)
+                continue
+            response.raise_for_status()
+            login_ms.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(sender() for _ in range(senders)), *(login(n) for n in names))
+    crypto._derive = _pool_derive
+    return {"logins": login_ms, "messages": message_ms, "rejected": rejected}
+
+
+async def run(args) -> list:
+    user_id, channel_id = seed_chat()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        names = [f"login-{i}-{uuid.uuid4().hex[:6]}" for i in range(args.logins)]
+        for name in names:
+            (await client.post("/api/v1/users/register", json={"name": name, "password": "pass123"})).raise_for_status()
+        totals = {mode: {"logins": [], "messages": [], "rejected": 0} for mode in MODES}
+        for _ in range(args.rounds):
+            for mode in MODES:
+                r = await run_mode(client, mode, names, user_id, channel_id, args.seconds / args.rounds,
+                                   args.senders)
+                totals[mode]["logins"] += r["logins"]
+                totals[mode]["messages"] += r["messages"]
+                totals[mode]["rejected"] += r["rejected"]
+    crypto.close()
+    return [{"mode": mode,
+             "logins": len(t["logins"]),
+             "login_p50_ms": round(_percentile(t["logins"], 0.50), 1),
+             "login_p99_ms": round(_percentile(t["logins"], 0.99), 1),
+             "rejected": t["rejected"],
+             "msgs_per_s": round(len(t["messages"]) / args.seconds),
+             "msg_p99_ms": round(_percentile(t["messages"], 0.99), 1)} for mode, t in totals.items()]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--senders", type=int, default=8)
+    p.add_argument("--logins", type=int, default=16)
+    p.add_argument("--seconds", type=float, default=12)
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"KDF: scrypt {crypto.hasher.params}, workers={crypto.PASSWORD_HASH_WORKERS}, "
+          f"max pending={crypto.PASSWORD_HASH_MAX_PENDING}")
+    print(f"{'mode':>7} {'logins':>7} {'p50 ms':>8} {'p99 ms':>8} {'503s':>6} {'msgs/s':>7} {'msg p99':>8}")
+    for r in results:
+        print(f"{r['mode']:>7} {r['logins']:>7} {r['login_p50_ms']:>8.1f} {r['login_p99_ms']:>8.1f} "
+              f"{r['rejected']:>6} {r['msgs_per_s']:>7} {r['msg_p99_ms']:>8.1f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "password_hashing", "config": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
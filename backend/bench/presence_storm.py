@@ -0,0 +1,140 @@
+"""Benchmark presence traffic during a reconnect storm.
+
+Connects N users to one channel, then has a fraction of them drop (e.g. a
+worker restarting) and reconnect, each phase spread over half of
+``--storm-ms``. Reports bytes delivered to sockets and CPU
+time for the storm, comparing the previous behaviour (a ``user_joined`` /
+``user_left`` broadcast carrying the full online list on every connect and
+disconnect) with batched presence deltas.
+
+    python backend/bench/presence_storm.py
+    python backend/bench/presence_storm.py --users 5000 --reconnecting 0.5 --storm-ms 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.api.v1.ws import ChannelConnectionManager  # noqa: E402
+from backend.pubsub import InMemoryBroker  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+CHANNEL = "bench"
+
+
+class _Socket:
+    __slots__ = ("stats",)
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(data)
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+async def _legacy_presence(manager: ChannelConnectionManager, kind: str, user_id: str) -> None:
+    await manager.broadcast_to_channel(CHANNEL, {
+        "type": kind,
+        "user_id": user_id,
+        "online_users": list(manager.get_online_users(CHANNEL)),
+    }, coalesce_key=f"presence:{CHANNEL}")
+
+
+async def run(mode: str, users: int, reconnecting: float, storm_ms: float, window_ms: float) -> dict:
+    stats = {"frames": 0, "bytes": 0}
+    manager = ChannelConnectionManager(InMemoryBroker(), presence_window_ms=window_ms)
+    if mode == "legacy":
+        # Only the full-list broadcasts: no deltas and no join snapshots.
+        manager.registry.on_presence = None
+        manager.send_presence_snapshot = lambda channel_id, conn: None
+    sockets = {}
+    for i in range(users):
+        user_id = f"user-{i}"
+        sockets[user_id] = _Socket(stats)
+        await manager.connect(CHANNEL, user_id, sockets[user_id])
+    await asyncio.sleep(window_ms / 1000 + 0.05)
+    while any(conn.queue for conn in manager.connections.values()):
+        await asyncio.sleep(0.01)
+
+    stormers = [f"user-{i}" for i in range(int(users * reconnecting))]
+    pause = storm_ms / 2000 / max(1, len(stormers))
+    stats.update(frames=0, bytes=0)
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for user_id in stormers:
+        await manager.disconnect(CHANNEL, user_id, sockets[user_id])
+        if mode == "legacy":
+            await _legacy_presence(manager, "user_left", user_id)
+        await asyncio.sleep(pause)
+    for user_id in stormers:
+        sockets[user_id] = _Socket(stats)
+        await manager.connect(CHANNEL, user_id, sockets[user_id])
+        if mode == "legacy":
+            await _legacy_presence(manager, "user_joined", user_id)
+        await asyncio.sleep(pause)
+    await asyncio.sleep(window_ms / 1000 + 0.05)
+    while any(conn.queue for conn in manager.connections.values()):
+        await asyncio.sleep(0.01)
+    cpu, elapsed = time.process_time() - cpu0, time.perf_counter() - t0
+    dropped = sum(conn.dropped for conn in manager.connections.values())
+    await manager.close()
+
+    return {
+        "mode": mode,
+        "users": users,
+        "reconnects": len(stormers),
+        "frames": stats["frames"],
+        "mbytes": round(stats["bytes"] / 1e6, 2),
+        "dropped_frames": dropped,
+        "cpu_s": round(cpu, 2),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=5000)
+    p.add_argument("--reconnecting", type=float, default=0.2, help="Fraction of users that reconnect")
+    p.add_argument("--storm-ms", type=float, default=2000.0, help="Spread the reconnects over this long")
+    p.add_argument("--window-ms", type=float, default=100.0, help="Presence batching window")
+    p.add_argument("--modes", nargs="+", default=["legacy", "deltas"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, args.users, args.reconnecting, args.storm_ms, args.window_ms)
+            for mode in args.modes
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>7} {'users':>6} {'reconn':>7} {'frames':>10} {'MB':>9} {'dropped':>9} {'cpu s':>7} {'wall s':>7}")
+    for r in results:
+        print(f"{r['mode']:>7} {r['users']:>6} {r['reconnects']:>7} {r['frames']:>10} {r['mbytes']:>9.2f} "
+              f"{r['dropped_frames']:>9} {r['cpu_s']:>7.2f} {r['elapsed_s']:>7.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "presence_storm", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
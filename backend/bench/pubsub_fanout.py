@@ -0,0 +1,145 @@
+"""Benchmark cross-worker broadcast fan-out over the pub/sub bus.
+
+Starts the stand-in hub (``backend/pubsub_hub.py``) on a Unix socket, then
+for each worker count spawns that many processes, each running a
+``ChannelConnectionManager`` with local sockets in one channel. The parent
+broadcasts timestamped messages and each worker reports how long they took
+to reach its sockets.
+
+    python backend/bench/pubsub_fanout.py
+    python backend/bench/pubsub_fanout.py --workers 2 4 8 --messages 2000 --sockets 50
+    python backend/bench/pubsub_fanout.py --url redis://127.0.0.1:6379   # real Redis
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, _REPO_ROOT)
+
+from backend.api.v1.ws import ChannelConnectionManager  # noqa: E402
+from backend.pubsub import RedisBroker  # noqa: E402
+
+CHANNEL = "bench"
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _CountingSocket:
+    """Fake socket; the first one in a worker records delivery latency."""
+
+    def __init__(self, latencies=None):
+        self.latencies = latencies
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.received += 1
+        if self.latencies is not None:
+            self.latencies.append((time.time() - json.loads(data)["sent_at"]) * 1000)
+
+
+def _worker(url: str, sockets: int, messages: int, ready, results) -> None:
+    async def run():
+        latencies = []
+        manager = ChannelConnectionManager(RedisBroker(url))
+        socks = [_CountingSocket(latencies)] + [_CountingSocket() for _ in range(sockets - 1)]
+        for n, sock in enumerate(socks):
+            await manager.connect(CHANNEL, f"user-{os.getpid()}-{n}", sock)
+        ready.put(os.getpid())
+        deadline = time.time() + 60
+        while len(latencies) < messages and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        await manager.close()
+        results.put({"received": len(latencies), "deliveries": sum(s.received for s in socks), "latencies": latencies})
+
+    asyncio.run(run())
+
+
+def run(url: str, workers: int, sockets: int, messages: int) -> dict:
+    ctx = mp.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(url, sockets, messages, ready, results)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    for _ in procs:
+        ready.get(timeout=60)
+
+    async def publish() -> float:
+        manager = ChannelConnectionManager(RedisBroker(url))
+        t0 = time.perf_counter()
+        for i in range(messages):
+            await manager.broadcast_to_channel(CHANNEL, {"type": "message", "seq": i, "sent_at": time.time()})
+        elapsed = time.perf_counter() - t0
+        await manager.close()
+        return elapsed
+
+    publish_s = asyncio.run(publish())
+    reports = [results.get(timeout=120) for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    latencies = [ms for r in reports for ms in r["latencies"]]
+    return {
+        "workers": workers,
+        "sockets_per_worker": sockets,
+        "messages": messages,
+        "publish_msgs_per_s": round(messages / publish_s, 1),
+        "delivered_ratio": round(sum(r["received"] for r in reports) / (messages * workers), 4),
+        "socket_deliveries": sum(r["deliveries"] for r in reports),
+        "latency_p50_ms": round(_percentile(latencies or [0.0], 50), 3),
+        "latency_p99_ms": round(_percentile(latencies or [0.0], 99), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    p.add_argument("--sockets", type=int, default=10, help="Local sockets per worker")
+    p.add_argument("--messages", type=int, default=1000)
+    p.add_argument("--url", help="Use this PUBSUB_URL instead of starting the stand-in hub")
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    hub = None
+    url = args.url
+    if url is None:
+        sock = os.path.join(_TMPDIR, "hub.sock")
+        hub = subprocess.Popen([sys.executable, os.path.join(_REPO_ROOT, "backend", "pubsub_hub.py"), "--unix", sock])
+        while not os.path.exists(sock):
+            time.sleep(0.05)
+        url = f"unix://{sock}"
+    try:
+        results = [run(url, n, args.sockets, args.messages) for n in args.workers]
+    finally:
+        if hub is not None:
+            hub.terminate()
+            hub.wait()
+
+    print(f"{'workers':>8} {'publish/s':>10} {'delivered':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['publish_msgs_per_s']:>10.1f} {r['delivered_ratio']:>10.2%} "
+              f"{r['latency_p50_ms']:>8.2f} {r['latency_p99_ms']:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "pubsub_fanout", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
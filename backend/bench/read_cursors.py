@@ -0,0 +1,156 @@
+"""Benchmark unread counts and read-ack persistence.
+
+Seeds ``--messages`` messages over ``--channels`` channels, all joined by
+one user who has read a random prefix of each. Times the unread query the
+API runs (``channels.message_count - channel_members.last_read_seq``)
+against counting newer messages per channel with ``COUNT(*)`` over the
+``(channel_id, created_at)`` index. Then sends ``--acks`` read acks
+through ``ReadCursors`` and reports the rows and transactions they cost.
+
+    python backend/bench/read_cursors.py
+    python backend/bench/read_cursors.py --messages 1000000 --channels 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import event, select, text  # noqa: E402
+
+from backend.database import AsyncSessionLocal, async_write_engine, engine  # noqa: E402
+from backend.models import Channel, ChannelMember, Message, User  # noqa: E402
+from backend.read_cursors import ReadCursors  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+_COUNT_UNREAD = text("""
+    SELECT cm.channel_id,
+           (SELECT COUNT(*) FROM messages m
+            WHERE m.channel_id = cm.channel_id
+              AND m.created_at > COALESCE(cm.last_read_at, '')) AS unread
+    FROM channel_members cm WHERE cm.user_id = :user_id""")
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(size: int, channels: int) -> tuple:
+    """Messages, counters and one member per channel with a random read prefix."""
+    rng = random.Random(0)
+    user_id = str(uuid.uuid4())
+    channel_ids = [str(uuid.uuid4()) for _ in range(channels)]
+    per_channel = size // channels
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    last_ids = {}
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": user_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), [
+            {"id": c, "name": f"bench-{c[:12]}", "message_count": per_channel} for c in channel_ids
+        ])
+        members = []
+        for n, channel_id in enumerate(channel_ids):
+            rows = [
+                {"id": str(uuid.uuid4()), "channel_id": channel_id, "sender_id": user_id, "content": f"m{i}",
+                 "status": "sent", "seq": i + 1, "created_at": start + timedelta(seconds=i * channels + n)}
+                for i in range(per_channel)
+            ]
+            conn.execute(Message.__table__.insert(), rows)
+            read = rows[rng.randrange(per_channel)]
+            last_ids[channel_id] = rows[-1]["id"]
+            members.append({"user_id": user_id, "channel_id": channel_id, "last_read_seq": read["seq"],
+                            "last_read_message_id": read["id"], "last_read_at": read["created_at"]})
+        conn.execute(ChannelMember.__table__.insert(), members)
+    return user_id, last_ids
+
+
+async def time_queries(user_id: str, samples: int) -> list:
+    counters = (
+        select(ChannelMember.channel_id, (Channel.message_count - ChannelMember.last_read_seq).label("unread"))
+        .join(Channel, Channel.id == ChannelMember.channel_id)
+        .where(ChannelMember.user_id == user_id)
+    )
+    results, answers = [], {}
+    async with AsyncSessionLocal() as db:
+        for mode, statement in (("counters", counters), ("count(*)", _COUNT_UNREAD)):
+            timings = []
+            for _ in range(samples):
+                t0 = time.perf_counter()
+                rows = (await db.execute(statement, {"user_id": user_id})).all()
+                timings.append((time.perf_counter() - t0) * 1000)
+            answers[mode] = dict(rows)
+            results.append({
+                "mode": mode, "channels": len(rows), "unread": sum(answers[mode].values()),
+                "p50_ms": round(_percentile(timings, 50), 2), "p99_ms": round(_percentile(timings, 99), 2),
+            })
+    assert answers["counters"] == answers["count(*)"], "unread counts disagree"
+    return results
+
+
+async def time_acks(user_id: str, last_ids: dict, acks: int) -> dict:
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    event.listen(async_write_engine.sync_engine, "before_cursor_execute", on_execute)
+    event.listen(async_write_engine.sync_engine, "commit", on_commit)
+    cursors = ReadCursors(flush_interval_ms=60_000)
+    channel_ids = list(last_ids)
+    t0 = time.perf_counter()
+    for i in range(acks):
+        channel_id = channel_ids[i % len(channel_ids)]
+        cursors.ack(user_id, channel_id, last_ids[channel_id])
+    await cursors.flush()
+    elapsed = time.perf_counter() - t0
+    event.remove(async_write_engine.sync_engine, "before_cursor_execute", on_execute)
+    event.remove(async_write_engine.sync_engine, "commit", on_commit)
+    return {"acks": acks, "acks_per_s": round(acks / elapsed), "rows_written": cursors.rows_written, **counts}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=500_000)
+    p.add_argument("--channels", type=int, default=50)
+    p.add_argument("--samples", type=int, default=30)
+    p.add_argument("--acks", type=int, default=100_000)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    user_id, last_ids = seed(args.messages, args.channels)
+
+    async def _run_all() -> tuple:
+        return await time_queries(user_id, args.samples), await time_acks(user_id, last_ids, args.acks)
+
+    queries, acks = asyncio.run(_run_all())
+
+    print(f"{'query':>9} {'channels':>9} {'unread':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in queries:
+        print(f"{r['mode']:>9} {r['channels']:>9} {r['unread']:>8} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    print(f"\n{acks['acks']} acks: {acks['acks_per_s']} acks/s, {acks['rows_written']} rows written, "
+          f"{acks['statements']} statements, {acks['commits']} commits")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "read_cursors", "queries": queries, "acks": acks}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
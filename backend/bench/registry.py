@@ -0,0 +1,195 @@
+"""Benchmark the connection registry at 100k simulated connections.
+
+Registers N in-process fake sockets with ``ChannelConnectionManager`` (spread
+over channels, with several devices per user) and reports memory per
+connection plus connect, disconnect, online-check and disconnect-all
+latencies. The ``legacy`` mode models the previous layout for comparison:
+a ``Set[(user_id, WebSocket)]`` per channel, an eagerly started writer task
+per socket, and ``get_online_users`` rebuilding a set on every call.
+
+    python backend/bench/registry.py
+    python backend/bench/registry.py --connections 100000 --channels 1000 --devices 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.api.v1.ws import ChannelConnectionManager  # noqa: E402
+from backend.pubsub import InMemoryBroker  # noqa: E402
+
+# Per-connect INFO logs would dominate the timings (the legacy model has none).
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Socket:
+    __slots__ = ()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+class _LegacyConnection:
+    """Per-socket state as it was before the registry: a plain object with an
+    eager queue, wakeup event and a parked writer task."""
+
+    def __init__(self, websocket, user_id):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.channels = set()
+        self.queue = deque()
+        self.keyed = {}
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.wakeup.wait())
+
+
+class _LegacyManager:
+    def __init__(self):
+        self.active_channels = {}
+        self.connections = {}
+
+    async def connect(self, channel_id, user_id, websocket):
+        conn = _LegacyConnection(websocket, user_id)
+        self.connections[websocket] = conn
+        self.active_channels.setdefault(channel_id, set()).add((user_id, websocket))
+        conn.channels.add(channel_id)
+
+    async def disconnect(self, channel_id, user_id, websocket):
+        members = self.active_channels.get(channel_id)
+        members.discard((user_id, websocket))
+        if not members:
+            del self.active_channels[channel_id]
+        conn = self.connections.pop(websocket)
+        conn.task.cancel()
+
+    async def disconnect_user(self, user_id):
+        # No reverse index: scan every channel for the user's sockets.
+        for channel_id in list(self.active_channels):
+            for member in [m for m in self.active_channels[channel_id] if m[0] == user_id]:
+                await self.disconnect(channel_id, user_id, member[1])
+
+    def get_online_users(self, channel_id):
+        return {user_id for user_id, _ in self.active_channels.get(channel_id, ())}
+
+    def is_online(self, channel_id, user_id):
+        return user_id in self.get_online_users(channel_id)
+
+    async def close(self):
+        for conn in self.connections.values():
+            conn.task.cancel()
+
+
+async def run(mode: str, connections: int, channels: int, devices: int, samples: int) -> dict:
+    users = max(1, connections // devices)
+    plan = [(f"c{i % channels}", f"u{i % users}", _Socket()) for i in range(connections)]
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    manager = _LegacyManager() if mode == "legacy" else ChannelConnectionManager(InMemoryBroker())
+    connect_us = []
+    for channel_id, user_id, ws in plan:
+        t0 = time.perf_counter()
+        await manager.connect(channel_id, user_id, ws)
+        connect_us.append((time.perf_counter() - t0) * 1e6)
+    await asyncio.sleep(0)  # let legacy writer tasks start and park
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    probe = [plan[(i * 7919) % connections] for i in range(samples)]
+    online_us = []
+    for channel_id, user_id, _ in probe:
+        t0 = time.perf_counter()
+        manager.is_online(channel_id, user_id)
+        online_us.append((time.perf_counter() - t0) * 1e6)
+
+    list_us = []
+    for channel_id, _, _ in probe:
+        t0 = time.perf_counter()
+        len(manager.get_online_users(channel_id))
+        list_us.append((time.perf_counter() - t0) * 1e6)
+
+    kick_us = []
+    for i in range(min(samples, 200)):
+        user_id = plan[(i * 104729) % connections][1]
+        t0 = time.perf_counter()
+        await manager.disconnect_user(user_id)
+        kick_us.append((time.perf_counter() - t0) * 1e6)
+
+    remaining = [(c, u, ws) for c, u, ws in plan if ws in manager.connections]
+    disconnect_us = []
+    for channel_id, user_id, ws in remaining[:samples]:
+        t0 = time.perf_counter()
+        await manager.disconnect(channel_id, user_id, ws)
+        disconnect_us.append((time.perf_counter() - t0) * 1e6)
+    await manager.close()
+
+    return {
+        "mode": mode,
+        "connections": connections,
+        "channels": channels,
+        "users": users,
+        "bytes_per_connection": round(used / connections),
+        "connect_p50_us": round(_percentile(connect_us, 50), 2),
+        "disconnect_p50_us": round(_percentile(disconnect_us, 50), 2),
+        "is_online_p50_us": round(_percentile(online_us, 50), 3),
+        "online_users_p50_us": round(_percentile(list_us, 50), 3),
+        "disconnect_user_p50_us": round(_percentile(kick_us, 50), 2),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--connections", type=int, nargs="+", default=[100000])
+    p.add_argument("--channels", type=int, default=100)
+    p.add_argument("--devices", type=int, default=2, help="Connections per user")
+    p.add_argument("--samples", type=int, default=2000)
+    p.add_argument("--modes", nargs="+", default=["legacy", "registry"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, n, args.channels, args.devices, args.samples)
+            for n in args.connections
+            for mode in args.modes
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>9} {'conns':>7} {'B/conn':>7} {'connect':>8} {'disconn':>8} "
+          f"{'online?':>8} {'online[]':>9} {'kick user':>10}  (p50, us)")
+    for r in results:
+        print(f"{r['mode']:>9} {r['connections']:>7} {r['bytes_per_connection']:>7} {r['connect_p50_us']:>8.2f} "
+              f"{r['disconnect_p50_us']:>8.2f} {r['is_online_p50_us']:>8.3f} {r['online_users_p50_us']:>9.3f} "
+              f"{r['disconnect_user_p50_us']:>10.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "registry", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
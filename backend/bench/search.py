@@ -0,0 +1,137 @@
+"""Benchmark full-text message search on a large corpus.
+
+Seeds ``--messages`` messages (default 1M) over ``--channels`` channels,
+drawn from a Zipf-like vocabulary so there are both rare and very common
+words. The FTS index is maintained by triggers while seeding. Each query
+is then timed through ``search.search_messages`` in one channel and across
+``--user-channels`` channels, next to a ``LIKE '%word%'`` scan of the
+same scope (newest first, unranked) as the no-index baseline.
+
+    python backend/bench/search.py
+    python backend/bench/search.py --messages 200000 --samples 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import bindparam, text  # noqa: E402
+
+from backend.database import AsyncSessionLocal, engine  # noqa: E402
+from backend.models import Channel, Message, User  # noqa: E402
+from backend.search import search_messages  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+VOCABULARY = 20_000
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _word(rank: int) -> str:
+    return f"w{rank}x"
+
+
+def seed(size: int, channels: int) -> tuple:
+    rng = random.Random(0)
+    ranks = list(range(1, VOCABULARY + 1))
+    cum_weights = list(itertools.accumulate(1 / r for r in ranks))
+    sender_id = str(uuid.uuid4())
+    channel_ids = [str(uuid.uuid4()) for _ in range(channels)]
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": sender_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), [{"id": c, "name": f"bench-{c[:12]}"} for c in channel_ids])
+        for offset in range(0, size, 50_000):
+            conn.execute(Message.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "channel_id": channel_ids[i % channels], "sender_id": sender_id,
+                 "content": " ".join(map(_word, rng.choices(ranks, cum_weights=cum_weights, k=rng.randint(4, 16)))),
+                 "status": "sent", "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(size, offset + 50_000))
+            ])
+    return channel_ids, time.perf_counter() - t0
+
+
+async def _like(db, word: str, channel_ids: list, limit: int) -> list:
+    return (await db.execute(text(
+        "SELECT id FROM messages WHERE channel_id IN :channels AND content LIKE :pattern "
+        "ORDER BY created_at DESC LIMIT :limit"
+    ).bindparams(bindparam("channels", expanding=True)), {
+        "channels": channel_ids, "pattern": f"%{word}%", "limit": limit,
+    })).all()
+
+
+async def run(queries: dict, channel_ids: list, user_channels: int, samples: int, limit: int) -> list:
+    results = []
+    scopes = {"channel": channel_ids[:1], f"{user_channels} channels": channel_ids[:user_channels]}
+    async with AsyncSessionLocal() as db:
+        for name, q in queries.items():
+            for scope, channels in scopes.items():
+                for mode in ("fts", "like"):
+                    if mode == "like" and " " in q:
+                        continue
+                    timings, hits = [], 0
+                    for _ in range(samples):
+                        t0 = time.perf_counter()
+                        if mode == "fts":
+                            page, _ = await search_messages(db, q, channels, limit)
+                        else:
+                            page = await _like(db, q, channels, limit)
+                        timings.append((time.perf_counter() - t0) * 1000)
+                        hits = len(page)
+                    results.append({
+                        "query": name, "scope": scope, "mode": mode, "hits": hits,
+                        "p50_ms": round(_percentile(timings, 50), 2),
+                        "p99_ms": round(_percentile(timings, 99), 2),
+                    })
+    return results
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=1_000_000)
+    p.add_argument("--channels", type=int, default=100)
+    p.add_argument("--user-channels", type=int, default=20)
+    p.add_argument("--samples", type=int, default=30)
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    channel_ids, seed_s = seed(args.messages, args.channels)
+    print(f"seeded {args.messages} messages (indexed by triggers) in {seed_s:.1f}s")
+    queries = {
+        "rare word": _word(15_000),
+        "common word": _word(3),
+        "two words": f"{_word(3)} {_word(200)}",
+    }
+    results = asyncio.run(run(queries, channel_ids, args.user_channels, args.samples, args.limit))
+
+    print(f"{'query':>12} {'scope':>12} {'mode':>5} {'hits':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['query']:>12} {r['scope']:>12} {r['mode']:>5} {r['hits']:>5} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "search", "seed_s": seed_s, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Benchmark the SQLite storage profile under a mixed read/write load.
+
+Each mode gets a fresh database seeded with ``--messages`` rows. Then
+``--writers`` senders persist messages while ``--readers`` tasks fetch the
+newest history page, for ``--seconds``. Writes go through a
+``MessageWriter`` (the group-committed path chat messages take) or, with
+``--write-path transaction``, one transaction per row like the REST writes. ``default`` is the
+engine as it used to be built (rollback journal, synchronous=FULL, writers
+sharing the pool); ``tuned`` applies ``SQLITE_PRAGMAS`` and sends every
+write through the single writer connection, as ``database.py`` now does.
+Reports committed writes per second, failed writes ("database is locked")
+and read latency.
+
+    python backend/bench/sqlite_profile.py
+    python backend/bench/sqlite_profile.py --writers 16 --readers 16 --seconds 10
+    python backend/bench/sqlite_profile.py --write-path transaction
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from backend.database import apply_sqlite_pragmas, async_database_url  # noqa: E402
+from backend.models import Base, Channel, Message, User  # noqa: E402
+from backend.persistence import MessageWriter, new_message_row  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+def _percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(url: str, size: int) -> tuple:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    sender_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    start = datetime.now(UTC) - timedelta(seconds=size)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": sender_id, "name": "bench", "password": "-", "role": "user"})
+        conn.execute(Channel.__table__.insert(), {"id": channel_id, "name": "bench"})
+        for offset in range(0, size, 50_000):
+            conn.execute(Message.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "channel_id": channel_id, "sender_id": sender_id,
+                 "content": f"message {i}", "status": "sent", "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(size, offset + 50_000))
+            ])
+    engine.dispose()
+    return sender_id, channel_id
+
+
+def engines(mode: str, url: str) -> tuple:
+    read = create_async_engine(async_database_url(url))
+    if mode == "default":
+        return read, read
+    write = create_async_engine(async_database_url(url), pool_size=1, max_overflow=0)
+    apply_sqlite_pragmas(read)
+    apply_sqlite_pragmas(write)
+    return read, write
+
+
+async def run(mode: str, messages: int, writers: int, readers: int, seconds: float, write_path: str) -> dict:
+    url = f"sqlite:///{os.path.join(_TMPDIR, f'{mode}.db')}"
+    sender_id, channel_id = seed(url, messages)
+    read_engine, write_engine = engines(mode, url)
+    read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    write_session = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    message_writer = MessageWriter(session_factory=write_session)
+    stats = {"writes": 0, "errors": 0}
+    read_ms = []
+    deadline = time.perf_counter() + seconds
+
+    async def write(row: dict) -> None:
+        if write_path == "writer":
+            await message_writer.submit(row)
+            return
+        async with write_session() as db:
+            await db.execute(insert(Message), [row])
+            await db.commit()
+
+    async def writer():
+        while time.perf_counter() < deadline:
+            try:
+                await write(new_message_row(channel_id, sender_id, "hello"))
+                stats["writes"] += 1
+            except OperationalError:
+                stats["errors"] += 1
+
+    async def reader():
+        page = (select(Message).where(Message.channel_id == channel_id)
+                .order_by(Message.created_at.desc(), Message.id.desc()).limit(50))
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            async with read_session() as db:
+                (await db.scalars(page)).all()
+            read_ms.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(writers)), *(reader() for _ in range(readers)))
+    elapsed = time.perf_counter() - t0
+    await message_writer.close()
+    await read_engine.dispose()
+    await write_engine.dispose()
+    return {
+        "mode": mode,
+        "write_path": write_path,
+        "writes_per_s": round(stats["writes"] / elapsed),
+        "failed_writes": stats["errors"],
+        "reads": len(read_ms),
+        "read_p50_ms": round(_percentile(read_ms, 50), 3),
+        "read_p99_ms": round(_percentile(read_ms, 99), 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=100_000)
+    p.add_argument("--writers", type=int, default=8)
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--write-path", choices=["writer", "transaction"], default="writer")
+    p.add_argument("--modes", nargs="+", default=["default", "tuned"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, args.messages, args.writers, args.readers, args.seconds, args.write_path)
+            for mode in args.modes
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>8} {'writes/s':>9} {'failed':>7} {'reads':>7} {'read p50':>9} {'read p99':>9}  (ms)")
+    for r in results:
+        print(f"{r['mode']:>8} {r['writes_per_s']:>9} {r['failed_writes']:>7} {r['reads']:>7} "
+              f"{r['read_p50_ms']:>9.3f} {r['read_p99_ms']:>9.3f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "sqlite_profile", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark WebSocket fan-out with per-connection send queues.
+
+Attaches N in-process fake sockets to one channel, a fraction of which are
+deliberately slow (each send takes ``--slow-ms``), and broadcasts a burst of
+messages. Reports how long ``broadcast_to_channel`` blocks the caller and the
+delivery latency seen by the fast subscribers, next to the previous
+behaviour of awaiting ``send_text`` on every socket in turn.
+
+    python backend/bench/ws_fanout.py
+    python backend/bench/ws_fanout.py --subscribers 1000 5000 10000 --slow 0.01 --slow-ms 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.api.v1.ws import ChannelConnectionManager  # noqa: E402
+from backend.pubsub import InMemoryBroker  # noqa: E402
+
+CHANNEL = "bench"
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Socket:
+    def __init__(self, sent_at: dict, latencies: list, slow_s: float = 0.0):
+        self.sent_at = sent_at
+        self.latencies = latencies
+        self.slow_s = slow_s
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        if self.slow_s:
+            await asyncio.sleep(self.slow_s)
+            return
+        self.latencies.append((time.perf_counter() - self.sent_at[data]) * 1000)
+
+
+async def _legacy_broadcast(sockets: list, payload: str) -> None:
+    for ws in sockets:
+        try:
+            await ws.send_text(payload)
+        except Exception:
+            pass
+
+
+async def run(mode: str, subscribers: int, slow_fraction: float, slow_ms: float, messages: int) -> dict:
+    sent_at, latencies = {}, []
+    slow_every = int(1 / slow_fraction) if slow_fraction else 0
+    sockets = [
+        _Socket(sent_at, latencies, slow_ms / 1000 if slow_every and i % slow_every == 0 else 0.0)
+        for i in range(subscribers)
+    ]
+    fast = sum(1 for s in sockets if not s.slow_s)
+    manager = ChannelConnectionManager(InMemoryBroker())
+    for i, ws in enumerate(sockets):
+        await manager.connect(CHANNEL, f"user-{i}", ws)
+
+    call_ms = []
+    t0 = time.perf_counter()
+    for i in range(messages):
+        message = {"type": "message", "seq": i}
+        payload = json.dumps(message)
+        sent_at[payload] = time.perf_counter()
+        c0 = time.perf_counter()
+        if mode == "sequential":
+            await _legacy_broadcast(sockets, payload)
+        else:
+            await manager.broadcast_to_channel(CHANNEL, message)
+        call_ms.append((time.perf_counter() - c0) * 1000)
+        await asyncio.sleep(0)
+    while len(latencies) < fast * messages:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - t0
+    await manager.close()
+
+    return {
+        "mode": mode,
+        "subscribers": subscribers,
+        "slow_subscribers": subscribers - fast,
+        "messages": messages,
+        "broadcast_call_p50_ms": round(_percentile(call_ms, 50), 3),
+        "delivery_p50_ms": round(_percentile(latencies, 50), 3),
+        "delivery_p99_ms": round(_percentile(latencies, 99), 3),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--subscribers", type=int, nargs="+", default=[1000, 5000, 10000])
+    p.add_argument("--slow", type=float, default=0.01, help="Fraction of slow subscribers")
+    p.add_argument("--slow-ms", type=float, default=20.0, help="Send time of a slow subscriber")
+    p.add_argument("--messages", type=int, default=20)
+    p.add_argument("--modes", nargs="+", default=["sequential", "queued"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    async def _run_all() -> list:
+        return [
+            await run(mode, n, args.slow, args.slow_ms, args.messages)
+            for n in args.subscribers
+            for mode in args.modes
+        ]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>10} {'subs':>7} {'slow':>5} {'call p50':>9} {'deliv p50':>10} {'deliv p99':>10}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['subscribers']:>7} {r['slow_subscribers']:>5} {r['broadcast_call_p50_ms']:>9.2f} "
+              f"{r['delivery_p50_ms']:>10.2f} {r['delivery_p99_ms']:>10.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "ws_fanout", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
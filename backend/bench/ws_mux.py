@@ -0,0 +1,144 @@
+"""Load-test one socket per channel against the multiplexed ``/ws/{user_id}``.
+
+Seeds U users who are each members of C channels, then opens their
+channels the way each endpoint does: ``per-channel`` runs one membership
+query and registers one socket per (user, channel); ``multiplexed`` runs a
+single batched membership query and registers one socket per user,
+subscribed to all of its channels. Reports sockets held, server-side
+Python memory for connection state (tracemalloc), membership queries and
+setup time (from a separate, untraced run).
+
+Memory is measured with tracemalloc over the manager's state only; real
+sockets also cost a file descriptor, kernel buffers and the ASGI server's
+per-connection objects, all of which scale with the socket count too.
+
+    python backend/bench/ws_mux.py
+    python backend/bench/ws_mux.py --users 2000 --channels 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.api.v1.ws import ChannelConnectionManager, _member_channels  # noqa: E402
+from backend.database import SessionLocal  # noqa: E402
+from backend.models import Channel, ChannelMember, User  # noqa: E402
+from backend.pubsub import InMemoryBroker  # noqa: E402
+
+logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+class _Socket:
+    __slots__ = ()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def seed(users: int, channels: int, per_user: int) -> dict:
+    """Create users and channels; user i joins ``per_user`` consecutive channels."""
+    db = SessionLocal()
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    channel_ids = [str(uuid.uuid4()) for _ in range(channels)]
+    db.execute(User.__table__.insert(), [
+        {"id": uid, "name": f"bench-{uid[:12]}", "password": "x", "role": "user"} for uid in user_ids
+    ])
+    db.execute(Channel.__table__.insert(), [{"id": cid, "name": f"bench-{cid[:12]}"} for cid in channel_ids])
+    plan = {uid: [channel_ids[(i + k) % channels] for k in range(per_user)] for i, uid in enumerate(user_ids)}
+    db.execute(ChannelMember.__table__.insert(), [
+        {"user_id": uid, "channel_id": cid} for uid, cids in plan.items() for cid in cids
+    ])
+    db.commit()
+    db.close()
+    return plan
+
+
+async def run(mode: str, plan: dict, trace: bool) -> dict:
+    manager = ChannelConnectionManager(InMemoryBroker())
+    queries = 0
+    if trace:
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    for user_id, channel_ids in plan.items():
+        if mode == "per-channel":
+            for channel_id in channel_ids:
+                queries += 1
+                if await _member_channels(user_id, [channel_id]):
+                    await manager.connect(channel_id, user_id, _Socket())
+        else:
+            conn = await manager.accept(user_id, _Socket())
+            queries += 1
+            for channel_id in await _member_channels(user_id, channel_ids):
+                await manager.subscribe(channel_id, conn)
+    elapsed = time.perf_counter() - t0
+    await asyncio.sleep(0.2)  # let presence flush and writers drain
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    sockets = len(manager.connections)
+    subscriptions = sum(len(conn.channels) for conn in manager.connections.values())
+    await manager.close()
+    return {
+        "mode": mode,
+        "users": len(plan),
+        "sockets": sockets,
+        "subscriptions": subscriptions,
+        "membership_queries": queries,
+        "state_mb": round(used / 1e6, 2),
+        "setup_s": round(elapsed, 2),
+    }
+
+
+async def measure(mode: str, plan: dict) -> dict:
+    """Time an untraced run, then take memory from a tracemalloc run."""
+    result = await run(mode, plan, trace=False)
+    result["state_mb"] = (await run(mode, plan, trace=True))["state_mb"]
+    return result
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--channels", type=int, default=200, help="Channels in total")
+    p.add_argument("--per-user", type=int, default=30, help="Channels each user has open")
+    p.add_argument("--modes", nargs="+", default=["per-channel", "multiplexed"])
+    p.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = p.parse_args()
+
+    plan = seed(args.users, args.channels, args.per_user)
+
+    async def _run_all() -> list:
+        return [await measure(mode, plan) for mode in args.modes]
+
+    results = asyncio.run(_run_all())
+
+    print(f"{'mode':>12} {'users':>6} {'sockets':>8} {'subs':>7} {'queries':>8} {'state MB':>9} {'setup s':>8}")
+    for r in results:
+        print(f"{r['mode']:>12} {r['users']:>6} {r['sockets']:>8} {r['subscriptions']:>7} "
+              f"{r['membership_queries']:>8} {r['state_mb']:>9.2f} {r['setup_s']:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"benchmark": "ws_mux", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Process-local cache of users, channels and channel memberships.
+
+Authorization on the hot paths (sending a message, joining a channel,
+opening a WebSocket) needs the user, the channel and the membership row,
+which almost never change. ``entity_cache`` keeps them in memory so those
+checks cost no database round trips in the steady state:
+
+- users and channels are cached by id, including "not found" answers,
+  with LRU eviction and a ``ENTITY_CACHE_TTL_S`` expiry;
+- memberships are cached as the set of channel ids each user belongs to,
+  so a check is a set lookup. Only positive answers are trusted: a channel
+  missing from the set is re-read from the database, since the user may
+  have joined through another worker.
+
+Handlers that create or change these rows call the ``invalidate_*`` /
+``member_added`` hooks. Hit/miss counters are available from ``stats()``.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+from .models import Channel, ChannelMember, User
+
+ENTITY_CACHE_TTL_S = float(os.getenv("ENTITY_CACHE_TTL_S", "300"))
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "100000"))
+
+# Returned by TTLCache.get for keys that are absent or expired.
+MISSING = object()
+
+
+class TTLCache:
+    """LRU mapping whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, key) -> Any:
+        """Like ``get`` but without touching LRU order or counters."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return MISSING
+        return entry[1]
+
+    def set(self, key, value) -> None:
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class UserRecord(NamedTuple):
+    id: str
+    name: str
+    role: str
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserRecord":
+        return cls(user.id, user.name, user.role, user.created_at, user.updated_at)
+
+
+class ChannelRecord(NamedTuple):
+    id: str
+    name: str
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_model(cls, channel: Channel) -> "ChannelRecord":
+        return cls(channel.id, channel.name, channel.created_at, channel.updated_at)
+
+
+class EntityCache:
+    """Cached, read-only views of users, channels and memberships.
+
+    Lookups take the request's session when there is one; otherwise a
+    short-lived session is opened only on a miss.
+    """
+
+    def __init__(self, maxsize: int = ENTITY_CACHE_SIZE, ttl: float = ENTITY_CACHE_TTL_S,
+                 session_factory=AsyncSessionLocal):
+        self.users = TTLCache(maxsize, ttl)
+        self.channels = TTLCache(maxsize, ttl)
+        # user_id -> set of channel ids the user is a member of
+        self.memberships = TTLCache(maxsize, ttl)
+        self._session_factory = session_factory
+
+    async def _load(self, db: Optional[AsyncSession], loader):
+        if db is not None:
+            return await loader(db)
+        async with self._session_factory() as session:
+            return await loader(session)
+
+    async def get_user(self, user_id: str, db: Optional[AsyncSession] = None) -> Optional[UserRecord]:
+        record = self.users.get(user_id)
+        if record is MISSING:
+            async def load(session):
+                user = await session.get(User, user_id)
+                return UserRecord.from_model(user) if user else None
+            record = await self._load(db, load)
+            self.users.set(user_id, record)
+        return record
+
+    async def get_channel(self, channel_id: str, db: Optional[AsyncSession] = None) -> Optional[ChannelRecord]:
+        record = self.channels.get(channel_id)
+        if record is MISSING:
+            async def load(session):
+                channel = await session.get(Channel, channel_id)
+                return ChannelRecord.from_model(channel) if channel else None
+            record = await self._load(db, load)
+            self.channels.set(channel_id, record)
+        return record
+
+    async def _load_memberships(self, user_id: str, db: Optional[AsyncSession]) -> Set[str]:
+        async def load(session):
+            return set(await session.scalars(
+                select(ChannelMember.channel_id).where(ChannelMember.user_id == user_id)
+            ))
+        channel_ids = await self._load(db, load)
+        self.memberships.set(user_id, channel_ids)
+        return channel_ids
+
+    async def member_channels(self, user_id: str, channel_ids, db: Optional[AsyncSession] = None) -> Set[str]:
+        """The subset of ``channel_ids`` the user is a member of."""
+        wanted = set(channel_ids)
+        known = self.memberships.get(user_id)
+        if known is MISSING or not wanted <= known:
+            known = await self._load_memberships(user_id, db)
+        return wanted & known
+
+    async def channels_of(self, user_id: str, db: Optional[AsyncSession] = None) -> Set[str]:
+        """Every channel the user is a member of (as of the cached entry)."""
+        known = self.memberships.get(user_id)
+        if known is MISSING:
+            known = await self._load_memberships(user_id, db)
+        return set(known)
+
+    async def is_member(self, user_id: str, channel_id: str, db: Optional[AsyncSession] = None) -> bool:
+        return bool(await self.member_channels(user_id, (channel_id,), db))
+
+    # -- invalidation hooks -------------------------------------------------
+
+    def invalidate_user(self, user_id: str) -> None:
+        self.users.pop(user_id)
+        self.memberships.pop(user_id)
+
+    def invalidate_channel(self, channel_id: str) -> None:
+        self.channels.pop(channel_id)
+
+    def member_added(self, user_id: str, channel_id: str) -> None:
+        known = self.memberships.peek(user_id)
+        if known is not MISSING:
+            known.add(channel_id)
+
+    def clear(self) -> None:
+        for cache in (self.users, self.channels, self.memberships):
+            cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"users": self.users.stats(), "channels": self.channels.stats(),
+                "memberships": self.memberships.stats()}
+
+
+entity_cache = EntityCache()
@@ -0,0 +1,51 @@
+"""Shared test fixtures: the app client and user/channel factories.
+
+The database the tests run against is set up by the repository's root
+``conftest.py``.
+"""
+
+from typing import Optional
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a user with password ``pass123``.
+
+    Returns the session (user fields and ``access_token``) with ``headers``
+    to authenticate as the user.
+    """
+    def make(role: str = "user") -> dict:
+        name = f"{role}_{uuid4().hex[:8]}"
+        response = client.post("/api/v1/users/register", json={"name": name, "password": "pass123", "role": role})
+        assert response.status_code == 200, response.text
+        session = response.json()
+        return {**session, "headers": {"Authorization": f"Bearer {session['access_token']}"}}
+
+    return make
+
+
+@pytest.fixture
+def make_channel(client, make_user):
+    """Create a channel as ``admin`` (a new admin by default), who is its first member.
+
+    Returns the channel as the API does.
+    """
+    def make(admin: Optional[dict] = None, **fields) -> dict:
+        admin = admin or make_user("admin")
+        response = client.post("/api/v1/channels/", headers=admin["headers"],
+                               json={"name": f"chan_{uuid4().hex[:8]}", **fields})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return make
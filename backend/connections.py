@@ -0,0 +1,310 @@
+"""Connection records, outbound queues and the local connection registry.
+
+Each socket gets a :class:`Connection` holding a bounded queue of encoded
+frames and a writer task that drains it. Broadcasting is then an O(1)
+enqueue per subscriber, so a slow client only ever delays itself. What
+happens when a client's queue is full is set by ``WS_SLOW_CONSUMER_POLICY``
+(see :class:`~backend.enums.SlowConsumerPolicy`).
+
+Connections are small ``__slots__`` records: the queue and writer task only
+exist while frames are pending, so idle sockets cost a few hundred bytes.
+:class:`ConnectionRegistry` indexes them by channel and user.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, KeysView, List, Optional, Set
+
+from fastapi import WebSocket
+
+from .enums import SlowConsumerPolicy
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = SlowConsumerPolicy(
+    os.getenv("WS_SLOW_CONSUMER_POLICY", SlowConsumerPolicy.DROP_OLDEST.value)
+)
+
+# WebSocket close code used when a slow consumer is disconnected.
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+# Placeholder for a writer task being started from another event loop.
+_STARTING = object()
+
+
+class Connection:
+    """A WebSocket with a bounded outbound queue and its own writer task.
+
+    Queue entries are ``[coalesce_key, payload]`` lists. Under the
+    ``coalesce`` policy a frame sent with a key overwrites the payload of a
+    still-queued frame with the same key (e.g. presence for a channel), so
+    only the latest state is delivered.
+    """
+
+    __slots__ = (
+        "websocket", "user_id", "max_queue", "policy", "on_failure", "channels",
+        "queue", "keyed", "dropped", "closed", "_loop", "_task",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        max_queue: int = WS_SEND_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = WS_SLOW_CONSUMER_POLICY,
+        on_failure: Optional[Callable[["Connection"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.policy = SlowConsumerPolicy(policy)
+        self.on_failure = on_failure
+        self.channels: Set[str] = set()
+        self.queue: Optional[Deque[List]] = None
+        self.keyed: Optional[Dict[str, List]] = None
+        self.dropped = 0
+        self.closed = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task = None
+
+    def start(self) -> None:
+        """Bind the connection to the running loop; writers are spawned on it."""
+        self._loop = asyncio.get_running_loop()
+
+    def send(self, payload: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queue an encoded frame. Returns False if the connection is gone."""
+        if self.closed:
+            return False
+        coalescing = coalesce_key is not None and self.policy is SlowConsumerPolicy.COALESCE
+        if coalescing and self.keyed:
+            entry = self.keyed.get(coalesce_key)
+            if entry is not None:
+                entry[1] = payload
+                return True
+        queue = self.queue
+        if queue is None:
+            queue = self.queue = deque()
+        if len(queue) >= self.max_queue:
+            if self.policy is SlowConsumerPolicy.DISCONNECT:
+                logger.warning("Disconnecting slow consumer %s", self.user_id)
+                self._fail()
+                self._loop.create_task(self._close_slow())
+                return False
+            oldest = queue.popleft()
+            if oldest[0] is not None and self.keyed and self.keyed.get(oldest[0]) is oldest:
+                del self.keyed[oldest[0]]
+            self.dropped += 1
+        entry = [coalesce_key, payload]
+        queue.append(entry)
+        if coalescing:
+            if self.keyed is None:
+                self.keyed = {}
+            self.keyed[coalesce_key] = entry
+        if self._task is None:
+            self._spawn_writer()
+        return True
+
+    def _spawn_writer(self) -> None:
+        try:
+            same_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            self._task = self._loop.create_task(self._writer())
+        else:
+            # Sender runs on another loop/thread (e.g. test clients that give
+            # each socket its own loop); hand the spawn over to our loop.
+            self._task = _STARTING
+            self._loop.call_soon_threadsafe(self._start_writer_threadsafe)
+
+    def _start_writer_threadsafe(self) -> None:
+        if self._task is _STARTING:
+            self._task = self._loop.create_task(self._writer())
+
+    async def _writer(self) -> None:
+        queue = self.queue
+        try:
+            while queue:
+                entry = queue.popleft()
+                if entry[0] is not None and self.keyed and self.keyed.get(entry[0]) is entry:
+                    del self.keyed[entry[0]]
+                await self.websocket.send_text(entry[1])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Send to user %s failed, dropping connection: %s", self.user_id, e)
+            self._fail()
+            return
+        # Drained: release the queue and task until the next frame arrives.
+        self._task = None
+        self.queue = None
+        self.keyed = None
+
+    def _fail(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.queue = None
+        self.keyed = None
+        if self.on_failure is not None:
+            self.on_failure(self)
+
+    async def _close_slow(self) -> None:
+        self.stop()
+        try:
+            await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        """Stop the writer task; queued frames are discarded."""
+        self.closed = True
+        task = self._task
+        if isinstance(task, asyncio.Task) and task is not asyncio.current_task():
+            task.cancel()
+
+
+class ConnectionRegistry:
+    """Indexes over this process's connections, plus presence on other workers.
+
+    - ``channels``: channel_id -> {user_id: [Connection, ...]}, used for
+      fan-out; the list length is the user's local device count.
+    - ``user_channels``: user_id -> {channel_id: None}, the reverse index
+      for dropping every connection of a user without scanning channels.
+    - ``online``: channel_id -> {user_id: connections on any worker}, so
+      online checks and counts are dict lookups.
+    - ``remote``: channel_id -> node_id -> {user_id: count}, each other
+      worker's contribution to ``online``, replaced wholesale on snapshots.
+    - ``sockets``: WebSocket -> Connection.
+
+    ``on_presence(channel_id, user_id, online)`` is called whenever a user
+    comes online in (or drops off) a tracked channel.
+    """
+
+    __slots__ = ("channels", "user_channels", "online", "remote", "sockets", "on_presence")
+
+    def __init__(self, on_presence: Optional[Callable[[str, str, bool], None]] = None):
+        self.channels: Dict[str, Dict[str, List[Connection]]] = {}
+        self.user_channels: Dict[str, Dict[str, None]] = {}
+        self.online: Dict[str, Dict[str, int]] = {}
+        self.remote: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.sockets: Dict[WebSocket, Connection] = {}
+        self.on_presence = on_presence
+
+    # -- local connections ------------------------------------------------
+
+    def add(self, channel_id: str, conn: Connection) -> bool:
+        """Index ``conn`` in a channel; True if it is the channel's first local one."""
+        users = self.channels.get(channel_id)
+        first = users is None
+        if first:
+            users = self.channels[channel_id] = {}
+        conns = users.get(conn.user_id)
+        if conns is None:
+            users[conn.user_id] = [conn]
+        elif conn in conns:
+            return False
+        else:
+            conns.append(conn)
+        self.user_channels.setdefault(conn.user_id, {})[channel_id] = None
+        conn.channels.add(channel_id)
+        self._count(channel_id, conn.user_id, 1)
+        return first
+
+    def remove(self, channel_id: str, conn: Connection) -> Optional[bool]:
+        """Unindex ``conn`` from a channel.
+
+        Returns None if it was not indexed there, otherwise whether the
+        channel is now without local connections (and was forgotten).
+        """
+        users = self.channels.get(channel_id)
+        conns = users.get(conn.user_id) if users else None
+        if not conns or conn not in conns:
+            return None
+        conns.remove(conn)
+        conn.channels.discard(channel_id)
+        if not conns:
+            del users[conn.user_id]
+            joined = self.user_channels[conn.user_id]
+            del joined[channel_id]
+            if not joined:
+                del self.user_channels[conn.user_id]
+        if users:
+            self._count(channel_id, conn.user_id, -1)
+            return False
+        # No local sockets left: this worker stops tracking the channel.
+        del self.channels[channel_id]
+        self.online.pop(channel_id, None)
+        self.remote.pop(channel_id, None)
+        return True
+
+    def members(self, channel_id: str) -> List[Connection]:
+        """Snapshot of the local connections in a channel."""
+        users = self.channels.get(channel_id)
+        if not users:
+            return []
+        return [conn for conns in users.values() for conn in conns]
+
+    def user_connections(self, user_id: str) -> Iterator[Connection]:
+        """Every local connection of a user, via the reverse index."""
+        seen = set()
+        for channel_id in self.user_channels.get(user_id, ()):
+            for conn in self.channels[channel_id][user_id]:
+                if conn not in seen:
+                    seen.add(conn)
+                    yield conn
+
+    def local_counts(self, channel_id: str) -> Dict[str, int]:
+        return {user_id: len(conns) for user_id, conns in self.channels.get(channel_id, {}).items()}
+
+    def __len__(self) -> int:
+        return len(self.sockets)
+
+    # -- presence ---------------------------------------------------------
+
+    def is_online(self, channel_id: str, user_id: str) -> bool:
+        return user_id in self.online.get(channel_id, ())
+
+    def online_users(self, channel_id: str) -> KeysView:
+        return self.online.get(channel_id, {}).keys()
+
+    def online_count(self, channel_id: str) -> int:
+        return len(self.online.get(channel_id, ()))
+
+    def remote_delta(self, channel_id: str, node_id: str, user_id: str, delta: int) -> None:
+        """Apply a join (+1) or leave (-1) reported by another worker."""
+        counts = self.remote.setdefault(channel_id, {}).setdefault(node_id, {})
+        n = counts.get(user_id, 0) + delta
+        if n < 0:
+            return
+        if n:
+            counts[user_id] = n
+        else:
+            counts.pop(user_id, None)
+        self._count(channel_id, user_id, delta)
+
+    def remote_snapshot(self, channel_id: str, node_id: str, counts: Dict[str, int]) -> None:
+        """Replace everything known about another worker's users in a channel."""
+        nodes = self.remote.setdefault(channel_id, {})
+        for user_id, n in nodes.pop(node_id, {}).items():
+            self._count(channel_id, user_id, -n)
+        if counts:
+            nodes[node_id] = dict(counts)
+            for user_id, n in counts.items():
+                self._count(channel_id, user_id, n)
+
+    def _count(self, channel_id: str, user_id: str, delta: int) -> None:
+        online = self.online.setdefault(channel_id, {})
+        before = online.get(user_id, 0)
+        n = before + delta
+        if n > 0:
+            online[user_id] = n
+        else:
+            online.pop(user_id, None)
+            if not online:
+                del self.online[channel_id]
+        if self.on_presence is not None and (before > 0) != (n > 0):
+            self.on_presence(channel_id, user_id, n > 0)
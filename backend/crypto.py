@@ -1,27 +1,188 @@
-"""Password encryption and verification using AES."""
+"""Password hashing.
 
-from cryptography.fernet import Fernet
-import os
+Passwords are stored as ``$<scheme>$<params>$<salt>$<key>``, where ``key``
+is a memory-hard KDF of the password (scrypt by default; ``HASHERS`` maps
+schemes to hashers, ``PASSWORD_HASHER`` picks the one new hashes use).
+One hash costs tens of milliseconds of CPU by design, so the KDF never
+runs on the event loop or in the threadpool shared with sync routes: it
+runs on a dedicated process pool of ``PASSWORD_HASH_WORKERS`` processes
+(optionally at lower CPU priority, ``PASSWORD_HASH_NICE``), started with
+the app (``start``). At most ``PASSWORD_HASH_MAX_PENDING`` hashes are
+admitted at a time; past that ``HasherBusy`` is raised (login answers 503)
+instead of queueing an unbounded login burst ahead of chat traffic.
+
+Passwords stored by earlier versions are reversible Fernet ciphertext
+under ``ENCRYPTION_KEY``. They still verify (inline: decrypting is cheap),
+and ``needs_rehash`` tells login to replace them with a hash, as it does
+hashes made with an older scheme or cost.
+"""
+
+import asyncio
 import base64
+import functools
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Tuple
+
+from cryptography.fernet import Fernet
 
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt")
+# scrypt cost: N (CPU and memory, a power of two), r (block size), p (parallelism).
+# Memory per hash is 128 * N * r bytes (16 MiB at the defaults).
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "1"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", "0"))
 
-# Generate a simple fixed key for development (in production, use env var or key management service)
+# Legacy Fernet key (in production, use env var or key management service)
 _KEY = os.getenv("ENCRYPTION_KEY", "default-dev-key-change-in-production")
 # Pad or hash the key to 32 bytes for Fernet
 _KEY_BYTES = base64.urlsafe_b64encode((_KEY * 4)[:32].encode()).decode()
 _CIPHER = Fernet(_KEY_BYTES)
 
+_SALT_BYTES = 16
+
+
+class HasherBusy(Exception):
+    """``PASSWORD_HASH_MAX_PENDING`` hashes are already admitted."""
+
+
+class ScryptHasher:
+    """scrypt through ``hashlib`` (OpenSSL)."""
+
+    scheme = "scrypt"
+
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P,
+                 dklen: int = 32):
+        self.n, self.r, self.p, self.dklen = n, r, p, dklen
+
+    @property
+    def params(self) -> str:
+        """Cost parameters as stored in the hash."""
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    def kdf(self, password: str, salt: bytes, params: str, dklen: Optional[int] = None) -> Callable[[], bytes]:
+        """The key derivation, as a call for a pool worker.
+
+        It must pickle without this module, so workers never import the app.
+        """
+        cost = dict(item.split("=", 1) for item in params.split(","))
+        n, r, p = int(cost["n"]), int(cost["r"]), int(cost["p"])
+        return functools.partial(hashlib.scrypt, password.encode(), salt=salt, n=n, r=r, p=p,
+                                 maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=dklen or self.dklen)
+
+
+HASHERS = {"scrypt": ScryptHasher}
+
+hasher = HASHERS[PASSWORD_HASHER]()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _decode(encoded: str) -> Tuple[str, str, bytes, bytes]:
+    """``(scheme, params, salt, key)``; raises ValueError if malformed."""
+    _, scheme, params, salt, key = encoded.split("$")
+    return scheme, params, _unb64(salt), _unb64(key)
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Not forked from the app, which already runs threads (aiosqlite,
+        # the log listener): workers come from a fresh forkserver (or are
+        # spawned) and only ever unpickle the KDF call.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        renice = PASSWORD_HASH_NICE and hasattr(os, "nice")
+        _pool = ProcessPoolExecutor(PASSWORD_HASH_WORKERS, mp_context=context,
+                                    initializer=os.nice if renice else None,
+                                    initargs=(PASSWORD_HASH_NICE,) if renice else ())
+    return _pool
+
+
+async def start() -> None:
+    """Start the worker processes now rather than on the first login."""
+    loop = asyncio.get_running_loop()
+    pool = _executor()
+    await asyncio.gather(*(loop.run_in_executor(pool, os.getpid) for _ in range(PASSWORD_HASH_WORKERS)))
+
+
+async def _derive(kdf: Callable[[], bytes]) -> bytes:
+    global _pending, _pool
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HasherBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor(), kdf)
+    except BrokenProcessPool:
+        _pool = None  # a worker died; start a fresh pool on the next call
+        raise
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """Hash with the current hasher. Raises ``HasherBusy`` when saturated."""
+    salt = os.urandom(_SALT_BYTES)
+    key = await _derive(hasher.kdf(password, salt, hasher.params))
+    return f"${hasher.scheme}${hasher.params}${_b64(salt)}${_b64(key)}"
+
+
+async def verify_password(encoded: str, plaintext: str) -> bool:
+    """Whether ``plaintext`` matches the stored password (hash or legacy ciphertext).
+
+    Raises ``HasherBusy`` when saturated.
+    """
+    if not encoded.startswith("$"):
+        return _verify_legacy(encoded, plaintext)
+    try:
+        scheme, params, salt, key = _decode(encoded)
+        kdf = HASHERS[scheme]().kdf(plaintext, salt, params, dklen=len(key))
+    except (KeyError, ValueError):
+        return False
+    return hmac.compare_digest(await _derive(kdf), key)
+
+
+def needs_rehash(encoded: str) -> bool:
+    """Whether a verified password should be hashed again with the current hasher."""
+    if not encoded.startswith("$"):
+        return True
+    _, scheme, params, _ = encoded.split("$", 3)
+    return scheme != hasher.scheme or params != hasher.params
+
+
+def close() -> None:
+    """Stop the worker processes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
 
 def encrypt_password(password: str) -> str:
-    """Encrypt password using AES (Fernet)."""
+    """Legacy: encrypt password using AES (Fernet). Kept for tests and migrations."""
     encrypted = _CIPHER.encrypt(password.encode())
     return encrypted.decode()
 
 
-def verify_password(encrypted_password: str, plaintext: str) -> bool:
-    """Verify plaintext password against encrypted stored password."""
+def _verify_legacy(encrypted_password: str, plaintext: str) -> bool:
     try:
         decrypted = _CIPHER.decrypt(encrypted_password.encode()).decode()
-        return decrypted == plaintext
+        return hmac.compare_digest(decrypted.encode(), plaintext.encode())
     except Exception:
         return False
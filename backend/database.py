@@ -1,30 +1,226 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import case, create_engine, event, func, inspect, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from .models import Base
+from . import metrics, query_log
+from .models import Base, Channel, ChannelMember, Message, MessageSegment
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
-if DATABASE_URL.startswith("sqlite"):
+# Async drivers used by the request/WebSocket path.
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` rewritten to use the async driver for its backend."""
+    parsed = make_url(url)
+    backend = parsed.drivername.split("+", 1)[0]
+    if backend in _ASYNC_DRIVERS:
+        parsed = parsed.set(drivername=_ASYNC_DRIVERS[backend])
+    return parsed.render_as_string(hide_password=False)
+
+
+# Storage profile. SQLite: every connection gets these pragmas (WAL lets
+# readers run alongside the writer; synchronous=NORMAL is durable across
+# application crashes in WAL mode and only fsyncs at checkpoints), and all
+# async writes go through one dedicated connection so writers queue in the
+# pool instead of fighting over the database lock. Set SQLITE_JOURNAL_MODE
+# or SQLITE_SYNCHRONOUS to "" to keep SQLite's own defaults.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE_MB", "256")) * 1024 * 1024,
+}
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "true").lower() in ("1", "true", "yes")
+
+# Postgres (and other server databases): connection pool settings.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).drivername.startswith("sqlite")
+
+
+def _is_sqlite_file(url: str) -> bool:
+    return is_sqlite(url) and make_url(url).database not in (None, "", ":memory:")
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict = SQLITE_PRAGMAS) -> None:
+    """Run ``PRAGMA name=value`` on every new connection of ``engine``."""
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items() if value != ""]
+    target = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+def pool_options(url: str) -> dict:
+    """Engine pool keyword arguments for ``url``'s backend."""
+    if is_sqlite(url):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Sync engine: schema management, scripts and benchmarks.
+if is_sqlite(DATABASE_URL):
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
+    apply_sqlite_pragmas(engine)
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: everything that runs on the event loop (REST routes and WS).
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_options(DATABASE_URL))
+
+# Async engine for writes. On SQLite this is a pool of exactly one
+# connection; elsewhere it is the shared engine.
+if is_sqlite(DATABASE_URL):
+    apply_sqlite_pragmas(async_engine)
+    if SQLITE_SINGLE_WRITER and _is_sqlite_file(DATABASE_URL):
+        async_write_engine = create_async_engine(
+            async_database_url(DATABASE_URL), pool_size=1, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT_S
+        )
+        apply_sqlite_pragmas(async_write_engine)
+    else:
+        async_write_engine = async_engine
+else:
+    async_write_engine = async_engine
+
+# expire_on_commit=False keeps committed objects readable without a refresh
+# round trip; column defaults are generated client-side at flush time.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncWriteSessionLocal = async_sessionmaker(
+    async_write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Statement timing for /metrics and the query log (see metrics.py, query_log.py).
+for _engine in {engine, async_engine, async_write_engine}:
+    if metrics.METRICS_ENABLED:
+        metrics.instrument_engine(_engine)
+    if query_log.QUERY_LOG_ENABLED:
+        query_log.instrument_engine(_engine)
+
+# Run (in this order) when init_db adds the column to an existing table.
+_BACKFILLS = {
+    ("messages", "seq"): """
+        UPDATE messages SET seq = numbered.n FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY created_at, id) AS n FROM messages
+        ) AS numbered WHERE numbered.id = messages.id""",
+    ("channels", "message_count"): """
+        UPDATE channels SET message_count = (
+            SELECT COALESCE(MAX(seq), 0) FROM messages WHERE messages.channel_id = channels.id
+        )""",
+    ("channels", "member_count"): """
+        UPDATE channels SET member_count = (
+            SELECT COUNT(*) FROM channel_members WHERE channel_members.channel_id = channels.id
+        )""",
+    ("channels", "last_message_at"): """
+        UPDATE channels SET last_message_at = COALESCE(
+            (SELECT MAX(created_at) FROM messages WHERE messages.channel_id = channels.id),
+            (SELECT MAX(last_created_at) FROM message_segments WHERE message_segments.channel_id = channels.id)
+        )""",
+}
+
+
+def _add_missing_columns():
+    """Add model columns that an existing table lacks (development only)."""
+    existing = inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            present = {c["name"] for c in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                added.add((table.name, column.name))
+        for key, statement in _BACKFILLS.items():
+            if key in added:
+                conn.execute(text(statement))
+
+
+def rebuild_channel_stats(bind=None) -> int:
+    """Recompute every channel's activity stats from its rows, in one UPDATE.
+
+    ``member_count`` and ``last_message_at`` are derived from the members,
+    messages and archived segments; ``message_count`` is the number of live
+    plus archived messages, but never below the highest ``seq`` (read
+    cursors count against it). Returns the number of channels updated.
+    """
+    def scalar(column, *where):
+        return select(column).where(*where).scalar_subquery()
+
+    in_channel = Message.channel_id == Channel.id
+    in_segments = MessageSegment.channel_id == Channel.id
+    top_seq = scalar(func.coalesce(func.max(Message.seq), 0), in_channel)
+    stored = (scalar(func.count(), in_channel)
+              + scalar(func.coalesce(func.sum(MessageSegment.message_count), 0), in_segments))
+    statement = update(Channel).values(
+        member_count=scalar(func.count(), ChannelMember.channel_id == Channel.id),
+        message_count=case((top_seq > stored, top_seq), else_=stored),
+        last_message_at=func.coalesce(scalar(func.max(Message.created_at), in_channel),
+                                      scalar(func.max(MessageSegment.last_created_at), in_segments)),
+        updated_at=Channel.updated_at,
+    )
+    with (bind or engine).begin() as conn:
+        return conn.execute(statement).rowcount
+
+
 def init_db():
     """Create database tables (development only)."""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all() skips indexes on tables that already exist, so add any
+    # that were introduced after the table was first created.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    from .search import ensure_search_index
+    ensure_search_index(engine)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_write_db():
+    """Session for requests that write (uses the single SQLite writer)."""
+    async with AsyncWriteSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -10,3 +10,14 @@ class MessageStatus(str, enum.Enum):
     SENT = "sent"
     DELIVERED = "delivered"
     READ = "read"
+
+
+class DurabilityMode(str, enum.Enum):
+    AFTER_COMMIT = "after_commit"    # broadcast once the message is committed
+    WRITE_BEHIND = "write_behind"    # broadcast immediately, persist in the background
+
+
+class SlowConsumerPolicy(str, enum.Enum):
+    DROP_OLDEST = "drop_oldest"      # discard the oldest queued frame
+    COALESCE = "coalesce"            # keyed frames replace their queued predecessor
+    DISCONNECT = "disconnect"        # close the socket
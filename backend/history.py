@@ -0,0 +1,201 @@
+"""In-memory ring buffer of each channel's most recent messages.
+
+Every message broadcast by this process (from the WebSocket and REST send
+paths, and from other workers via the pub/sub bus) is appended to its
+channel's buffer, which keeps the last ``HISTORY_BUFFER_SIZE`` messages.
+Buffers are kept in LRU order and the least recently used channels are
+evicted once the estimated total size passes ``HISTORY_BUFFER_MAX_MB``.
+
+The buffer serves the first page of REST history and the gap a client
+missed while reconnecting (``last_seen_id``), so neither touches the
+database in the common case. A channel's buffer is only created from a
+database read (``seed``); after that, appends keep it exact.
+"""
+
+import logging
+import os
+from collections import OrderedDict, deque
+from datetime import datetime, UTC
+from typing import Deque, Dict, List, Optional
+
+from .enums import MessageStatus
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", "200"))
+HISTORY_BUFFER_MAX_MB = float(os.getenv("HISTORY_BUFFER_MAX_MB", "64"))
+
+# Rough per-message overhead of a row dict and its strings, in bytes.
+_ROW_OVERHEAD = 600
+
+MESSAGE_FIELDS = ("id", "channel_id", "sender_id", "content", "status", "created_at")
+
+
+def _row_size(row: dict) -> int:
+    return _ROW_OVERHEAD + len(row["content"])
+
+
+def message_frame(row: dict) -> dict:
+    """The WebSocket frame for a chat message row."""
+    return {
+        "type": "message",
+        "channel_id": row["channel_id"],
+        "id": row["id"],
+        "sender_id": row["sender_id"],
+        "content": row["content"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def row_from_frame(frame: dict) -> dict:
+    """Inverse of :func:`message_frame`, for messages received over the bus."""
+    return {
+        "id": frame["id"],
+        "channel_id": frame["channel_id"],
+        "sender_id": frame["sender_id"],
+        "content": frame["content"],
+        "status": MessageStatus.SENT.value,
+        "created_at": datetime.fromisoformat(frame["created_at"]),
+    }
+
+
+def row_from_model(message) -> dict:
+    """Buffer row for a ``Message`` loaded from the database."""
+    row = {field: getattr(message, field) for field in MESSAGE_FIELDS}
+    if row["created_at"].tzinfo is None:
+        row["created_at"] = row["created_at"].replace(tzinfo=UTC)
+    return row
+
+
+class _ChannelBuffer:
+    __slots__ = ("rows", "complete", "size")
+
+    def __init__(self, capacity: int):
+        self.rows: Deque[dict] = deque(maxlen=capacity)
+        # True while the buffer holds the channel's entire history.
+        self.complete = False
+        self.size = 0
+
+
+class RecentMessages:
+    """Per-channel ring buffers with LRU eviction under a global size cap."""
+
+    def __init__(self, capacity: int = HISTORY_BUFFER_SIZE, max_mb: float = HISTORY_BUFFER_MAX_MB):
+        self.capacity = capacity
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.bytes = 0
+        self._buffers: "OrderedDict[str, _ChannelBuffer]" = OrderedDict()
+        # channel_id -> rows recorded while a seed query is in flight, or
+        # None if the channel was discarded meanwhile (the seed is dropped)
+        self._seeding: Dict[str, Optional[List[dict]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, channel_id: str) -> bool:
+        return channel_id in self._buffers
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    # -- writes -----------------------------------------------------------
+
+    def record(self, row: dict) -> None:
+        """Append a newly sent message to its channel's buffer, if buffered."""
+        channel_id = row["channel_id"]
+        seeding = self._seeding.get(channel_id)
+        if seeding is not None:
+            seeding.append(row)
+        buf = self._buffers.get(channel_id)
+        if buf is None:
+            return
+        self._append(buf, row)
+        self._buffers.move_to_end(channel_id)
+        self._enforce_cap()
+
+    def begin_seed(self, channel_id: str) -> None:
+        """Call before reading a channel's newest rows from the database."""
+        self._seeding.setdefault(channel_id, [])
+
+    def seed(self, channel_id: str, newest_first: List[dict]) -> None:
+        """Create a channel's buffer from its newest rows (as read from the DB).
+
+        Rows recorded since ``begin_seed`` are merged in, so a message sent
+        while the query was running is not lost.
+        """
+        recorded = self._seeding.pop(channel_id, [])
+        if recorded is None or channel_id in self._buffers:
+            return
+        rows = newest_first[::-1]
+        seen = {row["id"] for row in rows}
+        rows.extend(row for row in recorded if row["id"] not in seen)
+        buf = _ChannelBuffer(self.capacity)
+        buf.complete = len(newest_first) < self.capacity
+        for row in rows:
+            self._append(buf, row)
+        self._buffers[channel_id] = buf
+        self._enforce_cap()
+
+    def cancel_seed(self, channel_id: str) -> None:
+        self._seeding.pop(channel_id, None)
+
+    def discard(self, channel_id: str) -> None:
+        """Forget a channel whose writes this process can no longer see.
+
+        A seed already in flight for the channel is dropped as well.
+        """
+        if channel_id in self._seeding:
+            self._seeding[channel_id] = None
+        buf = self._buffers.pop(channel_id, None)
+        if buf is not None:
+            self.bytes -= buf.size
+
+    def _append(self, buf: _ChannelBuffer, row: dict) -> None:
+        if len(buf.rows) == buf.rows.maxlen:
+            dropped = buf.rows[0]
+            buf.size -= _row_size(dropped)
+            self.bytes -= _row_size(dropped)
+            buf.complete = False
+        buf.rows.append(row)
+        size = _row_size(row)
+        buf.size += size
+        self.bytes += size
+
+    def _enforce_cap(self) -> None:
+        while self.bytes > self.max_bytes and len(self._buffers) > 1:
+            _, buf = self._buffers.popitem(last=False)
+            self.bytes -= buf.size
+            self.evictions += 1
+
+    # -- reads ------------------------------------------------------------
+
+    def latest(self, channel_id: str, limit: int) -> Optional[List[dict]]:
+        """The newest ``limit`` messages, newest first; None if not buffered."""
+        buf = self._buffers.get(channel_id)
+        if buf is None or (len(buf.rows) < limit and not buf.complete):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._buffers.move_to_end(channel_id)
+        rows = buf.rows
+        return [rows[i] for i in range(len(rows) - 1, max(len(rows) - limit, 0) - 1, -1)]
+
+    def since(self, channel_id: str, message_id: str) -> Optional[List[dict]]:
+        """Messages after ``message_id``, oldest first.
+
+        Returns None when the message is not in the buffer (the gap may be
+        older than what is kept), in which case callers go to the database.
+        """
+        buf = self._buffers.get(channel_id)
+        if buf is not None:
+            rows = buf.rows
+            for i in range(len(rows) - 1, -1, -1):
+                if rows[i]["id"] == message_id:
+                    self.hits += 1
+                    self._buffers.move_to_end(channel_id)
+                    return [rows[j] for j in range(i + 1, len(rows))]
+        self.misses += 1
+        return None
+
+
+recent_messages = RecentMessages()
@@ -0,0 +1,212 @@
+"""ETags and conditional GETs for channel and user resources, and compression.
+
+The frontend polls the channel list, channels, channel members and the
+user list, which rarely change. Each of those resources has a version in
+``resource_versions``, changed by the handlers that modify it (creating a
+channel, joining one, registering) and shared with other workers over the
+pub/sub bus (see ``ChannelConnectionManager.publish_version``). Responses
+carry the version as a strong ETag; a request whose ``If-None-Match``
+names the current version is answered 304 before any query runs.
+
+A worker starts with a random version for every resource, so the first
+poll after a restart, or on another worker, is a full response.
+
+New messages change a channel's activity stats (``channel:<id>``) and the
+channel list (``channels``) far more often than anything else. Those
+changes go through ``touch``, which bumps a key at most once per
+``HTTP_CACHE_ACTIVITY_INTERVAL_S`` and folds the rest of the interval into
+one bump at its end: a busy channel costs one version (and one bus
+message) per interval, and other channels' ETags are not affected.
+
+``CompressionMiddleware`` gzips (or, with the ``brotli`` package, Brotli
+compresses) JSON and text responses of at least ``HTTP_COMPRESS_MIN_BYTES``
+when the client accepts it. Compressed responses get their own ETag
+(``"<version>-gzip"``), which conditional requests still match.
+"""
+
+import asyncio
+import gzip
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Smallest response body compressed (0 disables compression).
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+HTTP_COMPRESS_LEVEL = int(os.getenv("HTTP_COMPRESS_LEVEL", "6"))
+# Longest a conditional GET may see activity stats unchanged after a message.
+HTTP_CACHE_ACTIVITY_INTERVAL_S = float(os.getenv("HTTP_CACHE_ACTIVITY_INTERVAL_S", "2"))
+
+_COMPRESSIBLE = (b"application/json", b"text/")
+_ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+class ResourceVersions:
+    """Current version of each cacheable resource (``"channels"``, ``"channel:<id>"``,
+    ``"members:<id>"``, ...)."""
+
+    def __init__(self):
+        self.boot = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, str] = {}
+        self._bumps = 0
+        self._bumped_at: Dict[str, float] = {}
+        # Keys with a bump due at the end of their interval, and when.
+        self._deferred: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Set by the connection manager to tell other workers about a bump.
+        self.publish: Optional[Callable[[str, str], Awaitable[None]]] = None
+
+    def etag(self, key: str) -> str:
+        return f'"{self._versions.get(key, self.boot)}"'
+
+    async def bump(self, key: str) -> None:
+        """Give ``key`` a new version, here and on other workers."""
+        self._bumps += 1
+        version = f"{self.boot}.{self._bumps}"
+        self._versions[key] = version
+        self._bumped_at[key] = time.monotonic()
+        if self.publish is not None:
+            await self.publish(key, version)
+
+    async def touch(self, *keys: str) -> None:
+        """Bump ``keys`` for a frequent change, at most once per
+        ``HTTP_CACHE_ACTIVITY_INTERVAL_S`` each."""
+        now = time.monotonic()
+        for key in keys:
+            if self._deferred.get(key, now) > now:
+                continue  # already due at the end of the interval
+            wait = self._bumped_at.get(key, float("-inf")) + HTTP_CACHE_ACTIVITY_INTERVAL_S - now
+            if wait <= 0:
+                await self.bump(key)
+            else:
+                self._deferred[key] = now + wait
+                asyncio.get_running_loop().call_later(wait, self._bump_deferred, key)
+
+    def _bump_deferred(self, key: str) -> None:
+        self._deferred.pop(key, None)
+        task = asyncio.ensure_future(self.bump(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def apply(self, key: str, version: str) -> None:
+        """Adopt a version published by another worker."""
+        self._versions[key] = version
+
+
+resource_versions = ResourceVersions()
+
+
+def _match(header: str, etag: str) -> Optional[str]:
+    """The ``If-None-Match`` entry naming ``etag`` (weak comparison, as RFC 9110 asks), if any."""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        tag = candidate[2:] if candidate.startswith("W/") else candidate
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tag = tag[:-len(suffix) - 1] + '"'
+        if tag == etag:
+            return candidate
+    return None
+
+
+def check(request: Request, response: Response, key: str) -> Optional[Response]:
+    """Tag ``response`` with ``key``'s ETag; a 304 if the client already has that version.
+
+    Call before any query, so the version is never newer than the data.
+    """
+    etag = resource_versions.etag(key)
+    header = request.headers.get("if-none-match")
+    held = _match(header, etag) if header else None
+    if held is not None:
+        # The client's copy (possibly a compressed one) is current.
+        return Response(status_code=304, headers={"ETag": held, "Cache-Control": "no-cache"})
+    response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def tag(result, response: Response):
+    """Copy the ETag set by ``check`` onto ``result`` when the handler returns a Response."""
+    if isinstance(result, Response):
+        result.headers["ETag"] = response.headers["ETag"]
+        result.headers["Cache-Control"] = response.headers["Cache-Control"]
+    return result
+
+
+def _accepted(headers: list) -> Optional[str]:
+    for name, value in headers:
+        if name == b"accept-encoding":
+            tokens = {part.split(b";")[0].strip() for part in value.lower().split(b",")}
+            if brotli is not None and b"br" in tokens:
+                return "br"
+            if b"gzip" in tokens:
+                return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Compress complete JSON/text response bodies the client accepts (pure ASGI)."""
+
+    def __init__(self, app, minimum_size: int = HTTP_COMPRESS_MIN_BYTES, level: int = HTTP_COMPRESS_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.minimum_size:
+            return await self.app(scope, receive, send)
+        encoding = _accepted(scope["headers"])
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            pending, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body") or not self._compressible(pending, body):
+                await send(pending)
+                return await send(message)
+            if encoding == "br":
+                body = brotli.compress(body, quality=min(self.level, 11))
+            else:
+                body = gzip.compress(body, compresslevel=self.level, mtime=0)
+            headers, vary = [], b"Accept-Encoding"
+            for k, v in pending["headers"]:
+                if k == b"etag" and v.endswith(b'"'):
+                    headers.append((b"etag", v[:-1] + f"-{encoding}".encode() + b'"'))
+                elif k == b"vary":
+                    vary = v + b", " + vary
+                elif k != b"content-length":
+                    headers.append((k, v))
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode()),
+                        (b"vary", vary)]
+            await send({**pending, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, start: dict, body: bytes) -> bool:
+        if start["status"] != 200 or len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for k, v in start["headers"]:
+            if k == b"content-encoding":
+                return False
+            if k == b"content-type":
+                content_type = v
+        return content_type.startswith(_COMPRESSIBLE)
@@ -0,0 +1,159 @@
+"""Logging setup: records are queued on the event loop and written by a thread.
+
+``configure_logging`` (called by ``main.py``, and by the app's lifespan
+when it was started some other way) installs one ``QueueHandler`` on the
+root logger. Log calls only build a record and put it on an
+in-process queue; a ``QueueListener`` thread formats and writes it, so
+stderr never blocks the event loop. Call sites use lazy %-style arguments
+(``logger.info("... %s", value)``), which the listener formats, and must
+pass values that are not mutated afterwards (strings, numbers, ids).
+
+``LOG_FORMAT`` is ``json`` (one object per line: ``ts``, ``level``,
+``logger``, ``msg``, ``exc`` and any ``extra`` fields) or ``text``.
+
+High-volume events carry ``extra={"event": name}``; ``LOG_SAMPLE_RATES``
+(``name=rate,...``, empty by default) keeps only that fraction of them,
+counting rather than drawing at random, and the kept records say how many
+they stand for (``sampled``). A rate of 0 drops the event.
+
+``uvicorn`` (including its access log) logs through the same queue when
+started by ``main.py``; ``logging_config()`` is the dict it is given, so
+reloader subprocesses get the same setup.
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, UTC
+from typing import Dict, Optional, TextIO
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else came from ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "color_message",  # the last one is uvicorn's
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """``"a=0.1,b=0"`` -> ``{"a": 0.1, "b": 0.0}``."""
+    rates = {}
+    for item in spec.split(","):
+        if item.strip():
+            event, _, rate = item.partition("=")
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Keep one in ``round(1 / rate)`` records of each sampled ``event``."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.every = {event: round(1 / rate) if rate > 0 else 0 for event, rate in rates.items()}
+        self.seen: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        every = self.every.get(event) if event is not None else None
+        if every is None or every == 1:
+            return True
+        if every == 0:
+            return False
+        seen = self.seen.get(event, 0)
+        self.seen[event] = seen + 1
+        if seen % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are; the listener thread does all formatting."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def queue_handler(fmt: str = LOG_FORMAT, sample_rates: str = LOG_SAMPLE_RATES,
+                  stream: Optional[TextIO] = None) -> logging.Handler:
+    """A handler that queues records for a writer thread (replacing any previous one)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    handler = _DeferredQueueHandler(records)
+    handler.addFilter(SampleFilter(parse_sample_rates(sample_rates)))
+    return handler
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def logging_config(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> dict:
+    """``logging.config.dictConfig`` settings routing every logger through the queue."""
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {
+            "queue": {"()": "backend.logging_config.queue_handler", "fmt": fmt},
+        },
+        "root": {"level": level.upper(), "handlers": ["queue"]},
+        "loggers": {
+            name: {"handlers": [], "propagate": True}
+            for name in ("uvicorn", "uvicorn.error", "uvicorn.access")
+        },
+    }
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    logging.config.dictConfig(logging_config(level, fmt))
+
+
+def ensure_logging() -> None:
+    """``configure_logging`` unless this process already did (e.g. through ``main.py``)."""
+    if _listener is None:
+        configure_logging()
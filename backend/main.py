@@ -11,6 +11,8 @@ import uvicorn
 # the script directly from the backend folder or from the repo root.
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from backend.logging_config import LOG_FORMAT, LOG_LEVEL, configure_logging, logging_config  # noqa: E402
+
 
 def _parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Run ChatWebApp backend (APIs + WebSocket)")
@@ -22,7 +24,8 @@ def _parse_args() -> argparse.Namespace:
         default=os.getenv("RELOAD", "true").lower() in ("1", "true", "yes"),
         help="Enable code reload (development).",
     )
-    p.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"), help="uvicorn log level")
+    p.add_argument("--log-level", default=LOG_LEVEL, help="Log level")
+    p.add_argument("--log-format", default=LOG_FORMAT, choices=("json", "text"), help="Log line format")
     return p.parse_args()
 
 
@@ -41,12 +44,18 @@ def _run():
 
     _ensure_windows_event_loop_policy()
 
+    # All logging (the app's and uvicorn's) goes through one queue and a
+    # writer thread; Uvicorn applies this config in reloader workers too.
+    configure_logging(args.log_level, args.log_format)
+    options = dict(host=args.host, port=args.port, reload=args.reload, log_level=args.log_level,
+                   log_config=logging_config(args.log_level, args.log_format))
+
     # When reload is enabled, pass the import string so Uvicorn can reload.
     if args.reload:
-        uvicorn.run("backend.app:app", host=args.host, port=args.port, reload=args.reload, log_level=args.log_level)
+        uvicorn.run("backend.app:app", **options)
     else:
         from backend.app import app
-        uvicorn.run(app, host=args.host, port=args.port, reload=args.reload, log_level=args.log_level)
+        uvicorn.run(app, **options)
 
 
 if __name__ == "__main__":
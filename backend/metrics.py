@@ -0,0 +1,270 @@
+"""Prometheus metrics, served as text by ``GET /metrics``.
+
+Metrics are plain objects updated in place on the event loop: a counter
+is one number and a histogram a preallocated list of bucket counts plus a
+sum, so recording a sample takes no lock and stores nothing per sample.
+Gauges are callbacks read at scrape time and cost nothing in between.
+
+Recorded here:
+
+- ``http_request_duration_seconds{method,route}``, and the number and
+  total time of SQL statements per request, by ``MetricsMiddleware``
+- ``sql_query_duration_seconds`` for every statement (request, background
+  writer or job), via ``instrument_engine``
+- WebSocket gauges and fan-out histograms, registered by ``api/v1/ws.py``
+
+``route`` is the path template (``/api/v1/messages/{channel_id}``), so
+label sets stay bounded. Set ``METRICS_ENABLED=false`` to drop the
+middleware, the SQL hooks and the endpoint.
+"""
+
+import bisect
+import contextvars
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000, 10000)
+
+_perf_counter = time.perf_counter
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last: above the highest bound
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    kind = ""
+    _value_type: Callable
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._default = None if self.labelnames else self._new_value()
+
+    def _new_value(self):
+        return self._value_type()
+
+    def labels(self, *values: str):
+        """The series for these label values (created on first use; cache it on hot paths)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._new_value()
+        return child
+
+    def _series(self):
+        if self._default is not None:
+            yield (), self._default
+        yield from self._children.items()
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _value_type = _CounterValue
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.value += amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v.value)}"
+                for labels, v in self._series()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_value(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, v in self._series():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), v.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {_format_value(v.sum)}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read from ``fn`` when scraped."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float]):
+        self.fn = fn
+        self.name, self.documentation, self.labelnames = name, documentation, ()
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.fn())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add ``metric``; one registered under the same name is replaced."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name: str, documentation: str, fn: Callable[[], float]) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, fn))
+
+
+# HTTP requests and SQL
+
+request_duration = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+request_queries = histogram(
+    "http_request_sql_queries", "SQL statements run per HTTP request", ("method", "route"), COUNT_BUCKETS)
+request_query_time = histogram(
+    "http_request_sql_seconds", "Time spent in SQL per HTTP request", ("method", "route"))
+query_duration = histogram("sql_query_duration_seconds", "SQL statement execution time")
+
+# [statements, seconds] for the request being handled, if any.
+_request_sql: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_sql", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = _perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = _perf_counter() - context._metrics_start
+    query_duration._default.observe(elapsed)
+    sql = _request_sql.get()
+    if sql is not None:
+        sql[0] += 1
+        sql[1] += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement run through ``engine`` (sync or async)."""
+    from sqlalchemy import event
+
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "after_cursor_execute", _after_execute):
+        event.listen(target, "before_cursor_execute", _before_execute)
+        event.listen(target, "after_cursor_execute", _after_execute)
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled ``scope``, e.g. ``/api/v1/users/{user_id}``."""
+    # FastAPI keeps included routers nested: scope["route"] carries the path
+    # relative to its router, the effective route context the full one.
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests and their SQL by route template."""
+
+    def __init__(self, app):
+        self.app = app
+        # method -> route path -> (duration, queries, query time) series
+        self._series: Dict[str, Dict[str, tuple]] = {}
+
+    def _route_series(self, method: str, route: str) -> tuple:
+        by_route = self._series.setdefault(method, {})
+        series = by_route.get(route)
+        if series is None:
+            series = by_route[route] = (
+                request_duration.labels(method, route),
+                request_queries.labels(method, route),
+                request_query_time.labels(method, route),
+            )
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        start = _perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = _perf_counter() - start
+            _request_sql.reset(token)
+            duration, queries, query_time = self._route_series(scope["method"], route_template(scope))
+            duration.observe(elapsed)
+            queries.observe(sql[0])
+            query_time.observe(sql[1])
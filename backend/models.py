@@ -1,6 +1,6 @@
 from datetime import datetime, UTC
 from sqlalchemy import (
-    Column, String, DateTime, Enum, ForeignKey, Table
+    Column, String, DateTime, Enum, ForeignKey, Table, Index, Integer
 )
 from sqlalchemy.orm import relationship, declarative_base
 import uuid
@@ -30,6 +30,15 @@ class Channel(Base):
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), unique=True, index=True)
     name = Column(String(100), unique=True, nullable=False, index=True)
+    # Messages ever sent to the channel; also the ``seq`` of the newest one.
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Days messages stay in the messages table before archive.py moves them
+    # to segment files (None: MESSAGE_RETENTION_DAYS, 0: never).
+    retention_days = Column(Integer, nullable=True)
+    # Activity stats, kept in the transactions that add members and messages
+    # (rebuild with rebuild_channel_stats.py).
+    member_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_message_at = Column(DateTime, nullable=True, index=True)
 
     created_at = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
@@ -44,6 +53,10 @@ class ChannelMember(Base):
     user_id = Column(String(36), ForeignKey("users.id"), primary_key=True)
     channel_id = Column(String(36), ForeignKey("channels.id"), primary_key=True)
     joined_at = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
+    # Read cursor: unread = channel.message_count - last_read_seq.
+    last_read_message_id = Column(String(36), nullable=True)
+    last_read_at = Column(DateTime, nullable=True)
+    last_read_seq = Column(Integer, default=0, server_default="0", nullable=False)
 
     user = relationship("User", back_populates="channel_members")
     channel = relationship("Channel", back_populates="members")
@@ -53,13 +66,43 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
-    channel_id = Column(String(36), ForeignKey("channels.id"), nullable=False, index=True)
+    channel_id = Column(String(36), ForeignKey("channels.id"), nullable=False)
     sender_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
     content = Column(String, nullable=False)
     status = Column(String(20), default=MessageStatus.SENT.value, nullable=False)
+    # Position in the channel (1, 2, ...), assigned when inserted.
+    seq = Column(Integer, nullable=True)
 
     created_at = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
 
     channel = relationship("Channel", back_populates="messages")
     sender = relationship("User", back_populates="messages")
+
+    # Keyset index for channel history: serves `channel_id = ?` lookups and
+    # `(created_at, id)` range scans in either direction without sorting.
+    __table_args__ = (
+        Index("ix_messages_channel_created_id", "channel_id", "created_at", "id"),
+    )
+
+
+class MessageSegment(Base):
+    """An archived segment file of a channel's messages (see archive.py)."""
+    __tablename__ = "message_segments"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    channel_id = Column(String(36), ForeignKey("channels.id"), nullable=False)
+    # Relative to ARCHIVE_DIR.
+    path = Column(String, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    # Key range, (created_at, id), of the messages in the file.
+    first_created_at = Column(DateTime, nullable=False)
+    first_id = Column(String(36), nullable=False)
+    last_created_at = Column(DateTime, nullable=False)
+    last_id = Column(String(36), nullable=False)
+
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_segments_channel_last", "channel_id", "last_created_at"),
+    )
@@ -0,0 +1,205 @@
+"""Write-behind persistence pipeline for chat messages.
+
+Messages from every connection are queued on one process-wide
+:class:`MessageWriter`, which bulk-inserts them in a single transaction per
+flush window. A window closes when ``MESSAGE_BATCH_SIZE`` messages are queued
+or ``MESSAGE_FLUSH_INTERVAL_MS`` has passed since the first one arrived. New
+messages keep accumulating while a flush is in flight, so commits (and fsyncs)
+are shared by every sender instead of paid per message. With the default
+interval of 0 the writer flushes as soon as it is free, which batches under
+load without delaying a lone sender.
+
+Ids and timestamps are assigned here, before the INSERT, so a message can be
+broadcast without reading it back from the database.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+
+from .database import AsyncWriteSessionLocal
+from .enums import DurabilityMode, MessageStatus
+from .http_cache import resource_versions
+from .models import Channel, Message
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "500"))
+MESSAGE_FLUSH_INTERVAL_MS = float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "0"))
+MESSAGE_DURABILITY = DurabilityMode(os.getenv("MESSAGE_DURABILITY", DurabilityMode.AFTER_COMMIT.value))
+
+_last_created_at = datetime.min.replace(tzinfo=UTC)
+
+
+def _next_created_at() -> datetime:
+    """Return a strictly increasing UTC timestamp for this process.
+
+    History is ordered by ``(created_at, id)``; keeping timestamps unique means
+    messages sent in the same microsecond still read back in send order.
+    """
+    global _last_created_at
+    now = datetime.now(UTC)
+    if now <= _last_created_at:
+        now = _last_created_at + timedelta(microseconds=1)
+    _last_created_at = now
+    return now
+
+
+def new_message_row(channel_id: str, sender_id: str, content: str) -> dict:
+    """Build a fully populated ``messages`` row, ready to insert and broadcast."""
+    created_at = _next_created_at()
+    return {
+        "id": str(uuid.uuid4()),
+        "channel_id": channel_id,
+        "sender_id": sender_id,
+        "content": content,
+        "status": MessageStatus.SENT.value,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+async def insert_messages(db, rows: List[dict]) -> None:
+    """INSERT ``rows``, numbering each within its channel (``seq``).
+
+    Each channel's ``message_count`` and ``last_message_at`` are updated in
+    the same transaction, and the new count tells which numbers the rows
+    get; unread counts are computed from these counters (see
+    read_cursors.py).
+    """
+    by_channel: Dict[str, List[dict]] = {}
+    for row in rows:
+        by_channel.setdefault(row["channel_id"], []).append(row)
+    for channel_id, channel_rows in by_channel.items():
+        last = await db.scalar(
+            update(Channel)
+            .where(Channel.id == channel_id)
+            # Keep updated_at: new messages are activity, not a change to the channel.
+            .values(message_count=Channel.message_count + len(channel_rows),
+                    last_message_at=max(row["created_at"] for row in channel_rows),
+                    updated_at=Channel.updated_at)
+            .returning(Channel.message_count)
+        )
+        first = None if last is None else last - len(channel_rows) + 1
+        for i, row in enumerate(channel_rows):
+            row["seq"] = None if first is None else first + i
+    await db.execute(insert(Message), rows)
+
+
+class MessageWriter:
+    """Group-commit queue that persists messages in batches.
+
+    ``submit`` is cheap in ``write_behind`` mode (append and return) and in
+    ``after_commit`` mode resolves once the batch holding the row committed.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = MESSAGE_BATCH_SIZE,
+        flush_interval_ms: float = MESSAGE_FLUSH_INTERVAL_MS,
+        durability: DurabilityMode = MESSAGE_DURABILITY,
+        session_factory=AsyncWriteSessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.durability = DurabilityMode(durability)
+        self._session_factory = session_factory
+        self._pending: List[Tuple[dict, Optional[asyncio.Future]]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._closing = False
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        # First use, or the previous loop went away (e.g. test clients).
+        self._loop = loop
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._closing = False
+        if self._pending:
+            self._has_items.set()
+        self._task = loop.create_task(self._run(), name="message-writer")
+
+    async def submit(self, row: dict) -> dict:
+        """Queue ``row`` for insertion; wait for its commit in ``after_commit`` mode."""
+        if self._closing:
+            raise RuntimeError("MessageWriter is shut down")
+        self._ensure_started()
+        future = None
+        if self.durability is DurabilityMode.AFTER_COMMIT:
+            future = self._loop.create_future()
+        self._pending.append((row, future))
+        self._has_items.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        if future is not None:
+            await future
+        return row
+
+    async def close(self) -> None:
+        """Flush everything still queued and stop the background task."""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        self._has_items.set()
+        self._batch_full.set()
+        await self._task
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+            if self.flush_interval <= 0:
+                # Let senders that are ready in this loop tick join the batch.
+                await asyncio.sleep(0)
+            elif len(self._pending) < self.batch_size and not self._closing:
+                self._batch_full.clear()
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, Optional[asyncio.Future]]]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            async with self._session_factory() as db:
+                await insert_messages(db, rows)
+                await db.commit()
+        except Exception as e:
+            logger.exception("Failed to persist batch of %s messages: %s", len(rows), e)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        self.flushes += 1
+        self.rows_written += len(rows)
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+        # Activity stats changed. The rows are committed either way, so a
+        # failure here must not reach the writers.
+        try:
+            await resource_versions.touch("channels", *{f"channel:{row['channel_id']}" for row in rows})
+        except Exception as e:
+            logger.exception("Failed to bump versions after %s messages: %s", len(rows), e)
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,112 @@
+"""Coalesced channel presence: batched, versioned deltas instead of full lists.
+
+The connection registry reports every time a user comes online in, or drops
+off, a channel. Changes are collected per channel for ``PRESENCE_WINDOW_MS``
+and then sent to the channel's local sockets as one compact delta, so a
+reconnect storm costs one small frame per window instead of a full member
+list per connect. A user who leaves and comes back within a window produces
+nothing at all.
+
+Frames sent to clients (all carry ``channel_id``):
+
+- ``{"type": "presence", "version": v, "added": [...], "removed": [...]}``
+- ``{"type": "presence_snapshot", "version": v, "online_users": [...]}``,
+  sent to a socket when it joins and whenever it sends
+  ``{"type": "presence_sync"}``. Clients ask for one when a delta's version
+  is not their version + 1.
+
+Versions count per channel and per worker; a client that reconnects to
+another worker sees a gap and resyncs.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from .api.v1.ws import ChannelConnectionManager
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_WINDOW_MS = float(os.getenv("PRESENCE_WINDOW_MS", "100"))
+
+
+class PresenceService:
+    """Batch presence changes per channel and publish them as deltas."""
+
+    def __init__(self, manager: "ChannelConnectionManager", window_ms: float = PRESENCE_WINDOW_MS):
+        self.manager = manager
+        self.window = window_ms / 1000
+        # channel_id -> last published version
+        self.versions: Dict[str, int] = {}
+        # channel_id -> {user_id: online as of the last published version},
+        # only for users whose state has flipped since then
+        self.pending: Dict[str, Dict[str, bool]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def changed(self, channel_id: str, user_id: str, online: bool) -> None:
+        """Registry callback: ``user_id`` went online/offline in a channel."""
+        pending = self.pending.setdefault(channel_id, {})
+        if user_id in pending:
+            # Back to the published state: nothing to report.
+            del pending[user_id]
+        else:
+            pending[user_id] = not online
+        if self._timer is None:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop (e.g. scripted use); flush() must be called directly
+        if self.window > 0:
+            self._timer = loop.call_later(self.window, self.flush)
+        else:
+            self._timer = loop.call_soon(self.flush)
+
+    def flush(self) -> None:
+        """Send one delta per channel with changes since the last window."""
+        self._timer = None
+        pending, self.pending = self.pending, {}
+        for channel_id, changes in pending.items():
+            if not changes or channel_id not in self.manager.registry.channels:
+                continue
+            added = [user_id for user_id, was_online in changes.items() if not was_online]
+            removed = [user_id for user_id, was_online in changes.items() if was_online]
+            version = self.versions.get(channel_id, 0) + 1
+            self.versions[channel_id] = version
+            self.manager._deliver_local(channel_id, json.dumps({
+                "type": "presence",
+                "channel_id": channel_id,
+                "version": version,
+                "added": added,
+                "removed": removed,
+            }))
+
+    def snapshot(self, channel_id: str) -> dict:
+        """Full online list as of the last published version."""
+        online = set(self.manager.registry.online_users(channel_id))
+        for user_id, was_online in self.pending.get(channel_id, {}).items():
+            if was_online:
+                online.add(user_id)
+            else:
+                online.discard(user_id)
+        return {
+            "type": "presence_snapshot",
+            "channel_id": channel_id,
+            "version": self.versions.get(channel_id, 0),
+            "online_users": list(online),
+        }
+
+    def forget(self, channel_id: str) -> None:
+        """Drop state for a channel this worker no longer has sockets in."""
+        self.versions.pop(channel_id, None)
+        self.pending.pop(channel_id, None)
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,248 @@
+"""Cross-process publish/subscribe bus for channel events.
+
+``ChannelConnectionManager`` publishes every channel event here and delivers
+what it receives to its local sockets, so workers (or hosts) sharing a bus
+see each other's messages and presence. Backends:
+
+- ``memory://`` (default): in-process only, for single-worker deployments.
+- ``redis://host:port`` or ``unix:///path/to.sock``: speaks the Redis
+  protocol (PUBLISH/SUBSCRIBE), so it works against a real Redis server or
+  the stand-in hub in ``backend/pubsub_hub.py``.
+
+Select one with the ``PUBSUB_URL`` environment variable.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")
+
+# handler(topic, payload) is awaited for every message on a subscribed topic.
+Handler = Callable[[str, str], Awaitable[None]]
+
+
+class Broker:
+    """Publish/subscribe interface used by the connection manager."""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self.topics: Set[str] = set()
+
+    def set_handler(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def publish(self, topic: str, payload: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, topic: str) -> None:
+        raise NotImplementedError
+
+    async def unsubscribe(self, topic: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        self.topics.clear()
+
+
+class InMemoryBroker(Broker):
+    """Process-local broker: publishing hands the payload straight back."""
+
+    async def publish(self, topic: str, payload: str) -> None:
+        if topic in self.topics and self._handler is not None:
+            await self._handler(topic, payload)
+
+    async def subscribe(self, topic: str) -> None:
+        self.topics.add(topic)
+
+    async def unsubscribe(self, topic: str) -> None:
+        self.topics.discard(topic)
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+def _encode_command(*args: str) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by pub/sub server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        size = int(rest)
+        if size < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(size)]
+    raise RespError(f"Unexpected reply: {line!r}")
+
+
+class RedisBroker(Broker):
+    """Broker speaking the Redis pub/sub protocol over TCP or a Unix socket.
+
+    Uses two connections, as Redis requires: one in subscriber mode with a
+    reader task dispatching deliveries, and one for pipelined PUBLISH
+    commands. The subscriber reconnects and resubscribes on failure.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 0.5):
+        super().__init__()
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self._pub: Optional[tuple] = None
+        self._pub_waiters: Deque[asyncio.Future] = deque()
+        self._pub_reader_task: Optional[asyncio.Task] = None
+        self._pub_lock = asyncio.Lock()
+        self._sub: Optional[tuple] = None
+        self._sub_task: Optional[asyncio.Task] = None
+        self._sub_ready: Optional[asyncio.Event] = None
+        self._sub_confirmations: Dict[str, asyncio.Future] = {}
+        self._closed = False
+
+    async def _open(self) -> tuple:
+        parsed = urlparse(self.url)
+        if parsed.scheme == "unix":
+            return await asyncio.open_unix_connection(parsed.path)
+        reader, writer = await asyncio.open_connection(parsed.hostname or "127.0.0.1", parsed.port or 6379)
+        db = (parsed.path or "/").lstrip("/")
+        if parsed.password:
+            writer.write(_encode_command("AUTH", parsed.password))
+            await _read_reply(reader)
+        if db and db != "0":
+            writer.write(_encode_command("SELECT", db))
+            await _read_reply(reader)
+        return reader, writer
+
+    # -- publishing -------------------------------------------------------
+
+    async def _publisher(self) -> tuple:
+        if self._pub is None:
+            async with self._pub_lock:
+                if self._pub is None:
+                    self._pub = await self._open()
+                    self._pub_reader_task = asyncio.create_task(self._read_publish_replies(self._pub[0]))
+        return self._pub
+
+    async def _read_publish_replies(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                reply = await _read_reply(reader)
+                waiter = self._pub_waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(reply)
+        except Exception as e:
+            self._pub = None
+            while self._pub_waiters:
+                waiter = self._pub_waiters.popleft()
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError(f"Publish connection lost: {e}"))
+
+    async def publish(self, topic: str, payload: str) -> None:
+        _, writer = await self._publisher()
+        waiter = asyncio.get_running_loop().create_future()
+        self._pub_waiters.append(waiter)
+        writer.write(_encode_command("PUBLISH", topic, payload))
+        await waiter
+
+    # -- subscribing ------------------------------------------------------
+
+    async def _ensure_subscriber(self) -> None:
+        if self._sub_task is None or self._sub_task.done():
+            self._sub_ready = asyncio.Event()
+            self._sub_task = asyncio.create_task(self._subscriber_loop())
+        await self._sub_ready.wait()
+
+    async def _subscriber_loop(self) -> None:
+        while not self._closed:
+            try:
+                self._sub = await self._open()
+                reader, writer = self._sub
+                if self.topics:
+                    writer.write(_encode_command("SUBSCRIBE", *sorted(self.topics)))
+                self._sub_ready.set()
+                while True:
+                    reply = await _read_reply(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    if reply[0] == "message" and self._handler:
+                        try:
+                            await self._handler(reply[1], reply[2])
+                        except Exception as e:
+                            logger.exception("Pub/sub handler failed for %s: %s", reply[1], e)
+                    elif reply[0] == "subscribe":
+                        confirmation = self._sub_confirmations.pop(reply[1], None)
+                        if confirmation is not None and not confirmation.done():
+                            confirmation.set_result(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._closed:
+                    return
+                logger.warning("Pub/sub subscriber connection lost (%s); reconnecting", e)
+                self._sub = None
+                self._sub_ready.clear()
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def subscribe(self, topic: str) -> None:
+        if topic in self.topics:
+            return
+        self.topics.add(topic)
+        await self._ensure_subscriber()
+        # Wait for the server to confirm, so nothing published after this
+        # returns can be missed.
+        confirmation = asyncio.get_running_loop().create_future()
+        self._sub_confirmations[topic] = confirmation
+        self._sub[1].write(_encode_command("SUBSCRIBE", topic))
+        await confirmation
+
+    async def unsubscribe(self, topic: str) -> None:
+        if topic not in self.topics:
+            return
+        self.topics.discard(topic)
+        if self._sub is not None:
+            self._sub[1].write(_encode_command("UNSUBSCRIBE", topic))
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in (self._sub_task, self._pub_reader_task):
+            if task is not None:
+                task.cancel()
+        for conn in (self._sub, self._pub):
+            if conn is not None:
+                conn[1].close()
+        self._sub = self._pub = None
+        await super().close()
+
+
+def broker_from_url(url: str = PUBSUB_URL) -> Broker:
+    """Build the broker configured by ``url`` (see module docstring)."""
+    scheme = urlparse(url).scheme
+    if scheme in ("", "memory"):
+        return InMemoryBroker()
+    if scheme in ("redis", "unix"):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported PUBSUB_URL scheme: {scheme!r}")
@@ -0,0 +1,140 @@
+"""Minimal Redis-protocol pub/sub hub for local multi-worker setups and tests.
+
+Implements just enough of RESP for ``RedisBroker``: SUBSCRIBE, UNSUBSCRIBE,
+PUBLISH and PING. Run it next to several uvicorn workers sharing
+``PUBSUB_URL`` when a real Redis server is not available::
+
+    python backend/pubsub_hub.py --unix /tmp/chatwebapp-pubsub.sock
+    PUBSUB_URL=unix:///tmp/chatwebapp-pubsub.sock python backend/main.py --port 8001
+
+It keeps no state beyond live subscriptions and is not meant for production.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger("backend.pubsub_hub")
+
+
+def _bulk(value: str) -> bytes:
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def _array(*items: bytes) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[list]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.decode().split()  # inline command, e.g. from telnet
+    args = []
+    for _ in range(int(line[1:-2])):
+        size = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(size + 2))[:-2].decode())
+    return args
+
+
+class PubSubHub:
+    """In-memory topic -> subscribers fan-out over the Redis protocol."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, unix_path: Optional[str] = None) -> str:
+        """Start serving and return the ``PUBSUB_URL`` clients should use."""
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.server = await asyncio.start_unix_server(self._handle, path=unix_path)
+            return f"unix://{unix_path}"
+        self.server = await asyncio.start_server(self._handle, host, port)
+        bound_port = self.server.sockets[0].getsockname()[1]
+        return f"redis://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for writers in self.subscribers.values():
+                for writer in writers:
+                    writer.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        topics: Set[str] = set()
+        try:
+            while True:
+                command = await _read_command(reader)
+                if command is None:
+                    break
+                name, args = command[0].upper(), command[1:]
+                if name == "PUBLISH":
+                    topic, payload = args
+                    writers = self.subscribers.get(topic, ())
+                    frame = _array(_bulk("message"), _bulk(topic), _bulk(payload))
+                    for sub in writers:
+                        sub.write(frame)
+                    writer.write(b":%d\r\n" % len(writers))
+                elif name == "SUBSCRIBE":
+                    for topic in args:
+                        topics.add(topic)
+                        self.subscribers.setdefault(topic, set()).add(writer)
+                        writer.write(_array(_bulk("subscribe"), _bulk(topic), b":%d\r\n" % len(topics)))
+                elif name == "UNSUBSCRIBE":
+                    for topic in args or list(topics):
+                        topics.discard(topic)
+                        self._drop(topic, writer)
+                        writer.write(_array(_bulk("unsubscribe"), _bulk(topic), b":%d\r\n" % len(topics)))
+                elif name == "PING":
+                    writer.write(b"+PONG\r\n")
+                elif name in ("AUTH", "SELECT"):
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % name.encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for topic in topics:
+                self._drop(topic, writer)
+            writer.close()
+
+    def _drop(self, topic: str, writer: asyncio.StreamWriter) -> None:
+        writers = self.subscribers.get(topic)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[topic]
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    hub = PubSubHub()
+    url = await hub.start(args.host, args.port, args.unix)
+    logger.info("Pub/sub hub listening on %s", url)
+    await hub.server.serve_forever()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Local Redis-protocol pub/sub hub")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=6379)
+    p.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Per-request SQL statement log: slow requests and likely N+1 patterns.
+
+With ``QUERY_LOG_ENABLED=true`` every statement run while handling an HTTP
+request, a WebSocket connect or a ``subscribe`` frame (the other frames
+query nothing in their own task) is recorded, grouped by its normalized text
+(whitespace collapsed, parameter lists folded, so ``IN (?, ?, ?)`` and
+``IN (?, ?)`` group together). When the request finishes, it is logged as
+a warning if it ran more than ``QUERY_LOG_MAX_QUERIES`` statements, spent
+more than ``QUERY_LOG_MAX_DB_MS`` in the database, or ran one statement
+``QUERY_LOG_REPEAT_THRESHOLD`` times or more (usually a query in a loop).
+
+Tests can put a query budget on a block regardless of that setting::
+
+    with assert_max_queries(3):
+        client.post("/api/v1/channels/", ...)
+
+Statements run by background tasks (e.g. the group-commit writer) are
+attributed to no request; a capture counts every statement on the engines.
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "false").lower() in ("1", "true", "yes")
+QUERY_LOG_MAX_QUERIES = int(os.getenv("QUERY_LOG_MAX_QUERIES", "20"))
+QUERY_LOG_MAX_DB_MS = float(os.getenv("QUERY_LOG_MAX_DB_MS", "100"))
+QUERY_LOG_REPEAT_THRESHOLD = int(os.getenv("QUERY_LOG_REPEAT_THRESHOLD", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+_NUMBERED_PARAM = re.compile(r"\$\d+|%\(\w+\)s")
+_PARAM_LIST = re.compile(r"\?(?:, \?)+")
+_ROW_LIST = re.compile(r"(\([^()]*\))(?:, \1)+")
+
+
+@lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    """``statement`` with whitespace collapsed and parameter/row lists folded."""
+    text = _WHITESPACE.sub(" ", statement).strip()
+    text = _NUMBERED_PARAM.sub("?", text)
+    text = _PARAM_LIST.sub("?, ...", text)
+    return _ROW_LIST.sub(r"\1, ...", text)
+
+
+class QueryLog:
+    """Statements run during one request, frame or capture."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        # normalized statement -> [executions, seconds]
+        self.statements: Dict[str, list] = {}
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Statements run at least ``threshold`` (default QUERY_LOG_REPEAT_THRESHOLD) times, most frequent first."""
+        threshold = QUERY_LOG_REPEAT_THRESHOLD if threshold is None else threshold
+        found = [(s, e[0]) for s, e in self.statements.items() if e[0] >= threshold]
+        return sorted(found, key=lambda item: -item[1])
+
+    def report(self) -> str:
+        lines = [f"{self.label or 'block'}: {self.count} statements, {self.seconds * 1000:.1f} ms"]
+        for statement, (count, seconds) in sorted(self.statements.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {count:>4}x {seconds * 1000:8.2f} ms  {statement[:200]}")
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+_captures: List[QueryLog] = []
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_log_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current.get()
+    if current is None and not _captures:
+        return
+    elapsed = time.perf_counter() - context._query_log_start
+    statement = normalize(statement)
+    if current is not None:
+        current.add(statement, elapsed)
+    for capture in _captures:
+        capture.add(statement, elapsed)
+
+
+def instrument_engine(engine) -> None:
+    """Record statements run through ``engine`` (sync or async)."""
+    from sqlalchemy import event
+
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "after_cursor_execute", _after_execute):
+        event.listen(target, "before_cursor_execute", _before_execute)
+        event.listen(target, "after_cursor_execute", _after_execute)
+
+
+def check(log: QueryLog) -> bool:
+    """Log ``log`` if it is over budget or repeats a statement; True if it was."""
+    repeated = log.repeated()
+    if log.count <= QUERY_LOG_MAX_QUERIES and log.seconds * 1000 <= QUERY_LOG_MAX_DB_MS and not repeated:
+        return False
+    flags = [f"{count}x {statement[:120]}" for statement, count in repeated]
+    suffix = f" (possible N+1: {'; '.join(flags)})" if flags else ""
+    logger.warning("Query budget exceeded%s\n%s", suffix, log.report())
+    return True
+
+
+@contextmanager
+def record(label: str) -> Iterator[Optional[QueryLog]]:
+    """Record the statements run inside the block (e.g. one WS frame) and check them."""
+    if not QUERY_LOG_ENABLED:
+        yield None
+        return
+    log = QueryLog(label)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+        check(log)
+
+
+class QueryLogMiddleware:
+    """ASGI middleware recording each HTTP request's statements (see ``record``)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = _current.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            log.label = f"{scope['method']} {route_template(scope)}"
+            check(log)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryLog]:
+    """Every statement run on the app's engines during the block, from any task or thread."""
+    from .database import async_engine, async_write_engine, engine
+
+    for e in (engine, async_engine, async_write_engine):
+        instrument_engine(e)
+    log = QueryLog("capture")
+    _captures.append(log)
+    try:
+        yield log
+    finally:
+        _captures.remove(log)
+
+
+@contextmanager
+def assert_max_queries(limit: int, repeats: Optional[int] = None) -> Iterator[QueryLog]:
+    """Fail unless the block runs at most ``limit`` statements, none of them ``repeats`` times or more."""
+    with capture_queries() as log:
+        yield log
+    if log.count > limit:
+        raise AssertionError(f"Expected at most {limit} statements, ran {log.count}\n{log.report()}")
+    if repeats is not None and log.repeated(repeats):
+        raise AssertionError(f"A statement ran {repeats} or more times\n{log.report()}")
@@ -0,0 +1,139 @@
+"""Per-member read cursors, persisted in coalesced batches.
+
+Clients acknowledge the newest message they have seen in a channel with a
+WebSocket ``ack`` frame. Acks only update an in-memory map keyed by
+(user, channel), so a burst of acks for one channel costs a single row
+update. Every ``READ_CURSOR_FLUSH_MS`` the map is written in one
+transaction: one SELECT resolves the acked message ids to their ``seq``,
+then one executemany UPDATE moves each cursor to the newest of them (never
+back). Acks may arrive out of order, so every id acked for a (user,
+channel) since the last flush is kept until its ``seq`` is known.
+
+Unread counts are ``channels.message_count - channel_members.last_read_seq``,
+two maintained counters, so they never need a COUNT(*) over messages.
+``pending`` lets a reader see its own acks before they are flushed.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, UTC
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, bindparam, select, update
+
+from .database import AsyncWriteSessionLocal
+from .models import ChannelMember, Message
+
+logger = logging.getLogger(__name__)
+
+READ_CURSOR_FLUSH_MS = float(os.getenv("READ_CURSOR_FLUSH_MS", "1000"))
+
+_members = ChannelMember.__table__
+_advance = (
+    update(_members)
+    .where(and_(
+        _members.c.user_id == bindparam("b_user_id"),
+        _members.c.channel_id == bindparam("b_channel_id"),
+        _members.c.last_read_seq < bindparam("b_seq"),
+    ))
+    .values(
+        last_read_seq=bindparam("b_seq"),
+        last_read_message_id=bindparam("b_message_id"),
+        last_read_at=bindparam("b_at"),
+    )
+)
+
+
+class ReadCursors:
+    """Coalesces read acks and writes them in periodic batches."""
+
+    def __init__(self, flush_interval_ms: float = READ_CURSOR_FLUSH_MS, session_factory=AsyncWriteSessionLocal):
+        self.flush_interval = flush_interval_ms / 1000
+        self._session_factory = session_factory
+        # (user_id, channel_id) -> {message_id: acked at}
+        self._pending: Dict[Tuple[str, str], Dict[str, datetime]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.acks = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def ack(self, user_id: str, channel_id: str, message_id: str) -> None:
+        """Record that the user has read the channel up to ``message_id``."""
+        self.acks += 1
+        self._pending.setdefault((user_id, channel_id), {})[message_id] = datetime.now(UTC)
+        loop = asyncio.get_running_loop()
+        if self._timer is None or self._loop is not loop:
+            # First ack since the last flush, or the previous loop went away.
+            self._loop = loop
+            self._timer = loop.call_later(self.flush_interval, self._flush_soon)
+
+    def _flush_soon(self) -> None:
+        self._timer = None
+        task = self._loop.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _resolve(db, pending: Dict[Tuple[str, str], Dict[str, datetime]]) -> List[dict]:
+        """UPDATE parameters for the newest message acked per (user, channel).
+
+        Ids that are unknown or belong to another channel are dropped.
+        """
+        found = {
+            row.id: row for row in (await db.execute(
+                select(Message.id, Message.channel_id, Message.seq)
+                .where(Message.id.in_([message_id for acked in pending.values() for message_id in acked]))
+            )).all()
+        }
+        params = []
+        for (user_id, channel_id), acked in pending.items():
+            messages = [found[message_id] for message_id in acked if message_id in found]
+            messages = [m for m in messages if m.channel_id == channel_id and m.seq is not None]
+            if messages:
+                newest = max(messages, key=lambda m: m.seq)
+                params.append({
+                    "b_user_id": user_id, "b_channel_id": channel_id, "b_seq": newest.seq,
+                    "b_message_id": newest.id, "b_at": acked[newest.id],
+                })
+        return params
+
+    async def pending(self, db, user_id: str) -> Dict[str, dict]:
+        """The user's unflushed acks by channel: the newest message's ``seq``,
+        ``last_read_message_id`` and ``last_read_at`` (naive UTC, as stored)."""
+        mine = {key: acked for key, acked in self._pending.items() if key[0] == user_id}
+        if not mine:
+            return {}
+        return {
+            p["b_channel_id"]: {"seq": p["b_seq"], "last_read_message_id": p["b_message_id"],
+                                "last_read_at": p["b_at"].replace(tzinfo=None)}
+            for p in await self._resolve(db, mine)
+        }
+
+    async def flush(self) -> None:
+        """Write every pending ack now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with self._session_factory() as db:
+                params = await self._resolve(db, pending)
+                if params:
+                    await db.execute(_advance, params)
+                    await db.commit()
+        except Exception as e:
+            logger.exception("Failed to persist %s read cursors: %s", len(pending), e)
+            return
+        self.flushes += 1
+        self.rows_written += len(params)
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+read_cursors = ReadCursors()
@@ -0,0 +1,29 @@
+"""Rebuild channel activity stats (member and message counts, last activity).
+
+The stats are maintained as members join and messages are inserted; run
+this after editing ``channel_members`` or ``messages`` by hand, restoring
+a backup, or whenever they look off::
+
+    python backend/rebuild_channel_stats.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    from backend.database import engine, init_db, rebuild_channel_stats
+
+    init_db()
+    count = rebuild_channel_stats(engine)
+    print(f"Rebuilt stats for {count} channels in {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Rebuild the full-text message search index from the messages table.
+
+Run after ``VACUUM`` on SQLite (which may renumber the rowids the index
+points at), or to build the index for a database restored from a backup::
+
+    python backend/rebuild_search_index.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    from backend.database import engine
+    from backend.search import ensure_search_index, rebuild_search_index
+
+    ensure_search_index(engine)
+    rebuild_search_index(engine)
+    print(f"Rebuilt message search index for {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,13 +28,26 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class LoginOut(UserOut):
+    """A user with a session token (see auth.py)."""
+    access_token: str
+    token_type: str = "bearer"
+    expires_at: int
+
+
 class ChannelCreate(BaseModel):
     name: str
+    # Days before messages are archived (None: server default, 0: never).
+    retention_days: Optional[int] = None
 
 
 class ChannelOut(BaseModel):
     id: str
     name: str
+    retention_days: Optional[int] = None
+    member_count: int = 0
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -58,6 +71,35 @@ class MessageOut(BaseModel):
         from_attributes = True
 
 
+class MessageBatchOut(BaseModel):
+    channel_id: str
+    count: int
+    first_id: Optional[str] = None
+    last_id: Optional[str] = None
+
+
+class SearchHitOut(BaseModel):
+    id: str
+    channel_id: str
+    sender_id: str
+    content: str
+    created_at: datetime
+    score: float
+    snippet: str
+
+
+class SearchResultsOut(BaseModel):
+    results: List[SearchHitOut]
+    next_cursor: Optional[str] = None
+
+
+class UnreadOut(BaseModel):
+    channel_id: str
+    unread: int
+    last_read_message_id: Optional[str] = None
+    last_read_at: Optional[datetime] = None
+
+
 class ChannelMemberOut(BaseModel):
     user_id: str
     channel_id: str
@@ -0,0 +1,213 @@
+"""Full-text search over message content.
+
+SQLite uses an FTS5 index (``messages_fts``) over the ``messages`` table,
+kept in sync by triggers. Every insert path (REST, WebSocket, batch
+imports) is covered without application code. The channel is indexed as a
+second column so channel filters are resolved inside the index. Postgres
+uses a generated ``tsvector`` column with a GIN index.
+
+Results are ranked (BM25 on SQLite, ``ts_rank`` on Postgres), come with a
+highlighted snippet and are paged with an opaque keyset cursor over
+``(score, tie-breaker)``. Snippet text is HTML-escaped; only the ``<mark>``
+highlights are markup. The database brackets matches with private-use
+characters, which are turned into ``<mark>`` after escaping.
+
+FTS5 maps index entries to messages by ``rowid``, which ``VACUUM`` may
+renumber; rebuild the index after vacuuming (or whenever it is suspect)::
+
+    python backend/rebuild_search_index.py
+"""
+
+import html
+import logging
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_TOKENS = 12
+HIGHLIGHT_START, HIGHLIGHT_END = "<mark>", "</mark>"
+# What the database wraps matches in, before escaping.
+_START, _END = "\ue000", "\ue001"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+    # External-content source: the channel id is indexed without dashes so
+    # a UUID is a single token.
+    """CREATE VIEW IF NOT EXISTS messages_fts_source AS
+       SELECT rowid, content, replace(channel_id, '-', '') AS channel_key FROM messages""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+           content, channel_key,
+           content='messages_fts_source', content_rowid='rowid',
+           tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+           INSERT INTO messages_fts(rowid, content, channel_key)
+           VALUES (new.rowid, new.content, replace(new.channel_id, '-', ''));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+           INSERT INTO messages_fts(messages_fts, rowid, content, channel_key)
+           VALUES ('delete', old.rowid, old.content, replace(old.channel_id, '-', ''));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content, channel_id ON messages BEGIN
+           INSERT INTO messages_fts(messages_fts, rowid, content, channel_key)
+           VALUES ('delete', old.rowid, old.content, replace(old.channel_id, '-', ''));
+           INSERT INTO messages_fts(rowid, content, channel_key)
+           VALUES (new.rowid, new.content, replace(new.channel_id, '-', ''));
+       END""",
+]
+
+_POSTGRES_DDL = [
+    """ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+]
+
+
+def ensure_search_index(engine) -> None:
+    """Create the search index if missing; a new SQLite index is built from existing rows."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            )).first()
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+        elif engine.dialect.name == "postgresql":
+            for statement in _POSTGRES_DDL:
+                conn.execute(text(statement))
+        else:
+            logger.warning("Message search is not supported on %s", engine.dialect.name)
+
+
+def rebuild_search_index(engine) -> None:
+    """Rebuild the index from the ``messages`` table."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+            conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('optimize')"))
+        elif engine.dialect.name == "postgresql":
+            conn.execute(text("REINDEX INDEX ix_messages_search_vector"))
+
+
+def query_terms(q: str) -> List[str]:
+    """Words of a user query; operators and punctuation are ignored."""
+    return _TERM.findall(q)
+
+
+def _fts_match(terms: Sequence[str], channel_ids: Sequence[str]) -> str:
+    """FTS5 MATCH expression: all terms in the content, in any of the channels."""
+    def phrase(value: str) -> str:
+        return '"' + value.replace('"', '""') + '"'
+
+    content = " ".join(phrase(t) for t in terms)
+    channels = " OR ".join(phrase(c.replace("-", "")) for c in channel_ids)
+    return f"content : ({content}) AND channel_key : ({channels})"
+
+
+def encode_cursor(score: float, key) -> str:
+    return f"{score!r}~{key}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    score, sep, key = cursor.partition("~")
+    try:
+        if not sep:
+            raise ValueError(cursor)
+        return float(score), key
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+async def _search_sqlite(db, terms, channel_ids, limit, after) -> Tuple[list, Optional[str]]:
+    match = _fts_match(terms, channel_ids)
+    keyset = ""
+    params = {"match": match, "limit": limit + 1}
+    if after is not None:
+        if not after[1].isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        keyset = "WHERE score < :score OR (score = :score AND rid > :rid)"
+        params["score"], params["rid"] = after[0], int(after[1])
+    ranked = (await db.execute(text(f"""
+        SELECT rid, score FROM (
+            SELECT rowid AS rid, -bm25(messages_fts, 1.0, 0.0) AS score
+            FROM messages_fts WHERE messages_fts MATCH :match
+        ) {keyset}
+        ORDER BY score DESC, rid LIMIT :limit"""), params)).all()
+    page = ranked[:limit]
+    next_cursor = encode_cursor(page[-1].score, page[-1].rid) if len(ranked) > limit else None
+    if not page:
+        return [], None
+
+    # Snippets are only computed for the rows on this page.
+    rows = (await db.execute(text(f"""
+        SELECT messages_fts.rowid AS rid, m.id, m.channel_id, m.sender_id, m.content, m.created_at,
+               snippet(messages_fts, 0, :start, :end, '…', {SNIPPET_TOKENS}) AS snippet
+        FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid
+        WHERE messages_fts MATCH :match AND messages_fts.rowid IN :rids""").bindparams(
+        bindparam("rids", expanding=True)
+    ), {"match": match, "rids": [r.rid for r in page], "start": _START, "end": _END})).all()
+    by_rowid = {row.rid: row for row in rows}
+    hits = []
+    for rid, score in page:
+        row = by_rowid.get(rid)
+        if row is not None:
+            hits.append({**row._asdict(), "score": score})
+    return hits, next_cursor
+
+
+async def _search_postgres(db, terms, channel_ids, limit, after) -> Tuple[list, Optional[str]]:
+    keyset = ""
+    params = {"q": " ".join(terms), "channels": list(channel_ids), "limit": limit + 1}
+    if after is not None:
+        keyset = "AND (ts_rank(search_vector, query)::float8 < :score OR " \
+                 "(ts_rank(search_vector, query)::float8 = :score AND id > :after_id))"
+        params["score"], params["after_id"] = after
+    rows = (await db.execute(text(f"""
+        SELECT id, channel_id, sender_id, content, created_at, score,
+               ts_headline('simple', content, query, :options) AS snippet
+        FROM (
+            SELECT id, channel_id, sender_id, content, created_at, query,
+                   ts_rank(search_vector, query)::float8 AS score
+            FROM messages, plainto_tsquery('simple', :q) AS query
+            WHERE search_vector @@ query AND channel_id = ANY(:channels) {keyset}
+            ORDER BY score DESC, id LIMIT :limit
+        ) page
+        ORDER BY score DESC, id"""), {
+        **params,
+        "options": f"StartSel={_START}, StopSel={_END}, MaxWords={SNIPPET_TOKENS}, MinWords=4",
+    })).all()
+    hits = [row._asdict() for row in rows[:limit]]
+    next_cursor = encode_cursor(hits[-1]["score"], hits[-1]["id"]) if len(rows) > limit else None
+    return hits, next_cursor
+
+
+def render_snippet(snippet: str) -> str:
+    """HTML-escape a database snippet and mark its highlighted words."""
+    return html.escape(snippet).replace(_START, HIGHLIGHT_START).replace(_END, HIGHLIGHT_END)
+
+
+async def search_messages(db, q: str, channel_ids: Sequence[str], limit: int,
+                          cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Best matches for ``q`` in ``channel_ids``; returns ``(hits, next_cursor)``."""
+    terms = query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    if not channel_ids:
+        return [], None
+    after = decode_cursor(cursor) if cursor else None
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        hits, next_cursor = await _search_sqlite(db, terms, channel_ids, limit, after)
+    elif dialect == "postgresql":
+        hits, next_cursor = await _search_postgres(db, terms, channel_ids, limit, after)
+    else:
+        raise HTTPException(status_code=501, detail=f"Search is not supported on {dialect}")
+    for hit in hits:
+        hit["snippet"] = render_snippet(hit["snippet"])
+    return hits, next_cursor
@@ -0,0 +1,120 @@
+"""Message archival: segments on disk, paging across the hot/cold boundary."""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone, UTC
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import bindparam, func, select, update
+
+from backend import archive
+from backend.database import engine
+from backend.models import Message, MessageSegment
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "ARCHIVE_BLOCK_ROWS", 16)
+    monkeypatch.setattr(archive, "ARCHIVE_SEGMENT_ROWS", 100)
+    archive.open_segment.cache_clear()
+    return tmp_path
+
+
+@pytest.fixture
+def aged_channel(client, make_user, make_channel):
+    """A channel with ``old`` messages from 80 days ago on, ``step`` apart, and ``recent`` from the last hour."""
+    def make(old: int, recent: int, step=timedelta(hours=3)):
+        admin = make_user("admin")
+        channel = make_channel(admin, retention_days=1)
+        assert channel["retention_days"] == 1
+        client.post(f"/api/v1/messages/{channel['id']}/batch", headers=admin["headers"],
+                    json=[{"content": f"m{i}"} for i in range(old + recent)])
+        now = datetime.now(UTC)
+        with engine.begin() as conn:
+            ids = list(conn.scalars(select(Message.id).where(Message.channel_id == channel["id"])
+                                    .order_by(Message.seq)))
+            conn.execute(update(Message).where(Message.id == bindparam("b_id")).values(created_at=bindparam("b_at")), [
+                {"b_id": message_id, "b_at": now - timedelta(days=80) + step * i if i < old
+                 else now - timedelta(hours=1) + timedelta(seconds=i)}
+                for i, message_id in enumerate(ids)
+            ])
+        return channel["id"], ids
+
+    return make
+
+
+def _page(client, channel_id, **params):
+    response = client.get(f"/api/v1/messages/{channel_id}", params=params)
+    assert response.status_code == 200, response.text
+    return [m["id"] for m in response.json()]
+
+
+def test_archived_history_stays_pageable(client, archive_dir, aged_channel):
+    channel_id, ids = aged_channel(old=250, recent=30)
+    moved = archive.run_archive(engine)
+    assert moved[channel_id] == 250
+
+    with engine.connect() as conn:
+        hot = conn.scalar(select(func.count()).select_from(Message).where(Message.channel_id == channel_id))
+        segments = conn.scalar(select(func.count()).select_from(MessageSegment)
+                               .where(MessageSegment.channel_id == channel_id))
+    assert hot == 30
+    assert segments >= 3  # split by size and by calendar month
+    assert not list(archive_dir.glob("*/*.tmp"))
+
+    seen, cursor = [], None
+    while True:
+        page = _page(client, channel_id, limit=40, **({"before": cursor} if cursor else {}))
+        if not page:
+            break
+        seen.extend(page)
+        cursor = page[-1]
+    assert seen == ids[::-1]
+
+    assert _page(client, channel_id, after=ids[10], limit=5) == ids[11:16][::-1]
+    assert _page(client, channel_id, after=ids[247], limit=5) == ids[248:253][::-1]
+    assert _page(client, channel_id, before=ids[252], limit=5) == ids[247:252][::-1]
+
+    # Nothing left to move on a second run.
+    assert channel_id not in archive.run_archive(engine)
+
+
+def test_segment_lookup_by_id(archive_dir, aged_channel):
+    channel_id, ids = aged_channel(old=40, recent=0, step=timedelta(seconds=1))
+    archive.run_archive(engine)
+    (path,) = [p.relative_to(archive_dir) for p in archive_dir.glob(f"{channel_id}/*.seg")]
+    segment = archive.open_segment(str(path))
+    assert segment.locate(ids[17])[1] == ids[17]
+    assert segment.locate(str(uuid4())) is None
+    assert [r[0] for r in segment.before(None, 3)] == ids[-3:][::-1]
+
+
+def test_cutoff_in_another_timezone(archive_dir, aged_channel):
+    channel_id, ids = aged_channel(old=2, recent=0, step=timedelta(hours=2))
+    with engine.connect() as conn:
+        first = conn.scalar(select(Message.created_at).where(Message.id == ids[0]))
+    # An hour after the first message, written in UTC+05:00.
+    cutoff = (first + timedelta(hours=1)).replace(tzinfo=UTC).astimezone(timezone(timedelta(hours=5)))
+    assert archive.archive_channel(engine, channel_id, cutoff) == 1
+    with engine.connect() as conn:
+        assert conn.scalars(select(Message.id).where(Message.channel_id == channel_id)).all() == [ids[1]]
+
+
+def test_export_includes_archived_history(client, archive_dir, aged_channel):
+    channel_id, ids = aged_channel(old=40, recent=10)
+    archive.run_archive(engine)
+    admin = client.get(f"/api/v1/channels/{channel_id}/members").json()[0]["user_id"]
+
+    def export(**params):
+        response = client.get(f"/api/v1/messages/{channel_id}/export", params={"user_id": admin, **params})
+        assert response.status_code == 200, response.text
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    rows = export()
+    assert [r["id"] for r in rows] == ids
+    assert len({r["created_at"][-6:] for r in rows}) == 1  # one timestamp format across both tiers
+    assert [r["id"] for r in export(since=rows[35]["created_at"], until=rows[42]["created_at"])] == ids[35:42]
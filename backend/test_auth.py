@@ -0,0 +1,96 @@
+"""Signed session tokens: issuing, verification and token-only requests."""
+
+import os
+import sys
+import time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from backend import auth
+from backend.query_log import capture_queries
+
+@pytest.fixture
+def login(client, make_user):
+    """A new user's id and the headers of a session from ``/login``."""
+    def make(role="user"):
+        user = make_user(role)
+        response = client.post("/api/v1/users/login", json={"name": user["name"], "password": "pass123"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["token_type"] == "bearer" and body["expires_at"] > time.time()
+        return body["id"], {"Authorization": f"Bearer {body['access_token']}"}
+
+    return make
+
+
+def test_token_round_trip_and_rejections():
+    token, expires_at = auth.issue_token("u1", "admin", ttl_s=60, now=1000)
+    assert auth.verify_token(token, now=1000) == auth.Caller("u1", "admin", 1060)
+    assert auth.verify_token(token, now=1060) is None  # expired
+    payload, _, signature = token.rpartition(".")
+    assert auth.verify_token(payload.replace("admin", "root") + "." + signature, now=1000) is None
+    assert auth.verify_token("garbage", now=1000) is None
+
+
+def test_token_authorizes_without_user_lookups(client, login):
+    admin_id, headers = login("admin")
+    with capture_queries() as log:
+        response = client.post("/api/v1/channels/", headers=headers, json={"name": f"chan_{uuid4().hex[:8]}"})
+    assert response.status_code == 200, response.text
+    assert not [s for s in log.statements if "FROM users" in s]
+
+    _, user_headers = login()
+    response = client.post("/api/v1/channels/", headers=user_headers, json={"name": f"chan_{uuid4().hex[:8]}"})
+    assert response.status_code == 403
+
+    channel_id = client.get("/api/v1/channels/").json()[0]["id"]
+    assert client.post(f"/api/v1/channels/{channel_id}/join", params={"user_id": admin_id},
+                       headers=user_headers).status_code == 403  # someone else's user_id
+    assert client.post(f"/api/v1/channels/{channel_id}/join",
+                       headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_token_required_when_configured(client, login, monkeypatch):
+    user_id, headers = login()
+    monkeypatch.setattr(auth, "AUTH_REQUIRE_TOKEN", True)
+    assert client.get(f"/api/v1/users/{user_id}/unread").status_code == 401
+    assert client.get(f"/api/v1/users/{user_id}/unread", headers=headers).status_code == 200
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"/api/v1/ws/{user_id}") as ws:
+            ws.receive_json()
+
+
+def test_websocket_token_must_match_user(client, login):
+    user_id, headers = login()
+    other_id, _ = login()
+    token = headers["Authorization"].split()[1]
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"/api/v1/ws/{other_id}", params={"token": token}) as ws:
+            ws.receive_json()
+    with client.websocket_connect(f"/api/v1/ws/{user_id}", params={"token": token}) as ws:
+        ws.send_json({"type": "subscribe", "channel_id": str(uuid4())})
+        assert ws.receive_json()["error"] == "Not a member of this channel"
+
+
+def test_channel_websocket_rejects_malformed_frames(client, make_user, make_channel):
+    admin = make_user("admin")
+    user_id, token = admin["id"], admin["access_token"]
+    channel_id = make_channel(admin)["id"]
+
+    def next_reply(ws):
+        while True:
+            frame = ws.receive_json()
+            if "error" in frame or "content" in frame:
+                return frame
+
+    with client.websocket_connect(f"/api/v1/channels/{channel_id}/{user_id}", params={"token": token}) as ws:
+        ws.send_text("123")
+        assert next_reply(ws) == {"error": "JSON frames must be objects"}
+        ws.send_json({"content": 5})
+        assert next_reply(ws) == {"error": "content must be a string"}
+        ws.send_json({"content": "still connected"})
+        assert next_reply(ws)["content"] == "still connected"
@@ -0,0 +1,57 @@
+"""Entity cache: TTL/LRU behaviour and query-free authorization on send."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from backend.cache import MISSING, TTLCache, entity_cache
+from backend.database import async_engine
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # b is now the coldest
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.evictions == 1
+
+    now[0] = 11
+    assert cache.get("a") is MISSING
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 2, "evictions": 1}
+
+
+def _post(client, path, **kwargs):
+    response = client.post(path, **kwargs)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_send_needs_no_lookups_once_cached_and_join_invalidates(client, make_user, make_channel):
+    user = make_user()
+    channel = make_channel()
+    send = f"/api/v1/messages/{channel['id']}"
+
+    # Not a member yet: a cached membership set must not hide the join.
+    assert client.post(send, json={"content": "hi"}, params={"user_id": user["id"]}).status_code == 403
+    _post(client, f"/api/v1/channels/{channel['id']}/join", params={"user_id": user["id"]})
+    _post(client, send, json={"content": "warm"}, params={"user_id": user["id"]})
+
+    selects = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        hits = entity_cache.memberships.hits
+        _post(client, send, json={"content": "cached"}, params={"user_id": user["id"]})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert selects == []
+    assert entity_cache.memberships.hits == hits + 1
@@ -0,0 +1,69 @@
+"""Channel activity stats: maintained on every insert path, sortable, rebuildable."""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import update
+
+from backend.database import engine, rebuild_channel_stats
+from backend.models import Channel
+from backend.query_log import capture_queries
+
+
+def _channel(client, channel_id):
+    return client.get(f"/api/v1/channels/{channel_id}").json()
+
+
+def test_stats_follow_joins_and_every_send_path(client, make_user, make_channel):
+    channel_id = make_channel()["id"]
+    channel = _channel(client, channel_id)
+    assert (channel["member_count"], channel["message_count"], channel["last_message_at"]) == (1, 0, None)
+
+    member = make_user()
+    client.post(f"/api/v1/channels/{channel_id}/join", headers=member["headers"])
+    assert _channel(client, channel_id)["member_count"] == 2
+
+    client.post(f"/api/v1/messages/{channel_id}", headers=member["headers"], json={"content": "rest"})
+    client.post(f"/api/v1/messages/{channel_id}/batch", headers=member["headers"],
+                json=[{"content": "a"}, {"content": "b"}])
+    with client.websocket_connect(f"/api/v1/channels/{channel_id}/{member['id']}") as ws:
+        ws.send_text(json.dumps({"content": "ws"}))
+        while json.loads(ws.receive_text()).get("content") != "ws":
+            pass
+
+    channel = _channel(client, channel_id)
+    newest = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 1}).json()[0]
+    assert channel["message_count"] == 4
+    assert channel["last_message_at"][:19] == newest["created_at"][:19]
+
+
+def test_sort_by_activity_without_aggregates(client, make_user, make_channel):
+    admin = make_user("admin")
+    quiet, busy = (make_channel(admin)["id"] for _ in range(2))
+    client.post(f"/api/v1/messages/{quiet}", headers=admin["headers"], json={"content": "first"})
+    client.post(f"/api/v1/messages/{busy}", headers=admin["headers"], json={"content": "later"})
+
+    with capture_queries() as log:
+        ids = [c["id"] for c in client.get("/api/v1/channels/", params={"sort": "activity"}).json()]
+    assert ids.index(busy) < ids.index(quiet)
+    assert log.count == 1 and "count(" not in next(iter(log.statements)).lower()
+    names = [c["name"] for c in client.get("/api/v1/channels/", params={"sort": "name"}).json()]
+    assert names == sorted(names)
+
+
+def test_rebuild_restores_stats(client, make_user, make_channel):
+    admin = make_user("admin")
+    channel_id = make_channel(admin)["id"]
+    client.post(f"/api/v1/messages/{channel_id}", headers=admin["headers"], json={"content": "hi"})
+    expected = _channel(client, channel_id)
+
+    with engine.begin() as conn:
+        conn.execute(update(Channel).where(Channel.id == channel_id)
+                     .values(member_count=7, message_count=0, last_message_at=None))
+    assert rebuild_channel_stats(engine) >= 1
+    rebuilt = _channel(client, channel_id)
+    stats = ("member_count", "message_count", "last_message_at")
+    assert {k: rebuilt[k] for k in stats} == {k: expected[k] for k in stats}
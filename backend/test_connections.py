@@ -0,0 +1,127 @@
+"""Per-connection send queues and slow-consumer policies."""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api.v1.ws import ChannelConnectionManager
+from backend.connections import Connection
+from backend.enums import SlowConsumerPolicy
+from backend.pubsub import InMemoryBroker
+
+
+class _Socket:
+    def __init__(self, blocked=False, broken=False):
+        self.sent = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+        self.broken = broken
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        if self.broken:
+            raise ConnectionError("peer went away")
+        await self.gate.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_drop_oldest_keeps_newest_frames():
+    async def scenario():
+        sock = _Socket(blocked=True)
+        conn = Connection(sock, "u1", max_queue=3, policy=SlowConsumerPolicy.DROP_OLDEST)
+        conn.start()
+        await _settle()  # writer takes nothing yet: queue is empty
+        for i in range(6):
+            conn.send(str(i))
+        sock.gate.set()
+        await _settle()
+        return sock.sent, conn.dropped
+
+    sent, dropped = asyncio.run(scenario())
+    assert sent == ["3", "4", "5"] and dropped == 3
+
+
+def test_coalesce_replaces_queued_frame_with_same_key():
+    async def scenario():
+        sock = _Socket(blocked=True)
+        conn = Connection(sock, "u1", max_queue=10, policy=SlowConsumerPolicy.COALESCE)
+        conn.start()
+        await _settle()
+        conn.send("msg")
+        conn.send("presence-1", coalesce_key="presence:c1")
+        conn.send("presence-2", coalesce_key="presence:c1")
+        sock.gate.set()
+        await _settle()
+        return sock.sent
+
+    assert asyncio.run(scenario()) == ["msg", "presence-2"]
+
+
+def test_disconnect_policy_closes_slow_socket():
+    async def scenario():
+        sock = _Socket(blocked=True)
+        conn = Connection(sock, "u1", max_queue=2, policy=SlowConsumerPolicy.DISCONNECT)
+        conn.start()
+        await _settle()
+        results = [conn.send(str(i)) for i in range(3)]
+        await _settle()
+        return results, sock.closed_with
+
+    results, code = asyncio.run(scenario())
+    assert results == [True, True, False] and code == 1008
+
+
+def test_failed_socket_is_removed_and_others_still_receive():
+    async def scenario():
+        manager = ChannelConnectionManager(InMemoryBroker())
+        good, bad = _Socket(), _Socket(broken=True)
+        await manager.connect("c1", "u1", good)
+        await manager.connect("c1", "u2", bad)
+        await manager.broadcast_to_channel("c1", {"n": 1})
+        await _settle()
+        await manager.broadcast_to_channel("c1", {"n": 2})
+        await _settle()
+        return manager, good
+
+    manager, good = asyncio.run(scenario())
+    assert [frame["n"] for frame in map(json.loads, good.sent) if "n" in frame] == [1, 2]
+    assert manager.get_online_users("c1") == {"u1"}
+
+
+def test_registry_counts_devices_once_and_disconnects_user_everywhere():
+    async def scenario():
+        manager = ChannelConnectionManager(InMemoryBroker())
+        phone, laptop, laptop_c2, other = _Socket(), _Socket(), _Socket(), _Socket()
+        await manager.connect("c1", "u1", phone)
+        await manager.connect("c1", "u1", laptop)
+        await manager.connect("c2", "u1", laptop_c2)
+        await manager.connect("c1", "u2", other)
+        assert manager.get_online_users("c1") == {"u1", "u2"}
+        assert manager.registry.online["c1"]["u1"] == 2
+
+        await manager.disconnect("c1", "u1", phone)
+        assert manager.is_online("c1", "u1")
+
+        closed = await manager.disconnect_user("u1")
+        return manager, closed
+
+    manager, closed = asyncio.run(scenario())
+    assert closed == 2
+    assert manager.get_online_users("c1") == {"u2"}
+    assert "c2" not in manager.active_channels
+    assert "u1" not in manager.registry.user_channels
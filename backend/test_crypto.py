@@ -0,0 +1,96 @@
+"""Password hashing: the process pool, admission limit and legacy upgrades."""
+
+import asyncio
+import os
+import sys
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from backend import crypto
+from backend.database import SessionLocal, async_engine, async_write_engine
+from backend.models import User
+
+def _stored_password(name):
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.name == name).one().password
+    finally:
+        db.close()
+
+
+def test_hash_round_trip():
+    async def scenario():
+        encoded = await crypto.hash_password("pass123")
+        assert encoded.startswith(f"$scrypt${crypto.hasher.params}$")
+        assert encoded != await crypto.hash_password("pass123")  # salted
+        assert await crypto.verify_password(encoded, "pass123")
+        assert not await crypto.verify_password(encoded, "pass124")
+        assert not await crypto.verify_password("$scrypt$n=oops$x$y", "pass123")
+        assert not await crypto.verify_password("$argon2id$m=1$x$y", "pass123")
+        return encoded
+
+    encoded = asyncio.run(scenario())
+    assert not crypto.needs_rehash(encoded)
+    assert crypto.needs_rehash(crypto.encrypt_password("pass123"))
+    assert crypto.needs_rehash(encoded.replace(f"n={crypto.hasher.n}", "n=1024"))
+
+
+def test_admission_limit(client, monkeypatch):
+    monkeypatch.setattr(crypto, "PASSWORD_HASH_MAX_PENDING", 2)
+
+    async def scenario():
+        return await asyncio.gather(*(crypto.hash_password("pass123") for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(r, crypto.HasherBusy) for r in results) == 2
+    assert crypto._pending == 0
+
+    monkeypatch.setattr(crypto, "PASSWORD_HASH_MAX_PENDING", 0)
+    name = f"busy_{uuid4().hex[:8]}"
+    response = client.post("/api/v1/users/register", json={"name": name, "password": "pass123"})
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
+
+
+def test_login_upgrades_legacy_password(client):
+    name = f"legacy_{uuid4().hex[:8]}"
+    db = SessionLocal()
+    db.add(User(name=name, password=crypto.encrypt_password("pass123"), role="user"))
+    db.commit()
+    db.close()
+
+    assert client.post("/api/v1/users/login", json={"name": name, "password": "nope"}).status_code == 401
+    assert not _stored_password(name).startswith("$")
+
+    assert client.post("/api/v1/users/login", json={"name": name, "password": "pass123"}).status_code == 200
+    upgraded = _stored_password(name)
+    assert upgraded.startswith("$scrypt$") and not crypto.needs_rehash(upgraded)
+    assert client.post("/api/v1/users/login", json={"name": name, "password": "pass123"}).status_code == 200
+    assert _stored_password(name) == upgraded
+
+
+@pytest.mark.parametrize("password", ["pass123", "pässwörd"])
+def test_register_stores_hash(client, password):
+    name = f"hash_{uuid4().hex[:8]}"
+    assert client.post("/api/v1/users/register", json={"name": name, "password": password}).status_code == 200
+    assert _stored_password(name).startswith("$scrypt$")
+    assert client.post("/api/v1/users/login", json={"name": name, "password": password}).status_code == 200
+
+
+def test_register_hashes_without_the_writer(client, monkeypatch):
+    """The single SQLite writer connection stays free while a password is hashed."""
+    checked_out = []
+    derive = crypto._derive
+
+    async def observed(kdf):
+        checked_out.append(async_write_engine.pool.checkedout())
+        return await derive(kdf)
+
+    monkeypatch.setattr(crypto, "_derive", observed)
+    name = f"writer_{uuid4().hex[:8]}"
+    assert client.post("/api/v1/users/register", json={"name": name, "password": "pass123"}).status_code == 200
+    assert client.post("/api/v1/users/register", json={"name": name, "password": "pass123"}).status_code == 400
+    if async_write_engine is not async_engine:
+        assert checked_out == [0]
@@ -0,0 +1,32 @@
+"""SQLite storage profile: pragmas on every connection and the single writer."""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from backend.database import DATABASE_URL, async_engine, async_write_engine, is_sqlite
+
+
+def test_sqlite_connections_use_wal_and_one_writer():
+    if not is_sqlite(DATABASE_URL):
+        return
+
+    async def pragmas(engine):
+        async with engine.connect() as conn:
+            return [(await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                    for name in ("journal_mode", "synchronous", "busy_timeout")]
+
+    async def check():
+        try:
+            for engine in (async_engine, async_write_engine):
+                assert await pragmas(engine) == ["wal", 1, 5000]  # synchronous 1 = NORMAL
+        finally:
+            await async_engine.dispose()
+            await async_write_engine.dispose()
+
+    asyncio.run(check())
+    assert async_write_engine.pool.size() == 1
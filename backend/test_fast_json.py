@@ -0,0 +1,53 @@
+"""List endpoints encode the same JSON with and without the fast path."""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pydantic_core
+
+from backend import fast_json
+
+
+def test_fast_and_validated_paths_match(client, make_user, make_channel, monkeypatch):
+    admin = make_user("admin")
+    channel_id = make_channel(admin)["id"]
+    for i in range(5):
+        client.post(f"/api/v1/messages/{channel_id}", headers=admin["headers"], json={"content": f"héllo {i} \"quoted\""})
+    paths = ["/api/v1/users/", "/api/v1/channels/", f"/api/v1/channels/{channel_id}/members",
+             f"/api/v1/messages/{channel_id}", f"/api/v1/messages/{channel_id}?limit=2"]
+    monkeypatch.setattr(fast_json, "FAST_JSON_LISTS", True)
+    fast = [client.get(path) for path in paths]
+    monkeypatch.setattr(fast_json, "FAST_JSON_LISTS", False)
+    slow = [client.get(path) for path in paths]
+    for path, f, s in zip(paths, fast, slow):
+        assert f.status_code == s.status_code == 200, path
+        assert f.headers["content-type"] == "application/json"
+        assert f.json() == s.json(), path
+    assert len(fast[3].json()) == 5 and set(fast[3].json()[0]) == {
+        "id", "channel_id", "sender_id", "content", "status", "created_at"}
+
+
+def test_dumps_matches_pydantic_datetimes(monkeypatch):
+    rows = [{"at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), "naive": datetime(2024, 1, 2, 3, 4, 5, 600),
+             "none": None, "text": "ünïcode"}]
+    expected = pydantic_core.to_json(rows)
+    assert fast_json.dumps(rows) == expected
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.dumps(rows) == expected
+
+
+def test_orjson_list_path_writes_utc_offsets(client, make_user, make_channel, monkeypatch):
+    monkeypatch.setattr(fast_json, "FAST_JSON_LISTS", True)
+    admin = make_user("admin")
+    channel_id = make_channel(admin)["id"]
+    for i in range(3):
+        client.post(f"/api/v1/messages/{channel_id}", headers=admin["headers"], json={"content": f"m{i}"})
+    first = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2}).json()
+    paths = [f"/api/v1/messages/{channel_id}?limit=2&before={first[-1]['id']}", "/api/v1/users/",
+             "/api/v1/channels/", f"/api/v1/channels/{channel_id}/members"]
+    stamps = [value for path in paths for row in client.get(path).json()
+              for key, value in row.items() if key.endswith("_at") and value]
+    assert stamps and all(datetime.fromisoformat(s).utcoffset() == timedelta(0) for s in stamps)
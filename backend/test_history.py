@@ -0,0 +1,85 @@
+"""Recent-history ring buffer, replay on reconnect and buffered first pages."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api.v1.ws import manager
+from backend.history import RecentMessages
+from backend.persistence import new_message_row
+
+
+def _rows(channel_id, count):
+    return [new_message_row(channel_id, "u1", f"m{i}") for i in range(count)]
+
+
+def test_ring_keeps_newest_and_replays_gap():
+    recent = RecentMessages(capacity=3)
+    recent.begin_seed("c1")
+    recent.seed("c1", [])
+    rows = _rows("c1", 5)
+    for row in rows:
+        recent.record(row)
+
+    assert [r["content"] for r in recent.latest("c1", 3)] == ["m4", "m3", "m2"]
+    assert recent.latest("c1", 4) is None  # older than the buffer
+    assert [r["content"] for r in recent.since("c1", rows[2]["id"])] == ["m3", "m4"]
+    assert recent.since("c1", rows[0]["id"]) is None
+
+
+def test_seed_keeps_rows_recorded_during_the_query():
+    recent = RecentMessages(capacity=10)
+    first, second, late = _rows("c1", 3)
+    recent.begin_seed("c1")
+    recent.record(late)  # committed after the query's snapshot
+    recent.seed("c1", [second, first])
+    assert [r["id"] for r in recent.latest("c1", 10)] == [late["id"], second["id"], first["id"]]
+
+
+def test_cold_channels_are_evicted_under_the_memory_cap():
+    recent = RecentMessages(capacity=100, max_mb=0.002)  # ~3 rows
+    for channel_id in ("a", "b", "c"):
+        recent.begin_seed(channel_id)
+        recent.seed(channel_id, _rows(channel_id, 1))
+    recent.latest("a", 1)  # touch a: b is now the coldest
+    recent.begin_seed("d")
+    recent.seed("d", _rows("d", 1))
+    assert "b" not in recent and "a" in recent and "d" in recent
+    assert recent.evictions == 1
+
+
+def _send(client, user_id, channel_id, content):
+    return client.post(
+        f"/api/v1/messages/{channel_id}", json={"content": content}, params={"user_id": user_id}
+    ).json()
+
+
+def test_reconnect_replays_missed_messages(client, make_user, make_channel):
+    admin = make_user("admin")
+    user_id, channel_id = admin["id"], make_channel(admin)["id"]
+    seen = _send(client, user_id, channel_id, "seen")
+    assert [m["id"] for m in client.get(f"/api/v1/messages/{channel_id}").json()] == [seen["id"]]
+    assert channel_id in manager.recent  # the first page seeded the buffer
+
+    missed = [_send(client, user_id, channel_id, f"missed {i}")["id"] for i in range(3)]
+    hits = manager.recent.hits
+    with client.websocket_connect(
+        f"/api/v1/channels/{channel_id}/{user_id}", params={"last_seen_id": seen["id"]}
+    ) as ws:
+        frame = ws.receive_json()
+        while frame["type"] != "replay":
+            frame = ws.receive_json()
+    assert [m["id"] for m in frame["messages"]] == missed and frame["complete"]
+    assert manager.recent.hits == hits + 1
+
+    page = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2}).json()
+    assert [m["id"] for m in page] == missed[::-1][:2]
+
+
+def test_discard_drops_a_seed_in_flight():
+    recent = RecentMessages(capacity=10)
+    recent.begin_seed("c1")
+    recent.discard("c1")  # e.g. a batch the buffer could not hold
+    recent.seed("c1", _rows("c1", 1))
+    assert "c1" not in recent
@@ -0,0 +1,106 @@
+"""ETags, conditional GETs and response compression."""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from backend.api.v1.ws import manager
+from backend import http_cache
+from backend.http_cache import _match, resource_versions
+from backend.query_log import capture_queries
+
+def test_conditional_get_skips_the_database(client, make_channel):
+    channel_id = make_channel()["id"]
+    for path in ("/api/v1/channels/", f"/api/v1/channels/{channel_id}", f"/api/v1/channels/{channel_id}/members",
+                 "/api/v1/users/"):
+        first = client.get(path)
+        etag = first.headers["etag"]
+        assert first.status_code == 200 and etag.startswith('"')
+        with capture_queries() as log:
+            again = client.get(path, headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.headers["etag"] == etag and not again.content
+        assert log.count == 0, path
+
+
+def test_changes_bump_versions(client, make_user, make_channel, monkeypatch):
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_ACTIVITY_INTERVAL_S", 0)
+    monkeypatch.setattr(resource_versions, "_deferred", {})  # bumps still pending from other tests
+    admin = make_user("admin")
+    channels = client.get("/api/v1/channels/").headers["etag"]
+    channel_id = make_channel(admin)["id"]
+    assert client.get("/api/v1/channels/", headers={"If-None-Match": channels}).status_code == 200
+
+    members = client.get(f"/api/v1/channels/{channel_id}/members").headers["etag"]
+    member = make_user()["headers"]
+    client.post(f"/api/v1/channels/{channel_id}/join", headers=member)
+    response = client.get(f"/api/v1/channels/{channel_id}/members", headers={"If-None-Match": members})
+    assert response.status_code == 200 and len(response.json()) == 2
+
+    # Messages change the channel's activity stats, not its members or other channels.
+    members = response.headers["etag"]
+    other_id = make_channel(admin)["id"]
+    etags = {path: client.get(path).headers["etag"] for path in (
+        "/api/v1/channels/", f"/api/v1/channels/{channel_id}", f"/api/v1/channels/{other_id}")}
+    client.post(f"/api/v1/messages/{channel_id}", headers=member, json={"content": "hi"})
+    status = {path: client.get(path, headers={"If-None-Match": etag}).status_code for path, etag in etags.items()}
+    assert list(status.values()) == [200, 200, 304]
+    assert client.get(f"/api/v1/channels/{channel_id}/members", headers={"If-None-Match": members}).status_code == 304
+
+    users = client.get("/api/v1/users/").headers["etag"]
+    make_user()
+    assert client.get("/api/v1/users/", headers={"If-None-Match": users}).status_code == 200
+
+
+def test_activity_bumps_are_coalesced(monkeypatch):
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_ACTIVITY_INTERVAL_S", 0.05)
+    versions = http_cache.ResourceVersions()
+    published = []
+
+    async def publish(key, version):
+        published.append(key)
+
+    async def scenario():
+        versions.publish = publish
+        for _ in range(20):
+            await versions.touch("channel:a")
+        first = versions.etag("channel:a")
+        await asyncio.sleep(0.1)
+        return first
+
+    first = asyncio.run(scenario())
+    assert published == ["channel:a", "channel:a"]  # one now, one for the rest of the interval
+    assert versions.etag("channel:a") != first
+
+
+def test_versions_from_other_workers(client):
+    users = client.get("/api/v1/users/").headers["etag"]
+    asyncio.run(manager._on_bus_message(manager.RESOURCE_TOPIC, "v" + "0" * 32 + "users remote.1"))
+    assert resource_versions.etag("users") == '"remote.1"'
+    assert client.get("/api/v1/users/", headers={"If-None-Match": users}).status_code == 200
+
+
+def test_compression_and_encoded_etags(client, make_user):
+    for _ in range(20):
+        make_user()
+    raw = client.get("/api/v1/users/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+
+    compressed = client.get("/api/v1/users/", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert compressed.headers["etag"] == raw.headers["etag"][:-1] + '-gzip"'
+    assert compressed.json() == raw.json()
+    assert int(compressed.headers["content-length"]) < len(raw.content)
+
+    response = client.get("/api/v1/users/", headers={"If-None-Match": compressed.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_if_none_match_parsing():
+    assert _match('"a", W/"b"', '"b"') == 'W/"b"'
+    assert _match('"b-gzip"', '"b"') == '"b-gzip"' and _match('"b-br"', '"b"') == '"b-br"'
+    assert _match("*", '"b"') == '"b"'
+    assert _match('"a"', '"b"') is None
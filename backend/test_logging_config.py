@@ -0,0 +1,72 @@
+"""Logging pipeline: queued JSON records and per-event sampling."""
+
+import io
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import logging_config
+
+
+def _emit(handler, records):
+    logger = logging.getLogger("backend.test_logging")
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    try:
+        for args, kwargs in records:
+            logger.info(*args, **kwargs)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Failed %s", "here")
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+        logging_config.stop_logging()  # drains the queue
+
+
+def test_json_lines_with_extra_fields():
+    out = io.StringIO()
+    handler = logging_config.queue_handler(fmt="json", sample_rates="", stream=out)
+    _emit(handler, [(("User %s joined %s", "ann", "general"), {"extra": {"event": "channel_join"}})])
+    first, second = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert first["msg"] == "User ann joined general"
+    assert first["event"] == "channel_join" and first["level"] == "INFO"
+    assert first["logger"] == "backend.test_logging"
+    assert second["msg"] == "Failed here" and "ValueError: boom" in second["exc"]
+
+
+def test_sampled_events_keep_one_in_n():
+    out = io.StringIO()
+    handler = logging_config.queue_handler(fmt="json", sample_rates="message_sent=0.1,noisy=0", stream=out)
+    records = [(("Message %s", i), {"extra": {"event": "message_sent"}}) for i in range(25)]
+    records += [(("Noise",), {"extra": {"event": "noisy"}}), (("Unsampled",), {})]
+    _emit(handler, records)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    sent = [line for line in lines if line.get("event") == "message_sent"]
+    assert [line["msg"] for line in sent] == ["Message 0", "Message 10", "Message 20"]
+    assert all(line["sampled"] == 10 for line in sent)
+    assert [line["msg"] for line in lines if "event" not in line] == ["Unsampled", "Failed here"]
+
+
+def test_parse_sample_rates():
+    assert logging_config.parse_sample_rates(" a=0.5, b=0 ,") == {"a": 0.5, "b": 0.0}
+
+
+def test_ensure_logging_installs_the_queue_once(monkeypatch):
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    logging_config.stop_logging()
+    try:
+        logging_config.ensure_logging()
+        listener = logging_config._listener
+        assert [type(h) for h in root.handlers] == [logging_config._DeferredQueueHandler]
+        logging_config.ensure_logging()
+        assert logging_config._listener is listener and len(root.handlers) == 1
+    finally:
+        logging_config.stop_logging()
@@ -0,0 +1,69 @@
+"""Bulk message ingestion: JSON and NDJSON bodies, one fan-out frame."""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from backend.api.v1.ws import manager
+
+
+@pytest.fixture
+def member_channel(make_user, make_channel):
+    """An admin's id and a channel they are a member of."""
+    admin = make_user("admin")
+    return admin["id"], make_channel(admin)["id"]
+
+
+def test_batch_is_stored_in_order_and_broadcast_once(client, member_channel):
+    user_id, channel_id = member_channel
+    with client.websocket_connect(f"/api/v1/ws/{user_id}") as ws:
+        ws.send_json({"type": "subscribe", "channel_id": channel_id})
+        while ws.receive_json().get("type") != "presence_snapshot":
+            pass
+        response = client.post(
+            f"/api/v1/messages/{channel_id}/batch", params={"user_id": user_id},
+            json=[{"content": f"m{i}"} for i in range(5)],
+        )
+        frame = ws.receive_json()
+        while frame.get("type") == "presence":
+            frame = ws.receive_json()
+
+    assert response.status_code == 200 and response.json()["count"] == 5
+    assert frame["type"] == "message_batch" and frame["complete"]
+    assert [m["content"] for m in frame["messages"]] == [f"m{i}" for i in range(5)]
+    page = client.get(f"/api/v1/messages/{channel_id}").json()
+    assert [m["content"] for m in page] == [f"m{i}" for i in range(4, -1, -1)]
+
+
+def test_ndjson_body_is_all_or_nothing(client, member_channel, make_user):
+    user_id, channel_id = member_channel
+    url = f"/api/v1/messages/{channel_id}/batch"
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    lines = [json.dumps({"content": "ok"}), json.dumps({"nope": 1})]
+    bad = client.post(url, params={"user_id": user_id}, content="\n".join(lines), headers=headers)
+    assert bad.status_code == 422 and "line 2" in bad.json()["detail"]
+    assert client.get(f"/api/v1/messages/{channel_id}").json() == []
+
+    body = "".join(json.dumps({"content": f"line {i}"}) + "\n" for i in range(1500))
+    good = client.post(url, params={"user_id": user_id}, content=body, headers=headers).json()
+    assert good["count"] == 1500
+    page = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 1}).json()
+    assert page[0]["id"] == good["last_id"] and page[0]["content"] == "line 1499"
+
+    outsider = make_user()
+    assert client.post(url, params={"user_id": outsider["id"]}, json=[{"content": "x"}]).status_code == 403
+
+
+def test_ids_do_not_depend_on_the_history_buffer(client, member_channel, monkeypatch):
+    user_id, channel_id = member_channel
+    monkeypatch.setattr(manager.recent, "capacity", 0)
+    batch = client.post(f"/api/v1/messages/{channel_id}/batch", params={"user_id": user_id},
+                        json=[{"content": f"m{i}"} for i in range(3)]).json()
+    monkeypatch.undo()
+    page = client.get(f"/api/v1/messages/{channel_id}").json()
+    assert (batch["first_id"], batch["last_id"]) == (page[-1]["id"], page[0]["id"])
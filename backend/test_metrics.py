@@ -0,0 +1,70 @@
+"""Prometheus metrics: route latency, SQL per request, WebSocket fan-out."""
+
+import os
+import sys
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from backend import metrics
+
+
+def _samples(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_requests_recorded_by_route_template(client, make_user):
+    user_id = make_user()["id"]
+    for _ in range(3):
+        assert client.get(f"/api/v1/users/{user_id}").status_code == 200
+    client.get(f"/no/such/{uuid4()}")
+
+    samples = _samples(client)
+    labels = '{method="GET",route="/api/v1/users/{user_id}"}'
+    assert samples[f"http_request_duration_seconds_count{labels}"] >= 3
+    assert samples[f'http_request_duration_seconds_bucket{labels[:-1]},le="+Inf"}}'] >= 3
+    assert samples[f"http_request_sql_queries_sum{labels}"] >= 3
+    assert samples['http_request_duration_seconds_count{method="GET",route="unmatched"}'] >= 1
+    assert not any(user_id in name for name in samples)
+    assert samples["sql_query_duration_seconds_count"] > 0
+    assert "ws_connections" in samples and "ws_channels" in samples
+
+
+def test_websocket_fan_out_recorded(client, make_user, make_channel):
+    admin = make_user("admin")
+    channel_id = make_channel(admin)["id"]
+    before = _samples(client).get("ws_broadcast_recipients_count", 0)
+    with client.websocket_connect(f"/api/v1/ws/{admin['id']}") as ws:
+        ws.send_json({"type": "subscribe", "channel_id": channel_id})
+        while ws.receive_json().get("type") != "presence_snapshot":
+            pass
+        assert _samples(client)["ws_connections"] >= 1
+        client.post(f"/api/v1/messages/{channel_id}/batch", headers=admin["headers"],
+                    json=[{"content": "hello"}])
+        while ws.receive_json().get("type") != "message_batch":
+            pass
+    samples = _samples(client)
+    assert samples["ws_broadcast_recipients_count"] > before
+    assert samples["ws_broadcast_recipients_sum"] >= 1
+
+def test_histogram_render():
+    h = metrics.Histogram("t_seconds", "test", ("op",), buckets=(0.1, 1.0))
+    h.labels('a"b').observe(0.05)
+    h.labels('a"b').observe(0.1)
+    h.labels('a"b').observe(5)
+    assert h.render() == [
+        't_seconds_bucket{op="a\\"b",le="0.1"} 2',
+        't_seconds_bucket{op="a\\"b",le="1.0"} 2',
+        't_seconds_bucket{op="a\\"b",le="+Inf"} 3',
+        't_seconds_sum{op="a\\"b"} 5.15',
+        't_seconds_count{op="a\\"b"} 3',
+    ]
@@ -0,0 +1,63 @@
+"""Keyset pagination of channel history."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def channel_with_messages(client, make_user, make_channel):
+    def make(count: int):
+        admin = make_user("admin")
+        channel_id = make_channel(admin)["id"]
+        sent = []
+        for i in range(count):
+            resp = client.post(f"/api/v1/messages/{channel_id}", json={"content": f"m{i}"}, headers=admin["headers"])
+            assert resp.status_code == 200, resp.text
+            sent.append(resp.json()["id"])
+        return channel_id, sent
+
+    return make
+
+
+def test_history_pages_newest_first(client, channel_with_messages):
+    channel_id, sent = channel_with_messages(7)
+
+    first = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 3}).json()
+    assert [m["id"] for m in first] == sent[::-1][:3]
+
+    second = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 3, "before": first[-1]["id"]}).json()
+    assert [m["id"] for m in second] == sent[::-1][3:6]
+
+    last = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 3, "before": second[-1]["id"]}).json()
+    assert [m["id"] for m in last] == [sent[0]]
+
+
+def test_history_after_cursor(client, channel_with_messages):
+    channel_id, sent = channel_with_messages(5)
+
+    page = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2, "after": sent[1]}).json()
+    assert [m["id"] for m in page] == [sent[3], sent[2]]
+
+
+def test_history_unknown_cursor(client, channel_with_messages):
+    channel_id, _ = channel_with_messages(1)
+
+    resp = client.get(f"/api/v1/messages/{channel_id}", params={"before": str(uuid4())})
+    assert resp.status_code == 400
+
+
+def test_history_timestamps_are_utc_on_every_page(client, channel_with_messages):
+    channel_id, sent = channel_with_messages(4)
+
+    first = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2}).json()
+    before = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2, "before": first[-1]["id"]}).json()
+    after = client.get(f"/api/v1/messages/{channel_id}", params={"limit": 2, "after": sent[0]}).json()
+    stamps = [datetime.fromisoformat(m["created_at"]) for m in first + before + after]
+    assert all(stamp.tzinfo is not None and stamp.utcoffset() == timedelta(0) for stamp in stamps)
+    assert min(stamps[:2]) >= max(stamps[2:4])
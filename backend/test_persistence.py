@@ -0,0 +1,102 @@
+"""Group-commit behaviour of the message writer."""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import persistence
+from backend.enums import DurabilityMode
+from backend.persistence import MessageWriter, new_message_row
+
+
+class _RecordingSession:
+    """Stand-in session factory that records each committed batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def scalar(self, statement):
+        return None  # channel message counter
+
+    async def execute(self, statement, rows):
+        self._rows = list(rows)
+
+    async def commit(self):
+        self.batches.append(self._rows)
+
+
+def test_concurrent_submits_share_one_commit():
+    session = _RecordingSession()
+    writer = MessageWriter(batch_size=100, flush_interval_ms=20, session_factory=session)
+
+    async def scenario():
+        rows = [new_message_row("c1", "u1", f"m{i}") for i in range(10)]
+        await asyncio.gather(*(writer.submit(row) for row in rows))
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert len(session.batches) == 1
+    assert [r["content"] for r in session.batches[0]] == [f"m{i}" for i in range(10)]
+
+
+def test_size_trigger_splits_batches():
+    session = _RecordingSession()
+    writer = MessageWriter(batch_size=4, flush_interval_ms=1000, session_factory=session)
+
+    async def scenario():
+        await asyncio.gather(*(writer.submit(new_message_row("c1", "u1", str(i))) for i in range(10)))
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert [len(b) for b in session.batches] == [4, 4, 2]
+
+
+def test_version_bump_failure_does_not_fail_committed_writes(monkeypatch):
+    session = _RecordingSession()
+    writer = MessageWriter(batch_size=100, flush_interval_ms=20, session_factory=session)
+
+    async def broken_touch(*keys):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(persistence.resource_versions, "touch", broken_touch)
+
+    async def scenario():
+        await asyncio.gather(*(writer.submit(new_message_row("c1", "u1", str(i))) for i in range(3)))
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert [len(b) for b in session.batches] == [3]
+
+
+def test_close_flushes_write_behind_queue():
+    session = _RecordingSession()
+    writer = MessageWriter(
+        batch_size=100, flush_interval_ms=60_000,
+        durability=DurabilityMode.WRITE_BEHIND, session_factory=session,
+    )
+
+    async def scenario():
+        for i in range(3):
+            await writer.submit(new_message_row("c1", "u1", str(i)))
+        assert session.batches == []
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert sum(len(b) for b in session.batches) == 3
+
+
+def test_rows_have_increasing_timestamps():
+    rows = [new_message_row("c1", "u1", "x") for _ in range(50)]
+    stamps = [r["created_at"] for r in rows]
+    assert stamps == sorted(stamps) and len(set(stamps)) == len(stamps)
@@ -0,0 +1,84 @@
+"""Batched, versioned presence deltas."""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api.v1.ws import ChannelConnectionManager
+from backend.pubsub import InMemoryBroker
+
+
+class _Socket:
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.frames.append(json.loads(data))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def _manager():
+    return ChannelConnectionManager(InMemoryBroker(), presence_window_ms=20)
+
+
+def test_joins_in_one_window_become_one_delta():
+    async def scenario():
+        manager = _manager()
+        first = _Socket()
+        await manager.connect("c1", "u1", first)
+        others = [_Socket() for _ in range(3)]
+        for i, sock in enumerate(others):
+            await manager.connect("c1", f"u{i + 2}", sock)
+        await asyncio.sleep(0.05)
+        return first.frames
+
+    frames = asyncio.run(scenario())
+    assert frames[0] == {"type": "presence_snapshot", "channel_id": "c1", "version": 0, "online_users": []}
+    assert len(frames) == 2
+    assert frames[1]["version"] == 1
+    assert sorted(frames[1]["added"]) == ["u1", "u2", "u3", "u4"] and frames[1]["removed"] == []
+
+
+def test_reconnect_within_window_is_silent_and_snapshot_matches_version():
+    async def scenario():
+        manager = _manager()
+        watcher, flappy = _Socket(), _Socket()
+        await manager.connect("c1", "u1", watcher)
+        await manager.connect("c1", "u2", flappy)
+        await asyncio.sleep(0.05)
+        seen = len(watcher.frames)
+
+        await manager.disconnect("c1", "u2", flappy)
+        # Mid-window the snapshot still describes version 1.
+        snapshot = manager.presence.snapshot("c1")
+        await manager.connect("c1", "u2", _Socket())
+        await asyncio.sleep(0.05)
+        return watcher.frames[seen:], snapshot
+
+    new_frames, snapshot = asyncio.run(scenario())
+    assert new_frames == []
+    assert snapshot["version"] == 1 and sorted(snapshot["online_users"]) == ["u1", "u2"]
+
+
+def test_leave_is_reported_as_removed():
+    async def scenario():
+        manager = _manager()
+        watcher, leaver = _Socket(), _Socket()
+        await manager.connect("c1", "u1", watcher)
+        await manager.connect("c1", "u2", leaver)
+        await asyncio.sleep(0.05)
+        await manager.disconnect("c1", "u2", leaver)
+        await asyncio.sleep(0.05)
+        return watcher.frames[-1]
+
+    delta = asyncio.run(scenario())
+    assert delta["type"] == "presence" and delta["version"] == 2
+    assert delta["added"] == [] and delta["removed"] == ["u2"]
@@ -0,0 +1,83 @@
+"""Cross-worker fan-out through the pub/sub bus."""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api.v1.ws import ChannelConnectionManager
+from backend.pubsub import InMemoryBroker, RedisBroker
+from backend.pubsub_hub import PubSubHub
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+
+def _messages(sock):
+    return [frame for frame in sock.sent if frame["type"] == "message"]
+
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+def test_in_memory_broker_delivers_locally():
+    async def scenario():
+        manager = ChannelConnectionManager(InMemoryBroker())
+        a, b = _FakeSocket(), _FakeSocket()
+        await manager.connect("c1", "u1", a)
+        await manager.connect("c1", "u2", b)
+        await manager.broadcast_to_channel("c1", {"type": "message", "content": "hi"})
+        await _settle()
+        assert _messages(a) == _messages(b) == [{"type": "message", "content": "hi"}]
+        assert manager.get_online_users("c1") == {"u1", "u2"}
+        await manager.disconnect("c1", "u1", a)
+        assert "c1" in manager.active_channels
+        await manager.disconnect("c1", "u2", b)
+        assert manager.broker.topics == set()
+
+    asyncio.run(scenario())
+
+
+def test_redis_protocol_broker_spans_workers():
+    async def scenario():
+        hub = PubSubHub()
+        url = await hub.start(unix_path=os.path.join(tempfile.mkdtemp(), "hub.sock"))
+        one = ChannelConnectionManager(RedisBroker(url))
+        two = ChannelConnectionManager(RedisBroker(url))
+        try:
+            a, b = _FakeSocket(), _FakeSocket()
+            await one.connect("c1", "u1", a)
+            await two.connect("c1", "u2", b)
+            await _settle()
+            assert one.get_online_users("c1") == two.get_online_users("c1") == {"u1", "u2"}
+
+            await one.broadcast_to_channel("c1", {"type": "message", "content": "hi"})
+            await _settle()
+            assert _messages(b) == [{"type": "message", "content": "hi"}]
+
+            # Only workers with local sockets in a channel subscribe to it.
+            await two.broadcast_to_channel("c2", {"type": "message", "content": "nobody"})
+            assert "channel:c2" not in one.broker.topics
+
+            await two.disconnect("c1", "u2", b)
+            await _settle()
+            assert one.get_online_users("c1") == {"u1"}
+        finally:
+            await one.close()
+            await two.close()
+            await hub.stop()
+
+    asyncio.run(scenario())
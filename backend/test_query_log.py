@@ -0,0 +1,64 @@
+"""Query log: statement grouping, budgets and N+1 warnings."""
+
+import logging
+import os
+import sys
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from backend import query_log
+from backend.app import create_app
+from backend.database import engine
+from backend.models import User
+from backend.query_log import assert_max_queries, capture_queries
+
+def test_normalize_folds_parameter_lists():
+    a = query_log.normalize("SELECT *\n  FROM users WHERE id IN (?, ?, ?)")
+    b = query_log.normalize("SELECT * FROM users WHERE id IN (?, ?)")
+    assert a == b == "SELECT * FROM users WHERE id IN (?, ...)"
+    assert query_log.normalize("INSERT INTO t VALUES ($1, $2), ($3, $4)") == "INSERT INTO t VALUES (?, ...), ..."
+
+
+def test_query_budget_for_channel_creation(client, make_user):
+    admin = make_user("admin")["id"]
+    with assert_max_queries(4, repeats=2) as log:
+        response = client.post("/api/v1/channels/", params={"user_id": admin},
+                               json={"name": f"chan_{uuid4().hex[:8]}"})
+    assert response.status_code == 200
+    assert log.count > 0
+
+    with pytest.raises(AssertionError, match="at most 0 statements"):
+        with assert_max_queries(0):
+            client.get(f"/api/v1/users/{admin}")
+
+
+def test_repeated_statement_flagged(monkeypatch, caplog):
+    monkeypatch.setattr(query_log, "QUERY_LOG_ENABLED", True)
+    with capture_queries():  # installs the hooks
+        pass
+    with caplog.at_level(logging.WARNING, logger="backend.query_log"):
+        with query_log.record("loop") as log:
+            with engine.connect() as conn:
+                for _ in range(6):
+                    conn.execute(select(User.id).where(User.name == uuid4().hex))
+    assert log.count == 6
+    (statement, count), = log.repeated(5)
+    assert count == 6 and statement.startswith("SELECT users.id FROM users")
+    assert "possible N+1: 6x SELECT users.id" in caplog.text
+
+
+def test_middleware_logs_requests_over_budget(make_user, monkeypatch, caplog):
+    monkeypatch.setattr(query_log, "QUERY_LOG_ENABLED", True)
+    monkeypatch.setattr(query_log, "QUERY_LOG_MAX_QUERIES", 0)
+    admin = make_user("admin")["id"]
+    with capture_queries():
+        pass
+    logged = TestClient(create_app())
+    with caplog.at_level(logging.WARNING, logger="backend.query_log"):
+        logged.get(f"/api/v1/users/{admin}")
+    assert "GET /api/v1/users/{user_id}: 1 statements" in caplog.text
@@ -0,0 +1,86 @@
+"""Read cursors: ack frames, coalesced persistence and unread counts."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.read_cursors import read_cursors
+
+
+def _post(client, channel_id, user_id, count):
+    response = client.post(f"/api/v1/messages/{channel_id}/batch", params={"user_id": user_id},
+                           json=[{"content": f"m{i}"} for i in range(count)])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _unread(client, user_id):
+    response = client.get(f"/api/v1/users/{user_id}/unread")
+    assert response.status_code == 200, response.text
+    return {row["channel_id"]: row for row in response.json()}
+
+
+def _ack(ws, channel_id, message_id):
+    ws.send_json({"type": "ack", "channel_id": channel_id, "message_id": message_id})
+    # Frames are handled in order: once the snapshot arrives the ack is queued.
+    ws.send_json({"type": "presence_sync", "channel_id": channel_id})
+    while ws.receive_json().get("type") != "presence_snapshot":
+        pass
+
+
+def test_unread_counts_follow_acks_and_never_move_back(client, make_user, make_channel):
+    admin_user = make_user("admin")
+    admin, member = admin_user["id"], make_user()["id"]
+    channel, other = make_channel(admin_user)["id"], make_channel(admin_user)["id"]
+    first = _post(client, channel, admin, 2)
+    client.post(f"/api/v1/channels/{channel}/join", params={"user_id": member})
+    assert _unread(client, member)[channel]["unread"] == 0
+
+    _post(client, channel, admin, 3)
+    latest = _post(client, channel, admin, 2)
+    assert _unread(client, member)[channel]["unread"] == 5
+    assert _unread(client, admin)[channel]["unread"] == 7
+
+    acks_before = read_cursors.acks
+    with client.websocket_connect(f"/api/v1/ws/{member}") as ws:
+        ws.send_json({"type": "subscribe", "channel_id": channel})
+        while ws.receive_json().get("type") != "presence_snapshot":
+            pass
+        _ack(ws, channel, first["last_id"])  # older than the join: ignored
+        _ack(ws, channel, latest["first_id"])
+        unread = _unread(client, member)[channel]
+        assert unread["unread"] == 1
+        assert unread["last_read_message_id"] == latest["first_id"]
+
+        # Moving back, or acking another channel's message, changes nothing.
+        _ack(ws, channel, first["first_id"])
+        _ack(ws, channel, _post(client, other, admin, 1)["last_id"])
+        assert _unread(client, member)[channel]["unread"] == 1
+    assert read_cursors.acks - acks_before == 4
+
+
+def test_unread_overlays_own_pending_acks_without_flushing(client, make_user, make_channel, monkeypatch):
+    monkeypatch.setattr(read_cursors, "flush_interval", 3600)
+    admin_user = make_user("admin")
+    admin, alice, bob = admin_user["id"], make_user()["id"], make_user()["id"]
+    channel = make_channel(admin_user)["id"]
+    for user_id in (alice, bob):
+        client.post(f"/api/v1/channels/{channel}/join", params={"user_id": user_id})
+    batch = _post(client, channel, admin, 3)
+
+    with client.websocket_connect(f"/api/v1/ws/{alice}") as a, client.websocket_connect(f"/api/v1/ws/{bob}") as b:
+        for ws in (a, b):
+            ws.send_json({"type": "subscribe", "channel_id": channel})
+            while ws.receive_json().get("type") != "presence_snapshot":
+                pass
+        # Out of order within one flush window: the newer ack still wins.
+        _ack(a, channel, batch["last_id"])
+        _ack(a, channel, batch["first_id"])
+        _ack(b, channel, batch["first_id"])
+
+        flushes = read_cursors.flushes
+        assert _unread(client, alice)[channel]["unread"] == 0
+        assert _unread(client, alice)[channel]["last_read_message_id"] == batch["last_id"]
+        assert read_cursors.flushes == flushes
+        assert (bob, channel) in read_cursors._pending
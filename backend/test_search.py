@@ -0,0 +1,72 @@
+"""Full-text message search: indexing on every insert path, ranking and paging."""
+
+import os
+import sys
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _search(client, user_id, q, **params):
+    response = client.get("/api/v1/search/messages", params={"user_id": user_id, "q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_search_covers_every_insert_path_and_respects_membership(client, make_user, make_channel):
+    word = f"zebra{uuid4().hex[:6]}"
+    admin_user = make_user("admin")
+    admin = admin_user["id"]
+    first, second = make_channel(admin_user)["id"], make_channel(admin_user)["id"]
+    client.post(f"/api/v1/messages/{first}", json={"content": f"a {word} via rest"}, params={"user_id": admin})
+    client.post(f"/api/v1/messages/{second}/batch", params={"user_id": admin},
+                json=[{"content": f"{word} from an import"}, {"content": "unrelated"}])
+    with client.websocket_connect(f"/api/v1/channels/{first}/{admin}") as ws:
+        ws.send_text(f"live {word} over the socket")
+        while ws.receive_json().get("type") != "message":
+            pass
+
+    everywhere = _search(client, admin, word)["results"]
+    assert len(everywhere) == 3
+    assert all(f"<mark>{word}</mark>" in hit["snippet"] for hit in everywhere)
+    assert {hit["channel_id"] for hit in _search(client, admin, word, channel_id=first)["results"]} == {first}
+
+    outsider = make_user()["id"]
+    assert _search(client, outsider, word)["results"] == []
+    forbidden = client.get("/api/v1/search/messages", params={"user_id": outsider, "q": word, "channel_id": first})
+    assert forbidden.status_code == 403
+
+
+def test_snippets_are_html_escaped(client, make_user, make_channel):
+    word = f"quokka{uuid4().hex[:6]}"
+    admin = make_user("admin")
+    channel_id = make_channel(admin)["id"]
+    content = f'<img src=x onerror="alert(1)"> {word} & <script>'
+    client.post(f"/api/v1/messages/{channel_id}", headers=admin["headers"], json={"content": content})
+
+    [hit] = _search(client, admin["id"], word)["results"]
+    assert hit["content"] == content
+    assert "<img" not in hit["snippet"] and "<script" not in hit["snippet"]
+    assert f"&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>{word}</mark> &amp; &lt;script&gt;" in hit["snippet"]
+
+
+def test_results_are_ranked_and_paged_with_a_cursor(client, make_user, make_channel):
+    word = f"okapi{uuid4().hex[:6]}"
+    admin_user = make_user("admin")
+    admin = admin_user["id"]
+    channel = make_channel(admin_user)["id"]
+    client.post(f"/api/v1/messages/{channel}/batch", params={"user_id": admin}, json=[
+        {"content": f"{word} {word} {word}"},
+        *({"content": f"just one {word} among many other words here {i}"} for i in range(4)),
+    ])
+
+    seen, cursor = [], None
+    while True:
+        page = _search(client, admin, word, channel_id=channel, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen.extend(page["results"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 5 and len({hit["id"] for hit in seen}) == 5
+    assert seen[0]["content"] == f"{word} {word} {word}"
+    assert [hit["score"] for hit in seen] == sorted((hit["score"] for hit in seen), reverse=True)
@@ -0,0 +1,44 @@
+"""Multiplexed /ws/{user_id} endpoint."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _receive_until(ws, predicate):
+    while True:
+        frame = ws.receive_json()
+        if predicate(frame):
+            return frame
+
+
+def test_one_socket_serves_several_channels(client, make_user, make_channel):
+    admin, bob = make_user("admin"), make_user()
+    joined, other, foreign = (make_channel(admin)["id"] for _ in range(3))
+    for channel_id in (joined, other):
+        client.post(f"/api/v1/channels/{channel_id}/join", params={"user_id": bob["id"]})
+
+    with client.websocket_connect(f"/api/v1/ws/{bob['id']}") as ws:
+        ws.send_json({"type": "subscribe", "channel_ids": [joined, other, foreign]})
+        assert ws.receive_json() == {"type": "subscribed", "channel_id": joined}
+        assert ws.receive_json()["type"] == "presence_snapshot"
+        assert ws.receive_json() == {"type": "subscribed", "channel_id": other}
+        assert ws.receive_json()["type"] == "presence_snapshot"
+        assert ws.receive_json() == {"error": "Not a member of this channel", "channel_id": foreign}
+
+        ws.send_json({"type": "send", "channel_id": other, "content": {"text": "hello"}})
+        error = _receive_until(ws, lambda f: "error" in f)
+        assert error == {"error": "content must be a string", "channel_id": other}
+        ws.send_json({"type": "send", "channel_id": other, "content": "hello"})
+        message = _receive_until(ws, lambda f: f.get("type") == "message")
+        assert message["channel_id"] == other and message["content"] == "hello"
+
+        ws.send_json({"type": "unsubscribe", "channel_id": joined})
+        _receive_until(ws, lambda f: f.get("type") == "unsubscribed")
+        ws.send_json({"type": "send", "channel_id": joined, "content": "nope"})
+        error = _receive_until(ws, lambda f: "error" in f)
+        assert error == {"error": "Not subscribed to this channel", "channel_id": joined}
+
+    history = client.get(f"/api/v1/messages/{other}").json()
+    assert [m["content"] for m in history] == ["hello"]
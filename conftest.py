@@ -0,0 +1,20 @@
+"""Test session setup that has to run before ``backend`` is imported.
+
+Importing the package builds the app and its database engines from
+``DATABASE_URL``, so the tests' database is chosen here, in a temporary
+directory removed at the end of the session, rather than in
+``backend/conftest.py`` (which is itself part of the package).
+``TEST_DATABASE_URL`` runs the suite against another database instead.
+"""
+
+import os
+import shutil
+import tempfile
+
+_TMPDIR = tempfile.mkdtemp(prefix="chatwebapp-test-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_TMPDIR, 'test.db')}")
+os.environ["ARCHIVE_DIR"] = os.path.join(_TMPDIR, "archive")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMPDIR, ignore_errors=True)
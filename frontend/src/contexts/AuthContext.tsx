@@ -1,6 +1,6 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { api } from '@/lib/api';
-import type { User } from '@/types';
+import type { Session, User } from '@/types';
 
 interface AuthContextType {
   user: User | null;
@@ -21,7 +21,13 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
     const storedUser = localStorage.getItem('currentUser');
     if (storedUser) {
       try {
-        setUser(JSON.parse(storedUser));
+        const session: Session = JSON.parse(storedUser);
+        if (session.access_token && session.expires_at * 1000 > Date.now()) {
+          api.setToken(session.access_token);
+          setUser(session);
+        } else {
+          localStorage.removeItem('currentUser');
+        }
       } catch (e) {
         localStorage.removeItem('currentUser');
       }
@@ -31,17 +37,20 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
 
   const login = async (name: string, password: string) => {
     const userData = await api.login(name, password);
+    api.setToken(userData.access_token);
     setUser(userData);
     localStorage.setItem('currentUser', JSON.stringify(userData));
   };
 
   const register = async (name: string, password: string, role?: 'admin' | 'user') => {
     const userData = await api.register(name, password, role);
+    api.setToken(userData.access_token);
     setUser(userData);
     localStorage.setItem('currentUser', JSON.stringify(userData));
   };
 
   const logout = () => {
+    api.setToken(null);
     setUser(null);
     localStorage.removeItem('currentUser');
   };
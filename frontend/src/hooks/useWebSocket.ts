@@ -1,34 +1,40 @@
 import { useEffect, useRef, useCallback, useState } from 'react';
 import { getWsUrl } from '@/config/api';
+import { api } from '@/lib/api';
 import type { WSMessage, Message } from '@/types';
 
 interface UseWebSocketOptions {
   channelId: string;
   userId: string;
   onMessage: (message: Message) => void;
-  onUserJoined: (userId: string, onlineUsers: string[]) => void;
-  onUserLeft: (userId: string, onlineUsers: string[]) => void;
+  onPresence: (onlineUsers: string[]) => void;
+  onReplayGap?: () => void;
 }
 
 export const useWebSocket = ({
   channelId,
   userId,
   onMessage,
-  onUserJoined,
-  onUserLeft,
+  onPresence,
+  onReplayGap,
 }: UseWebSocketOptions) => {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout>();
   const reconnectAttemptsRef = useRef(0);
   const [isConnected, setIsConnected] = useState(false);
   const mountedRef = useRef(true);
+  // Presence as of presenceVersionRef; the server sends versioned deltas
+  const presenceRef = useRef<Set<string>>(new Set());
+  const presenceVersionRef = useRef(-1);
+  // Newest message seen, so a reconnect can ask for just the gap
+  const lastSeenIdRef = useRef<string | null>(null);
   
   // Store callbacks in refs to prevent recreating connect function
-  const callbacksRef = useRef({ onMessage, onUserJoined, onUserLeft });
+  const callbacksRef = useRef({ onMessage, onPresence, onReplayGap });
   
   useEffect(() => {
-    callbacksRef.current = { onMessage, onUserJoined, onUserLeft };
-  }, [onMessage, onUserJoined, onUserLeft]);
+    callbacksRef.current = { onMessage, onPresence, onReplayGap };
+  }, [onMessage, onPresence, onReplayGap]);
 
   const connect = useCallback(() => {
     // Prevent connection if already open or unmounted
@@ -36,7 +42,12 @@ export const useWebSocket = ({
       return;
     }
 
-    const wsUrl = getWsUrl(`/channels/${channelId}/${userId}`);
+    const lastSeen = lastSeenIdRef.current;
+    const params = new URLSearchParams();
+    if (api.token) params.set('token', api.token);
+    if (lastSeen) params.set('last_seen_id', lastSeen);
+    const query = params.toString();
+    const wsUrl = getWsUrl(`/channels/${channelId}/${userId}` + (query ? `?${query}` : ''));
     console.log('Connecting to WebSocket:', wsUrl);
     
     const ws = new WebSocket(wsUrl);
@@ -44,6 +55,7 @@ export const useWebSocket = ({
 
     ws.onopen = () => {
       console.log('WebSocket connected');
+      presenceVersionRef.current = -1;
       setIsConnected(true);
       reconnectAttemptsRef.current = 0;
     };
@@ -53,28 +65,59 @@ export const useWebSocket = ({
         const data: WSMessage = JSON.parse(event.data);
         console.log('WS message received:', data);
 
+        const deliver = (m: WSMessage) => {
+          if (m.id && m.sender_id && m.content && m.created_at) {
+            lastSeenIdRef.current = m.id;
+            callbacksRef.current.onMessage({
+              id: m.id,
+              sender_id: m.sender_id,
+              channel_id: channelId,
+              content: m.content,
+              created_at: m.created_at,
+              status: 'sent',
+            });
+          }
+        };
+
+        // Mark the channel read up to the newest delivered message; the
+        // server coalesces acks, so one per frame is fine
+        const ack = () => {
+          if (lastSeenIdRef.current) {
+            ws.send(JSON.stringify({ type: 'ack', message_id: lastSeenIdRef.current }));
+          }
+        };
+
         switch (data.type) {
           case 'message':
-            if (data.id && data.sender_id && data.content && data.created_at) {
-              callbacksRef.current.onMessage({
-                id: data.id,
-                sender_id: data.sender_id,
-                channel_id: channelId,
-                content: data.content,
-                created_at: data.created_at,
-                status: 'sent',
-              });
-            }
+            deliver(data);
+            ack();
             break;
-          case 'user_joined':
-            if (data.user_id && data.online_users) {
-              callbacksRef.current.onUserJoined(data.user_id, data.online_users);
+          case 'replay':
+          case 'message_batch':
+            data.messages?.forEach(deliver);
+            ack();
+            if (!data.complete) {
+              callbacksRef.current.onReplayGap?.();
             }
             break;
-          case 'user_left':
-            if (data.user_id && data.online_users) {
-              callbacksRef.current.onUserLeft(data.user_id, data.online_users);
+          case 'presence_snapshot':
+            presenceRef.current = new Set(data.online_users ?? []);
+            presenceVersionRef.current = data.version ?? 0;
+            callbacksRef.current.onPresence([...presenceRef.current]);
+            break;
+          case 'presence':
+            if (data.version === undefined || data.version <= presenceVersionRef.current) {
+              break; // already covered by the last snapshot
+            }
+            if (data.version !== presenceVersionRef.current + 1) {
+              // Missed a delta (or no snapshot yet): ask for the full list
+              ws.send(JSON.stringify({ type: 'presence_sync' }));
+              break;
             }
+            data.added?.forEach((id) => presenceRef.current.add(id));
+            data.removed?.forEach((id) => presenceRef.current.delete(id));
+            presenceVersionRef.current = data.version;
+            callbacksRef.current.onPresence([...presenceRef.current]);
             break;
         }
       } catch (error) {
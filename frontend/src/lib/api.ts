@@ -1,13 +1,19 @@
 import { API_BASE_URL } from '@/config/api';
-import type { User, Channel, Message, ChannelMember } from '@/types';
+import type { User, Session, Channel, Message, ChannelMember } from '@/types';
 
 class ApiClient {
   private baseUrl: string;
+  // Session token from login/register, sent as a Bearer header
+  token: string | null = null;
 
   constructor() {
     this.baseUrl = API_BASE_URL;
   }
 
+  setToken(token: string | null) {
+    this.token = token;
+  }
+
   private async request<T>(
     path: string,
     options: RequestInit = {},
@@ -24,6 +30,7 @@ class ApiClient {
       ...options,
       headers: {
         'Content-Type': 'application/json',
+        ...(this.token ? { Authorization: `Bearer ${this.token}` } : {}),
         ...options.headers,
       },
     });
@@ -37,15 +44,15 @@ class ApiClient {
   }
 
   // User endpoints
-  async register(name: string, password: string, role?: 'admin' | 'user'): Promise<User> {
-    return this.request<User>('/users/register', {
+  async register(name: string, password: string, role?: 'admin' | 'user'): Promise<Session> {
+    return this.request<Session>('/users/register', {
       method: 'POST',
       body: JSON.stringify({ name, password, role }),
     });
   }
 
-  async login(name: string, password: string): Promise<User> {
-    return this.request<User>('/users/login', {
+  async login(name: string, password: string): Promise<Session> {
+    return this.request<Session>('/users/login', {
       method: 'POST',
       body: JSON.stringify({ name, password }),
     });
@@ -88,8 +95,12 @@ class ApiClient {
   }
 
   // Message endpoints
-  async getMessages(channelId: string, limit = 50): Promise<Message[]> {
-    return this.request<Message[]>(`/messages/${channelId}`, {}, { limit: limit.toString() });
+  async getMessages(channelId: string, limit = 50, before?: string): Promise<Message[]> {
+    const params: Record<string, string> = { limit: limit.toString() };
+    if (before) params.before = before;
+    // The API pages newest-first; the UI renders oldest-first.
+    const page = await this.request<Message[]>(`/messages/${channelId}`, {}, params);
+    return page.reverse();
   }
 
   async sendMessage(channelId: string, content: string, userId: string): Promise<Message> {
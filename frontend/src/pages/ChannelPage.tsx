@@ -35,22 +35,24 @@ export const ChannelPage: React.FC = () => {
     });
   }, []);
 
-  const handleUserJoined = useCallback((userId: string, onlineUsersList: string[]) => {
+  const handlePresence = useCallback((onlineUsersList: string[]) => {
     setOnlineUsers(onlineUsersList);
-    console.log(`User ${userId} joined. Online:`, onlineUsersList);
   }, []);
 
-  const handleUserLeft = useCallback((userId: string, onlineUsersList: string[]) => {
-    setOnlineUsers(onlineUsersList);
-    console.log(`User ${userId} left. Online:`, onlineUsersList);
-  }, []);
+  // Missed more than the server could replay: reload the latest page.
+  const handleReplayGap = useCallback(() => {
+    if (!channelId) return;
+    api.getMessages(channelId).then(setMessages).catch((error) => {
+      console.error('Error reloading messages:', error);
+    });
+  }, [channelId]);
 
   const { isConnected, sendMessage } = useWebSocket({
     channelId: channelId!,
     userId: user!.id,
     onMessage: handleMessage,
-    onUserJoined: handleUserJoined,
-    onUserLeft: handleUserLeft,
+    onPresence: handlePresence,
+    onReplayGap: handleReplayGap,
   });
 
   useEffect(() => {
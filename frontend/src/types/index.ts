@@ -6,9 +6,20 @@ export interface User {
   updated_at: string;
 }
 
+// A logged-in user with the session token the API expects
+export interface Session extends User {
+  access_token: string;
+  token_type: 'bearer';
+  expires_at: number;
+}
+
 export interface Channel {
   id: string;
   name: string;
+  retention_days?: number | null;
+  member_count: number;
+  message_count: number;
+  last_message_at: string | null;
   created_at: string;
   updated_at: string;
 }
@@ -31,11 +42,16 @@ export interface ChannelMember {
 }
 
 export interface WSMessage {
-  type: 'message' | 'user_joined' | 'user_left';
+  type: 'message' | 'message_batch' | 'replay' | 'presence' | 'presence_snapshot';
   id?: string;
   sender_id?: string;
   content?: string;
   created_at?: string;
-  user_id?: string;
+  channel_id?: string;
+  version?: number;
+  added?: string[];
+  removed?: string[];
   online_users?: string[];
+  messages?: WSMessage[];
+  complete?: boolean;
 }